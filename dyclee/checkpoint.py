@@ -0,0 +1,180 @@
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+import forget_methods
+from dyclee import Context, DyClee
+from grid_index import GridIndex
+
+# a checkpoint is MAGIC, a version byte, a uint32 length prefixed JSON header
+# and the raw arrays it lists, each starting on an ALIGN byte boundary
+# (offsets are relative to the first one) so they can be memory mapped
+MAGIC = b'DYCL'
+VERSION = 1
+ALIGN = 64
+_LEN = struct.Struct('<I')
+
+
+def _align (offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def capture (dyclee: DyClee):
+    """Return a copy of the state of dyclee, detached from further updates"""
+    muCs = dyclee.microClusters
+    size = len(muCs)
+    inA = np.zeros(size, dtype= bool)
+    inA[dyclee.AList] = True
+    forget = None
+    if dyclee.forget_method is not None:
+        forget = {'name': type(dyclee.forget_method).__name__, 'params': dict(vars(dyclee.forget_method))}
+    params = {
+        'relativeSize': float(dyclee.relativeSize),
+        'maxNonOverlaps': int(dyclee.maxNonOverlaps),
+        'minWeight': None if dyclee.minWeight is None else float(dyclee.minWeight),
+        'meanDensity': float(dyclee.meanDensity),
+        'medianDensity': float(dyclee.medianDensity),
+        'clusteredAt': None if dyclee.clusteredAt is None else float(dyclee.clusteredAt),
+        'forget': forget,
+    }
+    arrays = {
+        'minimum': np.array([c.minimum for c in dyclee.dataContext], dtype= float),
+        'maximum': np.array([c.maximum for c in dyclee.dataContext], dtype= float),
+        'hyperboxSizePerFeature': np.array(dyclee.hyperboxSizePerFeature, dtype= float),
+        'n': muCs.n[:size].copy(),
+        'LS': muCs.LS[:size].copy(),
+        'SS': muCs.SS[:size].copy(),
+        'tl': muCs.tl[:size].copy(),
+        'ts': muCs.ts[:size].copy(),
+        'label': muCs.label[:size].copy(),
+        'inA': inA,
+    }
+    return params, arrays
+
+
+def write (state, path: str):
+    """Write a captured state to path, replacing it atomically"""
+    params, arrays = state
+    entries = list()
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        entries.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'params': params, 'arrays': entries}).encode('utf-8')
+    start = _align(len(MAGIC) + 1 + _LEN.size + len(header))
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + bytes([VERSION]) + _LEN.pack(len(header)) + header)
+        for entry in entries:
+            f.seek(start + entry['offset'])
+            f.write(np.ascontiguousarray(arrays[entry['name']]).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def save (dyclee: DyClee, path: str):
+    """Checkpoint dyclee to path"""
+    write(capture(dyclee), path)
+
+
+def load (path: str, mmap: bool= False) -> DyClee:
+    """
+    Restore a DyClee from a checkpoint; with mmap the microcluster arrays
+    are mapped copy-on-write instead of read into memory
+    """
+    with open(path, 'rb') as f:
+        assert f.read(len(MAGIC)) == MAGIC, "not a DyClee checkpoint"
+        version = f.read(1)[0]
+        assert version == VERSION, "unsupported checkpoint version {}".format(version)
+        (n,) = _LEN.unpack(f.read(_LEN.size))
+        header = json.loads(f.read(n))
+        start = _align(len(MAGIC) + 1 + _LEN.size + n)
+
+        arrays = dict()
+        for entry in header['arrays']:
+            dtype = np.dtype(entry['dtype'])
+            shape = tuple(entry['shape'])
+            count = int(np.prod(shape))
+            if mmap and count > 0:
+                arrays[entry['name']] = np.memmap(path, dtype= dtype, mode= 'c', offset= start + entry['offset'], shape= shape)
+            else:
+                f.seek(start + entry['offset'])
+                arrays[entry['name']] = np.fromfile(f, dtype= dtype, count= count).reshape(shape)
+
+    params = header['params']
+    forget = None
+    if params['forget'] is not None:
+        forget = getattr(forget_methods, params['forget']['name'])(**params['forget']['params'])
+    context = [Context(float(lo), float(hi)) for lo, hi in zip(arrays['minimum'], arrays['maximum'])]
+    dyclee = DyClee(params['relativeSize'], context, forget_method= forget,
+                    maxNonOverlaps= params['maxNonOverlaps'], minWeight= params['minWeight'])
+    assert np.allclose(dyclee.hyperboxSizePerFeature, arrays['hyperboxSizePerFeature']), "inconsistent hyperbox sizes"
+
+    muCs = dyclee.microClusters
+    size = len(arrays['n'])
+    if size > 0:
+        muCs.capacity = size
+        muCs.size = size
+        for name in ('n', 'LS', 'SS', 'tl', 'ts', 'label'):
+            setattr(muCs, name, arrays[name])
+    inA = np.asarray(arrays['inA'])
+    dyclee.AList = np.flatnonzero(inA).tolist()
+    dyclee.OList = np.flatnonzero(~inA).tolist()
+    dyclee.AIndex = GridIndex(dyclee.potential_neighbor_radius, dyclee.AList, muCs.getCenters(dyclee.AList))
+    dyclee.OIndex = GridIndex(dyclee.potential_neighbor_radius, dyclee.OList, muCs.getCenters(dyclee.OList))
+    # connections are not stored, the next density phase searches them all again
+    dyclee.dirty = set(range(size))
+    dyclee.meanDensity = params['meanDensity']
+    dyclee.medianDensity = params['medianDensity']
+    dyclee.clusteredAt = params['clusteredAt']
+    return dyclee
+
+
+class BackgroundCheckpointer:
+    """
+    Writes checkpoints on a thread of its own
+
+    submit() only copies the state, on the caller's thread so the copy is
+    consistent; serializing and writing happen in the background. If a
+    write is still going on, the newest submitted state replaces any that
+    is still waiting, so a slow disk never holds more than one copy.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        self._pending = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target= self._run, name= "DyCleeCheckpointer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit (self, dyclee: DyClee):
+        """Snapshot dyclee now and write it out in the background"""
+        state = capture(dyclee)
+        with self._cond:
+            self._pending = state
+            self._cond.notify()
+
+    def close (self):
+        """Write what was submitted and stop the thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run (self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                state, self._pending = self._pending, None
+                if state is None:
+                    return
+            write(state, self.path)
+            self.written += 1
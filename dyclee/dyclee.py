@@ -1,210 +1,322 @@
+import time
+from collections import namedtuple
+
 import numpy as np
-from typing import List
-from sklearn.neighbors import KDTree
 
-from microcluster import MicroCluster
+from microcluster_set import MicroClusterSet
+from grid_index import GridIndex
+from union_find import UnionFind
+
+# value range of one feature, as DyClee expects its data context
+Context = namedtuple('Context', ['minimum', 'maximum'])
 
 class DyClee:
-    """Implementation of DyClee Algorithm"""
-    def __init__(self, relativeSize: float, dataContext, forget_method= None, maxNonOverlaps= 0):
+    """
+    Implementation of DyClee Algorithm
+
+    Microclusters live in a MicroClusterSet and are referred to by row; the
+    A-list and O-list hold rows of that set.
+
+    Every update takes a timestamp now (the current time by default) that
+    drives the forgetting function. Decay is applied lazily, to the
+    microclusters receiving samples and, at the density phase, to the
+    densities of all of them; with minWeight set, microclusters whose
+    decayed weight fell below it are pruned at every density phase.
+    """
+    def __init__(self, relativeSize: float, dataContext, forget_method= None, maxNonOverlaps= 0, minWeight= None):
         self.relativeSize = relativeSize
         self.dataContext = dataContext
-        self.hyperboxSizePerFeature = self.getHyperBoxSizePerFeaure()
+        self.hyperboxSizePerFeature = self.getHyperBoxSizePerFeature()
         self.potential_neighbor_radius = np.max(self.hyperboxSizePerFeature)    # search radius for neighbor in density based phase
         self.forget_method = forget_method
         self.maxNonOverlaps = maxNonOverlaps
+        self.minWeight = minWeight      # decayed microclusters lighter than this are pruned
 
         # microcluster details
-        self.numMicroClusters = 0
+        self.microClusters = MicroClusterSet(self.hyperboxSizePerFeature, self.forget_method)
         self.AList = list()
         self.OList = list()
+        # spatial indices over the centers of each list, a sample can only
+        # reach microclusters within potential_neighbor_radius of it
+        self.AIndex = GridIndex(self.potential_neighbor_radius)
+        self.OIndex = GridIndex(self.potential_neighbor_radius)
+
+        # density phase state carried between runs
+        self.dirty = set()          # rows that received samples since the last run
+        self.neighbors = dict()     # row -> rows directly connected to it
+        self.denseRows = set()      # rows that were dense in the last run
+        self.components = UnionFind()
+        self.componentsStale = False    # rows were renumbered by pruning
+        self.clusteredAt = None         # time of the last run
 
         self.meanDensity = 0
         self.medianDensity = 0
-        
+
+    @property
+    def numMicroClusters (self):
+        return len(self.microClusters)
 
     def getHyperBoxSizePerFeature (self):
         """Return the hyperbox sizes from the data context"""
         hb = list()
         for context in self.dataContext:
-            hb.append(context.maximum - context.minimum)
+            hb.append(self.relativeSize * (context.maximum - context.minimum))
         return np.array(hb)
 
 
     ## Phase-1
-    def distanceBasedClustering (self, sample: np.ndarray):
-        """first phase of dyclee"""
-        if self.numMicroClusters == 0:  # first sample
-            # create a new microcluster
-            muC = MicroCluster(sample, self.hyperboxSizePerFeature, self.forget_method)
-            self.numMicroClusters += 1
-            # append to O-list
-            self.OList.append(muC)
-        else:
-            # search in A-list
-            reachables = self.getReachableMicroClusters(self.AList, sample)
+    def distanceBasedClustering (self, sample: np.ndarray, now: float= None) -> int:
+        """first phase of dyclee, returns the microcluster the sample went to"""
+        muCs = self.microClusters
+        now = time.time() if now is None else now
+        # search in A-list, then in O-list
+        for index in (self.AIndex, self.OIndex):
+            reachables = muCs.getReachable(index.getCandidates(sample), sample)
             if len(reachables) > 0:
-                closest = self.getClosest(reachables, sample)
-                closest.insertSample(sample)
-            # if not found
+                closest = muCs.getClosest(reachables, sample)
+                muCs.insertSample(closest, sample, now)
+                index.move(closest, muCs.getCenters(closest))
+                self.dirty.add(closest)
+                return closest
+        # if not found, create a new microcluster
+        row = muCs.add(sample, now)
+        # append to O-list
+        self.OList.append(row)
+        self.OIndex.add(row, sample)
+        self.dirty.add(row)
+        return row
+
+    def partial_fit (self, X: np.ndarray, now: float= None) -> np.ndarray:
+        """
+        first phase of dyclee over a block of samples (one per row of X),
+        returns the microcluster each sample went to
+
+        Every sample is matched against the microclusters as they were
+        before the block, preferring the A-list and then the closest center.
+        Samples that reach none of them form new microclusters among
+        themselves, each joining the first earlier such sample it can
+        reach, so the result only depends on the order of the block.
+        """
+        X = np.asarray(X, dtype= float)
+        muCs = self.microClusters
+        now = time.time() if now is None else now
+        rows = np.full(len(X), -1, dtype= np.int64)
+        if len(X) == 0:
+            return rows
+        if len(muCs) > 0:
+            self.assignToExisting(X, rows)
+        new = np.flatnonzero(rows < 0)
+        if len(new) > 0:
+            rows[new] = self.createFromBatch(X[new], now)
+
+        touched = muCs.insertBatch(rows, X, now)
+        self.dirty.update(touched.tolist())
+        centers = muCs.getCenters(touched)
+        for row, center in zip(touched.tolist(), centers):
+            if row in self.AIndex.cellOf:
+                self.AIndex.move(row, center)
+            elif row in self.OIndex.cellOf:
+                self.OIndex.move(row, center)
             else:
-                # search in O-list
-                reachables = self.getReachableMicroClusters(self.OList, sample)
-                if len(reachables) > 0:
-                    closest = self.getClosest(reachables, sample)
-                    closest.insertSample(sample)
-                # if not found
-                else:
-                    # create a new microcluster
-                    muC = MicroCluster(sample, self.hyperboxSizePerFeature, self.forget_method)
-                    self.numMicroClusters += 1
-                    # append to O-list
-                    self.OList.append(muC)
-
-
-    
-    def getReachableMicroClusters (self, muCList: List[MicroCluster], sample:np.ndarray):
-        """returns a list of microclsuter from muCList that are reachable from sample"""
-        rc = list()
-        for muC in muCList:
-            if muC.isReachable(sample):
-                rc.append(muC)
-        return rc
-
-    def getClosest (self, muCList: List[MicroCluster], sample: np.ndarray):
-        """given a list of microclusters, find the closest from a sample (in terms of manhattan distance)"""
-        minDist = None
-        closest = None
-        for muC in muCList:
-            dist = muC.getManhattanDistance(sample)
-            if minDist is None or dist < minDist:
-                minDist = dist
-                closest = muC
-        
-        return closest
+                # append to O-list
+                self.OList.append(row)
+                self.OIndex.add(row, center)
+        return rows
+
+    def assignToExisting (self, X: np.ndarray, rows: np.ndarray):
+        """Fill rows with the reachable microcluster each sample goes to, if any"""
+        muCs = self.microClusters
+        centers = muCs.getCenters()
+        # candidate pairs from the grid indices, anything reachable is
+        # centered in the sample's cell or an adjacent one
+        aIdx, aRows = self.AIndex.getCandidatePairs(X)
+        oIdx, oRows = self.OIndex.getCandidatePairs(X)
+        sIdx, cIdx = np.concatenate([aIdx, oIdx]), np.concatenate([aRows, oRows])
+        if len(sIdx) == 0:
+            return
+        diff = np.absolute(X[sIdx] - centers[cIdx])
+        reach = muCs.isWithinHyperbox(diff)
+        sIdx, cIdx, dist = sIdx[reach], cIdx[reach], np.sum(diff[reach], axis= 1)
+        # per sample: A-list first, then closest, then lowest row
+        inA = np.zeros(len(muCs), dtype= bool)
+        inA[self.AList] = True
+        order = np.lexsort((cIdx, dist, ~inA[cIdx], sIdx))
+        sIdx, cIdx = sIdx[order], cIdx[order]
+        first = np.ones(len(sIdx), dtype= bool)
+        first[1:] = sIdx[1:] != sIdx[:-1]
+        rows[sIdx[first]] = cIdx[first]
+
+    def createFromBatch (self, X: np.ndarray, now: float) -> np.ndarray:
+        """Group samples that reach no microcluster into new ones, return the row of each"""
+        group = np.empty(len(X), dtype= np.int64)
+        pending = np.arange(len(X))
+        numGroups = 0
+        while len(pending) > 0:
+            # the first pending sample seeds a microcluster, taking all it reaches
+            reach = self.microClusters.isWithinHyperbox(np.absolute(X[pending] - X[pending[0]]))
+            group[pending[reach]] = numGroups
+            numGroups += 1
+            pending = pending[~reach]
+        return self.microClusters.extend(numGroups, now)[group]
+
 
     ## Phase 2
 
-    def densityBasedClustering (self):
-        """Second phase of dyclee"""
+    def densityBasedClustering (self, now: float= None):
+        """
+        Second phase of dyclee, returns the remap of prune if it renumbered
+        the microclusters, None otherwise
+
+        Direct connections are kept between runs and only re-searched for
+        microclusters that received samples since the last run (dirty).
+        Clusters are the connected components of the dense microclusters,
+        tracked with union-find; as long as no dense microcluster lost a
+        connection or its density, the components of the last run are
+        extended instead of rebuilt. Semi-dense microclusters of the A-list
+        join the cluster of a dense neighbor.
+        """
+        muCs = self.microClusters
+        self.clusteredAt = time.time() if now is None else now
+        remap = None
+        if self.minWeight is not None:
+            remap = self.prune(self.clusteredAt)
+        if len(muCs) == 0:
+            return remap
         # get density thresholds
-        concatList = self.AList + self.OList
-        self.meanDensity = self.getMeanDensity(concatList)
-        self.medianDensity = self.getMedianDensity(concatList)
+        densities = muCs.getDensities(now= self.clusteredAt)
+        self.meanDensity = np.mean(densities)
+        self.medianDensity = np.median(densities)
+        dense = (densities >= self.meanDensity) & (densities >= self.medianDensity)
 
         # update A and O lists
         self.updateLists()
 
-        # reset labels
-        for muC in self.AList:
-            muC.unsetLabel()
-        for muC in self.OList:
-            muC.unsetLabel()
-
-        # get dense clusters
-        denseMicroClusters = self.getDenseMicroClusters()
-        # the KD Tree for searching
-        # based on infinte norm distance
-        searchTree = KDTree(np.vstack([c.getCenter() for c in self.AList]), p= np.inf)
-        
-        # loop variables
-        seen = list()   # list of already visited micorclsuters
-        cid = 0         # cluster id
-        # density based clustering loop
-        for muC in denseMicroClusters:
-            # not already seen
-            if muC not in seen:
-                seen.append(muC)
-                muC.setLabel(cid)
-                neighbors = self.getNeighbors(muC, searchTree, seen)
-                # process the neighborhood
-                while len(neighbors):
-                    _muC = neighbors.pop()
-                    # not already seen
-                    if _muC not in seen:
-                        #_muC can only be dense/semidense
-                        # label for both
-                        seen.append(_muC)
-                        _muC.setLabel(cid)
-                        # add neighborhood only if dense
-                        if self.isDense(_muC):
-                            # add its neighbors also
-                            nextNeighbors = self.getNeighbors(_muC, searchTree, seen)
-                            neighbors = neighbors.union(nextNeighbors)
-
-            # increment cid
-            cid += 1
-                
-
-
-    def getMeanDensity (self, muCList: List[MicroCluster]):
-        """Return mean of densities of microclusters"""
-        return np.mean([muC.getDensity() for muC in muCList])
-    
-    def getMedianDensity (self, muCList:List[MicroCluster]):
-        """Return median of densities of microclusters"""
-        return np.median([muC.getDensity() for muC in muCList])
-
-    def isDense (self, muC: MicroCluster):
-        d = muC.getDensity()
+        # connections of the microclusters that moved
+        lostConnection = self.updateNeighbors(self.dirty)
+        denseRows = set(np.flatnonzero(dense).tolist())
+        if self.componentsStale or (lostConnection & self.denseRows) or (self.denseRows - denseRows):
+            # components may have split, start over
+            self.components = UnionFind(denseRows)
+            self.componentsStale = False
+            changed = denseRows
+        else:
+            changed = (denseRows - self.denseRows) | (self.dirty & denseRows)
+            for row in changed:
+                self.components.add(row)
+        for row in changed:
+            for ngh in self.neighbors[row]:
+                if ngh in denseRows:
+                    self.components.union(row, ngh)
+        self.denseRows = denseRows
+        self.dirty = set()
+
+        # number the components, then attach semi-dense microclusters
+        labels = muCs.label
+        labels[:len(muCs)] = -1
+        if len(denseRows) == 0:
+            return remap
+        denseArr = np.array(sorted(denseRows))
+        roots = np.array([self.components.find(row) for row in denseArr])
+        labels[denseArr] = np.unique(roots, return_inverse= True)[1]
+        semiDense = np.array(self.AList, dtype= np.int64)
+        semiDense = semiDense[~dense[semiDense]]
+        for row in semiDense.tolist():
+            cids = [labels[ngh] for ngh in self.neighbors[row] if ngh in denseRows]
+            if len(cids) > 0:
+                labels[row] = min(cids)
+        return remap
+
+
+    def isDense (self, muC: int):
+        d = self.microClusters.getDensities(muC, self.clusteredAt)
         return ((d >= self.meanDensity) and (d >= self.medianDensity))
-    
-    def isSemiDense (self, muC: MicroCluster):
-        d = muC.getDensity()
+
+    def isSemiDense (self, muC: int):
+        d = self.microClusters.getDensities(muC, self.clusteredAt)
         return ((d >= self.meanDensity) or (d >= self.medianDensity))
-    
-    def isOutlier (self, muC: MicroCluster):
-        d = muC.getDensity()
-        return ((d < self.meanDensity) and (d < self.medianDensity))
 
-    def getDenseMicroClusters (self):
-        """Return dense microclsuters from A-List"""
-        dense = list()
-        for muC in self.AList:
-            if self.isDense(muC):
-                dense.append(muC)
-        return dense
+    def isOutlier (self, muC: int):
+        d = self.microClusters.getDensities(muC, self.clusteredAt)
+        return ((d < self.meanDensity) and (d < self.medianDensity))
 
     def updateLists (self):
-        """Update the A-list and O-list"""
-        muCList = self.AList + self.OList
-        newAList = list()
-        newOList = list()
-        for muC in muCList:
-            if self.isOutlier(muC):
-                newOList.append(muC)
-            else:
-                newAList.append(muC)
-        self.AList = newAList
-        self.OList = newOList
-    
+        """Update the A-list and O-list, moving only the microclusters that changed list"""
+        muCs = self.microClusters
+        d = muCs.getDensities(now= self.clusteredAt)
+        outlier = (d < self.meanDensity) & (d < self.medianDensity)
+        wasA = np.zeros(len(muCs), dtype= bool)
+        wasA[self.AList] = True
+        for row in np.flatnonzero(wasA & outlier).tolist():
+            self.AIndex.remove(row)
+            self.OIndex.add(row, muCs.getCenters(row))
+        for row in np.flatnonzero(~wasA & ~outlier).tolist():
+            self.OIndex.remove(row)
+            self.AIndex.add(row, muCs.getCenters(row))
+        self.AList = np.flatnonzero(~outlier).tolist()
+        self.OList = np.flatnonzero(outlier).tolist()
+
     def getDenseMicroClusters (self):
         """Return all dense microclusters"""
-        dense = list()
-        for muC in self.AList:
-            if self.isDense(muC):
-                dense.append(muC)
-        return dense
-
-    
-    def getNeighbors (self, muC: MicroCluster, searchTree: KDTree, alreadySeen: List[MicroCluster]):
-        """Return set of neighbors for a given microcluster"""
-        # get neighbor indices
-        nghIdc = searchTree.query_radius(muC.getCenter().reshape(1, -1), self.potential_neighbor_radius)[0]
-        neighbors = list()
-        # add the microclusters from A-List except itself
-        for idx in nghIdc:
-            if  (    muC != self.AList[idx] and                                     # not itself 
-                    muC.isDirectlyConnected(self.AList[idx], self.maxNonOverlaps)   # directly connected
-                ):
-                neighbors.append(self.AList[idx])
-        neighbors = set(neighbors)
-        neighbors = neighbors - set(alreadySeen)    # exclude already seen microclusters
-        return neighbors
-        
-
-    
-    
+        d = self.microClusters.getDensities(self.AList, self.clusteredAt)
+        dense = (d >= self.meanDensity) & (d >= self.medianDensity)
+        return np.array(self.AList, dtype= np.int64)[dense].tolist()
+
+    def updateNeighbors (self, rows):
+        """
+        Search the directly connected neighbors of the given microclusters
+        again, return those that lost a connection
+        """
+        muCs = self.microClusters
+        old = dict()
+        for row in rows:
+            old[row] = self.neighbors.pop(row, set())
+            for ngh in old[row]:
+                self.neighbors[ngh].discard(row)
+        lost = set()
+        for row in rows:
+            center = muCs.getCenters(row)
+            candidates = np.concatenate([self.AIndex.getCandidates(center), self.OIndex.getCandidates(center)])
+            candidates = candidates[candidates != row]      # not itself
+            # within the search radius (infinite norm) and directly connected
+            near = np.max(np.absolute(muCs.getCenters(candidates) - center), axis= 1) <= self.potential_neighbor_radius
+            neighbors = set(muCs.getDirectlyConnected(row, candidates[near], self.maxNonOverlaps).tolist())
+            self.neighbors[row] = neighbors
+            for ngh in neighbors:
+                self.neighbors.setdefault(ngh, set()).add(row)
+        for row in rows:
+            gone = old[row] - self.neighbors[row]
+            if gone:
+                lost.add(row)
+                lost.update(gone)
+        return lost
+
+
+
+    def prune (self, now: float= None) -> np.ndarray:
+        """
+        Drop the microclusters whose weight decayed below minWeight by now,
+        renumbering the rest; return the new row of every old one (-1 if
+        dropped), or None if none was dropped
+        """
+        muCs = self.microClusters
+        now = time.time() if now is None else now
+        keep = muCs.getWeights(now= now) >= self.minWeight
+        if keep.all():
+            return None
+        remap = muCs.compact(keep)
+        remapped = lambda rows: [r for r in remap[list(rows)].tolist() if r >= 0]
+        self.AList = remapped(self.AList)
+        self.OList = remapped(self.OList)
+        self.AIndex = GridIndex(self.potential_neighbor_radius, self.AList, muCs.getCenters(self.AList))
+        self.OIndex = GridIndex(self.potential_neighbor_radius, self.OList, muCs.getCenters(self.OList))
+        self.dirty = set(remapped(self.dirty))
+        self.denseRows = set(remapped(self.denseRows))
+        self.neighbors = {int(remap[row]): set(remapped(nghs)) for row, nghs in self.neighbors.items() if remap[row] >= 0}
+        self.componentsStale = True
+        return remap
+
+
     ## Combined methods
-    def step (self, sample: np.ndarray):
+    def step (self, sample: np.ndarray, now: float= None) -> int:
         """A training step given a sample"""
+        return self.distanceBasedClustering(sample, now)
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
-import math
+import numpy as np
 
 class Decay (ABC):
+    """
+    Forgetting function, decay(t, tl) is the weight left at time t of what a
+    microcluster had at its last update tl; tl may be an array of times
+    """
 
     @abstractmethod
     def decay(self, t, t1):
@@ -14,11 +18,8 @@ class LinearDecay (Decay):
 
     def decay (self, t, tl):
         m = 1/self.tw0
-        if (t - tl) <= self.tw0:
-            return (1 - m(t - tl))
-
-        else:
-            return 0
+        dt = np.subtract(t, tl)
+        return np.where(dt <= self.tw0, 1 - m*dt, 0.0)
 
 
 class TrapezoidalDecay (Decay):
@@ -27,15 +28,9 @@ class TrapezoidalDecay (Decay):
         self.ta = ta
 
     def decay (self, t, tl):
-        m = 1/self.tw0
-        if (t - tl) <= self.ta:
-            return 1
-
-        elif (t - tl) > self.ta and (t - tl) <= self.tw0:
-            return ((m - t)/(m - self.ta))
-
-        else:
-            return 0
+        dt = np.subtract(t, tl)
+        return np.where(dt <= self.ta, 1.0,
+                        np.where(dt <= self.tw0, (self.tw0 - dt)/(self.tw0 - self.ta), 0.0))
 
 
 class ExponentialDecay (Decay):
@@ -43,7 +38,7 @@ class ExponentialDecay (Decay):
         self.d = d
 
     def decay (self, t, tl):
-        return math.exp(-self.d * (t - tl))
+        return np.exp(-self.d * np.subtract(t, tl))
 
 class HalfLifeDecay (Decay):
     def __init__(self, d, beta):
@@ -51,7 +46,7 @@ class HalfLifeDecay (Decay):
         self.beta = beta
 
     def decay (self, t, tl):
-        return math.pow(self.beta, -self.d * (t - tl))
+        return np.power(self.beta, -self.d * np.subtract(t, tl))
 
 class SigmoidalDecay (Decay):
     def __init__ (self, a, c):
@@ -59,4 +54,4 @@ class SigmoidalDecay (Decay):
         self.c = c
 
     def decay (self, t, tl):
-        return 1/(1 + math.exp(-self.a * (t - self.c)))
\ No newline at end of file
+        return np.broadcast_to(1/(1 + np.exp(-self.a * (t - self.c))), np.shape(tl))
\ No newline at end of file
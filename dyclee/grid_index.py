@@ -0,0 +1,170 @@
+import itertools
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Hash grid over microcluster centers
+
+    Centers are quantized to cells of side cellSize; a sample can only reach
+    microclusters whose center lies in its own cell or one of the adjacent
+    ones, so lookups probe at most 3^d cells instead of every microcluster.
+    Occupied cell prefixes are counted too, so a probe stops extending a
+    prefix as soon as no occupied cell starts with it. Microclusters are
+    identified by their row in the MicroClusterSet.
+
+    For lookups of whole batches, the cell of every row is also kept in an
+    array, and the occupied cells are sorted from it on the first batch after
+    microclusters were added or removed.
+    """
+    def __init__(self, cellSize: float, rows= (), centers= ()):
+        self.cellSize = cellSize
+        self.cells = dict()         # cell -> set of rows centered in it
+        self.cellOf = dict()        # row -> its cell
+        self.prefixes = dict()      # cell[:k] for k < d -> no of occupied cells below it
+        self.rowCells = None        # cellOf as an array, by row
+        self.indexed = np.zeros(0, dtype= bool)  # rows in cellOf
+        self.arrays = None          # (cells, starts, rows) of getCandidatePairs, None when stale
+        for row, center in zip(rows, centers):
+            self.add(row, center)
+
+    def __len__(self):
+        return len(self.cellOf)
+
+    def __iter__(self):
+        return iter(self.cellOf)
+
+    def getCell (self, point: np.ndarray):
+        """Return the cell a point falls into"""
+        return tuple(np.floor(point / self.cellSize).astype(np.int64).tolist())
+
+    def add (self, row: int, center: np.ndarray):
+        """Index a microcluster at its current center"""
+        cell = self.getCell(center)
+        self.cellOf[row] = cell
+        if row >= len(self.indexed):
+            self._grow(row, len(cell))
+        self.rowCells[row] = cell
+        self.indexed[row] = True
+        self.arrays = None
+        members = self.cells.get(cell)
+        if members is None:
+            members = self.cells[cell] = set()
+            for k in range(1, len(cell)):
+                self.prefixes[cell[:k]] = self.prefixes.get(cell[:k], 0) + 1
+        members.add(row)
+
+    def _grow (self, row: int, d: int):
+        capacity = max(2*len(self.indexed), row + 1, 256)
+        rowCells, indexed = self.rowCells, self.indexed
+        self.rowCells = np.zeros((capacity, d), dtype= np.int64)
+        self.indexed = np.zeros(capacity, dtype= bool)
+        if rowCells is not None:
+            self.rowCells[:len(rowCells)] = rowCells
+        self.indexed[:len(indexed)] = indexed
+
+    def remove (self, row: int):
+        """Drop a microcluster from the index"""
+        cell = self.cellOf.pop(row)
+        self.indexed[row] = False
+        self.arrays = None
+        members = self.cells[cell]
+        members.discard(row)
+        if len(members) == 0:
+            del self.cells[cell]
+            for k in range(1, len(cell)):
+                count = self.prefixes[cell[:k]] - 1
+                if count == 0:
+                    del self.prefixes[cell[:k]]
+                else:
+                    self.prefixes[cell[:k]] = count
+
+    def move (self, row: int, center: np.ndarray):
+        """Re-index a microcluster after its center changed"""
+        cell = self.getCell(center)
+        if cell != self.cellOf[row]:
+            self.remove(row)
+            self.add(row, center)
+
+    def getCandidates (self, sample: np.ndarray) -> np.ndarray:
+        """Return rows centered in the sample's cell or an adjacent one"""
+        base = self.getCell(sample)
+        # extend neighbor prefixes one dimension at a time, keeping occupied ones
+        frontier = [()]
+        for b in base[:-1]:
+            frontier = [p + (c,) for p in frontier for c in (b - 1, b, b + 1) if p + (c,) in self.prefixes]
+        b = base[-1]
+        candidates = list()
+        for p in frontier:
+            for c in (b - 1, b, b + 1):
+                members = self.cells.get(p + (c,))
+                if members:
+                    candidates.extend(members)
+        return np.array(candidates, dtype= np.int64)
+
+    def getArrays (self):
+        """
+        Return (cells, starts, rows): the occupied cells in lexicographic
+        order, and the rows centered in cells[i] as rows[starts[i]:starts[i+1]]
+        """
+        if self.arrays is None:
+            rows = np.flatnonzero(self.indexed)
+            rows = rows[np.lexsort(self.rowCells[rows].T[::-1])]
+            cells = self.rowCells[rows]
+            first = np.flatnonzero(np.r_[True, np.any(cells[1:] != cells[:-1], axis= 1)])
+            self.arrays = (cells[first], np.r_[first, len(rows)], rows)
+        return self.arrays
+
+    def getCandidatePairs (self, points: np.ndarray):
+        """
+        getCandidates of a whole batch: return (point, row) index arrays
+        pairing every point with the rows centered in its cell or an
+        adjacent one
+        """
+        none = np.zeros(0, dtype= np.int64)
+        if len(self.cellOf) == 0 or len(points) == 0:
+            return none, none
+        cells, starts, rows = self.getArrays()
+        query, inverse = np.unique(np.floor(points / self.cellSize).astype(np.int64), axis= 0, return_inverse= True)
+        inverse = inverse.reshape(-1)
+
+        # the cells sharing the first k coordinates with a neighbor of a query
+        # cell are a contiguous run of the sorted cells, found by searching
+        # those coordinates packed into one integer; as the k-th one is the
+        # last packed, its three neighbor values make a single run too
+        k = min(cells.shape[1], 4)
+        while True:
+            low = np.minimum(cells[:, :k].min(axis= 0), query[:, :k].min(axis= 0)) - 1
+            span = np.maximum(cells[:, :k].max(axis= 0), query[:, :k].max(axis= 0)) + 2 - low
+            if k == 1 or np.prod(span.astype(float)) < 2**62:
+                break
+            k -= 1
+        weights = np.cumprod(np.r_[span[1:], 1][::-1])[::-1]
+        keys = sum((cells[:, j] - low[j]) * weights[j] for j in range(k))
+        offsets = np.array(list(itertools.product((-1, 0, 1), repeat= k - 1)) or [()], dtype= np.int64)
+        offsets = np.c_[offsets, np.zeros(len(offsets), dtype= np.int64)] if k > 1 else np.zeros((1, 1), dtype= np.int64)
+        neighbors = sum((query[:, None, j] + offsets[:, j] - low[j]) * weights[j] for j in range(k)).ravel()
+        lo = np.searchsorted(keys, neighbors - 1, 'left')
+        n = np.searchsorted(keys, neighbors + 1, 'right') - lo
+
+        def spread (first, counts):
+            """first[i], first[i]+1, ... counts[i] of each, concatenated"""
+            return np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        qIdx = np.repeat(np.repeat(np.arange(len(query)), len(offsets)), n)
+        cIdx = spread(lo, n)
+        # the other coordinates one at a time, each drops most of the pairs
+        for j in range(k, cells.shape[1]):
+            near = np.absolute(cells[:, j][cIdx] - query[:, j][qIdx]) <= 1
+            qIdx, cIdx = qIdx[near], cIdx[near]
+
+        order = np.argsort(inverse, kind= 'stable')
+        perQuery = np.bincount(inverse, minlength= len(query))
+        firstPoint = np.cumsum(perQuery) - perQuery
+
+        # cells to their rows, then query cells to their points
+        counts = np.diff(starts)[cIdx]
+        qIdx, rIdx = np.repeat(qIdx, counts), rows[spread(starts[cIdx], counts)]
+        counts = perQuery[qIdx]
+        return order[spread(firstPoint[qIdx], counts)], np.repeat(rIdx, counts)
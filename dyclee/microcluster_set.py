@@ -0,0 +1,151 @@
+import numpy as np
+from forget_methods import Decay
+
+
+class MicroClusterSet:
+    """
+    All microclusters of a DyClee instance in contiguous arrays
+
+    Row i holds the characteristic feature of microcluster i: n, LS, SS, tl
+    and ts as in CF, plus its cluster label. Rows are appended and the
+    arrays grow by doubling, so reachability and distance checks against
+    many microclusters are single NumPy operations over a set of rows.
+
+    Decay is lazy: n, LS and SS are as of the last update tl, and the
+    forgetting function is only applied when a microcluster is updated or
+    its weight is read at some time now.
+    """
+    def __init__(self, hyperboxSizePerFeature: np.ndarray, decay_function: Decay= None, capacity: int= 256):
+        self.hyperboxSizePerFeature = hyperboxSizePerFeature
+        self.hypervolume = np.prod(hyperboxSizePerFeature)
+        self.decay_fn = decay_function
+        self.size = 0
+        self._alloc(capacity)
+
+    def _alloc (self, capacity):
+        d = len(self.hyperboxSizePerFeature)
+        self.capacity = capacity
+        self.n = np.zeros(capacity)             # no of objects in each microcluster
+        self.LS = np.zeros((capacity, d))       # linear sum of each feature
+        self.SS = np.zeros((capacity, d))       # squared sum of each feature
+        self.tl = np.zeros(capacity)            # last object assign time
+        self.ts = np.zeros(capacity)            # create time
+        self.label = np.full(capacity, -1, dtype= np.int64)
+
+    def _grow (self):
+        old = (self.n, self.LS, self.SS, self.tl, self.ts, self.label)
+        self._alloc(2*self.capacity)
+        for new, column in zip((self.n, self.LS, self.SS, self.tl, self.ts, self.label), old):
+            new[:len(column)] = column
+
+    def __len__ (self):
+        return self.size
+
+    def add (self, sample: np.ndarray, now: float) -> int:
+        """Create a microcluster from its first sample, return its row"""
+        if self.size == self.capacity:
+            self._grow()
+        row = self.size
+        self.size += 1
+        self.n[row] = 1
+        self.LS[row] = sample
+        self.SS[row] = np.square(sample)
+        self.tl[row] = now
+        self.ts[row] = now
+        self.label[row] = -1
+        return row
+
+    def extend (self, count: int, now: float) -> np.ndarray:
+        """Create count empty microclusters, return their rows"""
+        while self.size + count > self.capacity:
+            self._grow()
+        rows = np.arange(self.size, self.size + count)
+        self.size += count
+        self.n[rows] = 0
+        self.LS[rows] = 0
+        self.SS[rows] = 0
+        self.tl[rows] = now
+        self.ts[rows] = now
+        self.label[rows] = -1
+        return rows
+
+    def insertSample (self, row: int, sample: np.ndarray, now: float):
+        """Insert a new sample to the microcluster at row"""
+        decay = 1 if self.decay_fn is None else self.decay_fn.decay(now, self.tl[row])
+        self.n[row] = self.n[row]*decay + 1
+        self.LS[row] = self.LS[row]*decay + sample
+        self.SS[row] = self.SS[row]*decay + np.square(sample)
+        self.tl[row] = now
+
+    def insertBatch (self, rows: np.ndarray, samples: np.ndarray, now: float) -> np.ndarray:
+        """
+        Insert samples[i] to the microcluster at rows[i] for all i at once,
+        every touched microcluster is decayed once; return the touched rows
+        """
+        touched = np.unique(rows)
+        if self.decay_fn is not None:
+            decay = self.decay_fn.decay(now, self.tl[touched])
+            self.n[touched] *= decay
+            self.LS[touched] *= decay[:, None]
+            self.SS[touched] *= decay[:, None]
+        np.add.at(self.n, rows, 1)
+        np.add.at(self.LS, rows, samples)
+        np.add.at(self.SS, rows, np.square(samples))
+        self.tl[touched] = now
+        return touched
+
+    def getCenters (self, rows= None) -> np.ndarray:
+        """Return centers of the microclusters at rows (all by default)"""
+        if rows is None:
+            rows = slice(0, self.size)
+        return self.LS[rows] / self.n[rows, None]
+
+    def getWeights (self, rows= None, now: float= None) -> np.ndarray:
+        """Return no of objects of the microclusters at rows (all by default), decayed up to now"""
+        if rows is None:
+            rows = slice(0, self.size)
+        if self.decay_fn is None or now is None:
+            return self.n[rows]
+        return self.n[rows] * self.decay_fn.decay(now, self.tl[rows])
+
+    def getDensities (self, rows= None, now: float= None) -> np.ndarray:
+        """Return densities of the microclusters at rows (all by default), decayed up to now"""
+        return self.getWeights(rows, now) / self.hypervolume
+
+    def compact (self, keep: np.ndarray) -> np.ndarray:
+        """
+        Drop the microclusters not in the boolean mask keep, moving the
+        rest down in order; return the new row of every old one (-1 if dropped)
+        """
+        remap = np.full(self.size, -1, dtype= np.int64)
+        kept = np.flatnonzero(keep)
+        remap[kept] = np.arange(len(kept))
+        for column in (self.n, self.LS, self.SS, self.tl, self.ts, self.label):
+            column[:len(kept)] = column[kept]
+        self.size = len(kept)
+        return remap
+
+    def isWithinHyperbox (self, diff: np.ndarray) -> np.ndarray:
+        """Given feature wise differences (one row per pair), return which pairs are reachable"""
+        max_idx = np.argmax(diff, axis= 1)          # feature with max difference per pair
+        # modified overlap removing factor of 1/2 from paper
+        return diff[np.arange(len(diff)), max_idx] < self.hyperboxSizePerFeature[max_idx]
+
+    def getReachable (self, rows: np.ndarray, sample: np.ndarray) -> np.ndarray:
+        """Return the rows whose microcluster is reachable from sample"""
+        diff = np.absolute(sample - self.getCenters(rows))     # feature wise difference of centers and sample
+        return rows[self.isWithinHyperbox(diff)]
+
+    def getClosest (self, rows: np.ndarray, sample: np.ndarray) -> int:
+        """Return the row closest to sample in terms of manhattan distance"""
+        dist = np.sum(np.absolute(sample - self.getCenters(rows)), axis= 1)
+        return rows[np.argmin(dist)]
+
+    def getDirectlyConnected (self, row: int, rows: np.ndarray, maxNonOverlaps: int) -> np.ndarray:
+        """
+        Return the rows directly connected to the microcluster at row,
+        overlapping on all but at most maxNonOverlaps dimensions
+        """
+        diff = np.absolute(self.getCenters(rows) - self.getCenters(row))
+        nonOverlaps = np.count_nonzero(diff >= self.hyperboxSizePerFeature, axis= 1)
+        return rows[nonOverlaps <= maxNonOverlaps]
@@ -0,0 +1,38 @@
+class UnionFind:
+    """
+    Disjoint sets over microcluster rows
+
+    The root of every set is its smallest row, so the partition into sets
+    does not depend on the order of the unions.
+    """
+    def __init__(self, items= ()):
+        self.parent = dict()
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return item in self.parent
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add (self, item):
+        """Add item as a singleton set if not present yet"""
+        self.parent.setdefault(item, item)
+
+    def find (self, item):
+        """Return the root of the set holding item"""
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]     # path halving
+            item = parent[item]
+        return item
+
+    def union (self, a, b):
+        """Merge the sets holding a and b"""
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra < rb:
+            self.parent[rb] = ra
+        elif rb < ra:
+            self.parent[ra] = rb
@@ -0,0 +1,129 @@
+#!/bin/python
+
+# Offline DyClee benchmark: replays the recorded pox logs of
+# flow-data/<N>/poxLogs/test*.txt tick by tick through DyClee and reports
+# throughput, density phase latency, peak memory and cluster counts per N.
+#
+#   ./bench-dyclee.py [--hosts 10 20 40 80] [--batch] [--trace-memory] [--json report.json]
+
+import argparse
+import glob
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+sdn_fog_folder = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(sdn_fog_folder, 'ext'))
+sys.path.append(os.path.join(sdn_fog_folder, '..', 'dyclee'))
+from flow_features import CLUSTER_FEATURES, CSV_FIELDS, normalize
+from dyclee import Context, DyClee
+
+
+def loadTicks(numHosts: int):
+    """Feature blocks of every sampling tick of the recorded runs, in order"""
+    paths = glob.glob(os.path.join(sdn_fog_folder, 'flow-data', str(numHosts), 'poxLogs', 'test*.txt'))
+    paths.sort(key= lambda p: int(os.path.basename(p)[4:-4]))
+    ticks = list()
+    for path in paths:
+        data = pd.read_csv(path).rename(columns= CSV_FIELDS)
+        X = normalize(data)
+        times = data['time'].to_numpy()
+        # rows of one tick share its timestamp
+        bounds = np.flatnonzero(np.diff(times)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(times)]):
+            ticks.append((times[start], X[start:end]))
+    return ticks
+
+
+def peakRSS():
+    """Peak resident set size of this process in bytes"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss*1024
+
+
+def modelBytes(model: DyClee):
+    """Bytes held by the microcluster arrays"""
+    muCs = model.microClusters
+    return sum(a.nbytes for a in (muCs.n, muCs.LS, muCs.SS, muCs.tl, muCs.ts, muCs.label))
+
+
+def bench(numHosts: int, relativeSize: float, cadence: int, batch: bool, traceMemory: bool):
+    ticks = loadTicks(numHosts)
+    if traceMemory:
+        tracemalloc.start()
+    model = DyClee(relativeSize, [Context(0.0, 1.0)] * len(CLUSTER_FEATURES))
+
+    samples = 0
+    phase1 = 0.0
+    phase2 = list()
+    for i, (now, X) in enumerate(ticks):
+        start = time.perf_counter()
+        if batch:
+            model.partial_fit(X, now)
+        else:
+            for x in X:
+                model.step(x, now)
+        phase1 += time.perf_counter() - start
+        samples += len(X)
+        if (i + 1) % cadence == 0:
+            start = time.perf_counter()
+            model.densityBasedClustering(now)
+            phase2.append(time.perf_counter() - start)
+    model.densityBasedClustering(ticks[-1][0] if ticks else None)
+
+    tracedPeak = None
+    if traceMemory:
+        tracedPeak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    labels = model.microClusters.label[:model.numMicroClusters]
+    phase2 = np.array(phase2) if phase2 else np.zeros(1)
+    return {
+        'hosts': numHosts,
+        'ticks': len(ticks),
+        'samples': samples,
+        'samples_per_sec': samples / phase1 if phase1 > 0 else 0.0,
+        'phase2_mean_ms': 1e3 * float(np.mean(phase2)),
+        'phase2_p95_ms': 1e3 * float(np.percentile(phase2, 95)),
+        'phase2_max_ms': 1e3 * float(np.max(phase2)),
+        'peak_rss_mb': peakRSS() / 2**20,
+        'traced_peak_mb': tracedPeak,
+        'model_mb': modelBytes(model) / 2**20,
+        'microclusters': model.numMicroClusters,
+        'outlier_microclusters': len(model.OList),
+        'clusters': len(np.unique(labels[labels >= 0])),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description= "Benchmark DyClee over the recorded flow data")
+    parser.add_argument('--hosts', type= int, nargs= '+', default= [10, 20, 40, 80])
+    parser.add_argument('--relative-size', type= float, default= 0.06)
+    parser.add_argument('--cadence', type= int, default= 10, help= "ticks between density phases")
+    parser.add_argument('--batch', action= 'store_true', help= "feed ticks through partial_fit instead of step")
+    parser.add_argument('--trace-memory', action= 'store_true',
+                        help= "trace the peak memory allocated while clustering (slows it down)")
+    parser.add_argument('--json', help= "also write the results to this file")
+    args = parser.parse_args()
+
+    results = list()
+    for numHosts in args.hosts:
+        # a fresh process per N so peak memory is not carried over
+        with ProcessPoolExecutor(max_workers= 1, mp_context= get_context('spawn')) as pool:
+            results.append(pool.submit(bench, numHosts, args.relative_size, args.cadence, args.batch,
+                                       args.trace_memory).result())
+
+    columns = ['hosts', 'samples', 'samples_per_sec', 'phase2_mean_ms', 'phase2_p95_ms', 'phase2_max_ms',
+               'peak_rss_mb', 'traced_peak_mb', 'model_mb', 'microclusters', 'outlier_microclusters', 'clusters']
+    print(pd.DataFrame(results, columns= columns).to_string(index= False, float_format= '{:.2f}'.format))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent= 2)
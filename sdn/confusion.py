@@ -1,5 +1,6 @@
 #!/bin/python
 
+import os
 import sys
 from doctest import testmod
 from unittest import result
@@ -7,6 +8,12 @@ import numpy as np
 import pandas as pd
 import ipaddress
 
+from evaluate import loadGroundTruth, labelFlows
+# features are computed as online, by the controller's ext/ modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ext'))
+from flow_features import PREDICTOR_FORMAT as predictor_format, ips_to_int, ip_octets
+from model_registry import load_model
+
 #@title number of hosts
 # choose number of hosts to generate combined_train.csv
 numHosts = int(sys.argv[1])
@@ -15,54 +22,13 @@ models = ['dtree_depth5', 'dtree_depth10', 'random_forest50_depth10', 'lin_loglo
 sdn_fog_folder = './'
 
 def ParseCSV(hostNum:int, runId:int, model_descriptor:str):
-  folderpath = sdn_fog_folder + '/flow-data/' + str(hostNum) + '/'
-  send_params_path = folderpath + 'pcaps/' + str(runId) + '/sendParams.csv'
-  topo_path = folderpath + 'pcaps/' + str(runId) + '/topo.csv'
-
   # classified pox log
   flow_log_path = sdn_fog_folder + 'test-data/' + model_descriptor + '/' +str(hostNum) + '/test' + str(runId) + '.txt'
 
-  topo = dict()
-  with open(topo_path, 'r') as f:
-    lines = f.readlines()[1:]
-    for line in lines:
-      s = line.split(',')
-      topo[s[0]] = s[1][:-3]
-
-  # print(topo)
-
-  flow_labels = dict()
-  ports = list()
-
-  with open(send_params_path, 'r') as f:
-    lines = f.readlines()[1:]
-    for line in lines:
-      comps = line.split(',')
-      nw_src = topo[comps[0]]
-      nw_dst = comps[1]
-
-      flow_labels[hash(''.join([nw_src, nw_dst]))] = 1 if "Telnet" in comps[-1] else 0
-      flow_labels[hash(''.join([nw_dst, nw_src]))] = flow_labels[hash(''.join([nw_src, nw_dst]))]
-      ports.append(int(comps[2]))
-
-  # print(flow_labels)
-  # print(ports)
-
+  # labels from the run's ground truth, matched on the (source IP, dest IP)
+  # pair of the flows that use one of the client ports
   data = pd.read_csv(flow_log_path)
-
-  labels = list()
-  for i in range(len(data)):
-    flow = data.iloc[i, :]
-    nw_src = flow['source.IP']
-    nw_dst = flow['dest.IP']
-    tp_src = flow['source.port']
-    tp_dst = flow['dest.port']
-    key = hash(''.join([nw_src, nw_dst]))
-    if (tp_src in ports) or (tp_dst in ports):
-      labels.append(flow_labels[key])
-    else:
-      labels.append(0)
-  data['labels'] = pd.Series(labels)
+  data['labels'] = labelFlows(data, loadGroundTruth(hostNum, runId))
 
   # print(data.head())
   #data.to_csv(folderpath + "/labeled_flow.csv", index= False)
@@ -102,52 +68,35 @@ class IPTransformer(BaseEstimator, TransformerMixin):
     pass
 
   def parseIP(self, ip_list):
-    ip1 = []
-    ip2 = []
-    ip3 = []
-    ip4 = []
-    for ip in ip_list:
-      s = ip.split('.')
-      # print(s)
-      ip1.append(int(s[0]))
-      ip2.append(int(s[1]))
-      ip3.append(int(s[2]))
-      ip4.append(int(s[3]))
-    
-    return ip1, ip2, ip3, ip4
+    """(n, 4) octets of dotted quad IPs, split from their uint32 value"""
+    return ip_octets(ips_to_int(ip_list))
   
   def fit(self, X, y=None):
     return self
 
   def transform(self, X):
-    df = pd.DataFrame(columns= cols)
     if isinstance(X, pd.Series):
       # print("series input")
-      df = df.append(X, ignore_index= True)
-    else:
-      # print("dataframe input")
-      df = pd.concat([df, X], ignore_index= True)
+      X = X.to_frame().T
+    # cols first, then whatever else X has
+    df = X.reindex(columns= cols + [c for c in X.columns if c not in cols]).reset_index(drop= True)
 
-    nw_src_list = df['source.IP']
-    nw_dst_list = df['dest.IP']
-    src_ip_parsed = self.parseIP(nw_src_list)
-    dst_ip_parsed = self.parseIP(nw_dst_list)
+    src_ip_parsed = self.parseIP(df['source.IP'])
+    dst_ip_parsed = self.parseIP(df['dest.IP'])
 
     df = df.drop(['source.IP', 'dest.IP'], axis= 1)
 
     for i in range(4):
-      df['source.IP.'+ str(i+1)] = pd.Series(np.array(src_ip_parsed[i]))
-      df['dest.IP.'+ str(i+1)] = pd.Series(np.array(dst_ip_parsed[i]))
+      df['source.IP.'+ str(i+1)] = src_ip_parsed[:, i]
+      df['dest.IP.'+ str(i+1)] = dst_ip_parsed[:, i]
     
     
     return df
 
-import pickle
-
 def getIP(instance, type:str):
     ip = 0
     for i in range(4):
-        ip += instance[type + '.IP.'+ str(i+1)] << 8*(3-i)
+        ip += int(instance[type + '.IP.'+ str(i+1)]) << 8*(3-i)
     return ip
 
 def testModel(numHosts:int, runId:int, model_descriptor:str, file):
@@ -161,10 +110,10 @@ def testModel(numHosts:int, runId:int, model_descriptor:str, file):
     X = parsed_test.drop(['labels'], axis= 1)
 
     model_file = sdn_fog_folder + 'model/' + str(numHosts) + '/' + model_descriptor + '.pth'
-    model = pickle.load(open(model_file, 'rb'))
-    result = model.score(X, y)
+    model = load_model(model_file, predictor_format)
+    pred = model.predict(X.loc[:, predictor_format].to_numpy(dtype= 'float64'))
+    result = np.mean(pred == np.asarray(y))
     
-    pred = model.predict(X)
     tp,tn,fp,fn = 0,0,0,0
     for i in range(len(y)):
         if y[i] == 0 and pred[i] == 0: tn += 1
@@ -0,0 +1,269 @@
+#!/bin/python
+
+# Parallel evaluation of the trained classifiers on the classified replay logs
+# test-data/<model>/<N>/test<run>.txt against the ground truth of
+# flow-data/<N>/pcaps/<run>/{sendParams,topo}.csv.
+#
+# Ground truth is parsed once per run, parsed feature matrices are cached
+# under test-data/.cache (until the log or the ground truth changes), and model x run jobs are spread over a process
+# pool where every worker loads each model from the registry at most once.
+# All results go to a single report, with the time to first correct
+# detection of every host summarized per model.
+#
+#   ./evaluate.py 10 20 40 80 [--models ...] [--runs 7 8 9 10] [--workers 8] [--legacy]
+
+import argparse
+import ipaddress
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+models = ['dtree_depth5', 'dtree_depth10', 'random_forest50_depth10', 'lin_logloss_sgd_stop10', 'lin_logloss_sgd_stop15', 'lin_logloss_sgd_nostop', 'gaussianNB']
+
+sdn_fog_folder = os.path.dirname(os.path.abspath(__file__))
+cache_folder = os.path.join(sdn_fog_folder, 'test-data', '.cache')
+sys.path.append(os.path.join(sdn_fog_folder, 'ext'))
+from flow_features import PREDICTOR_FORMAT as predictor_format, ips_to_int, predictor_matrix
+from model_registry import load_model
+
+serverIP = (10 << 24) + 1
+
+
+## GROUND TRUTH
+def pairKeys(src, dst):
+    """(source IP, dest IP) pairs, both as uint32, packed into one uint64 key"""
+    return (np.asarray(src, dtype= np.uint64) << np.uint64(32)) | np.asarray(dst, dtype= np.uint64)
+
+def groundTruthFiles(numHosts: int, runId: int):
+    """(topo.csv, sendParams.csv) paths of a run"""
+    folderpath = os.path.join(sdn_fog_folder, 'flow-data', str(numHosts), 'pcaps', str(runId))
+    return os.path.join(folderpath, 'topo.csv'), os.path.join(folderpath, 'sendParams.csv')
+
+def loadGroundTruth(numHosts: int, runId: int):
+    """
+    Return (keys, labels, ports) of a run: the sorted pairKeys of every
+    client/server pair in both directions with their label (1 for Telnet,
+    0 otherwise), and the client ports of all of them
+    """
+    topoPath, paramsPath = groundTruthFiles(numHosts, runId)
+    topo = pd.read_csv(topoPath)
+    params = pd.read_csv(paramsPath)
+    params = params.merge(topo, on= 'host', how= 'left')
+
+    client = ips_to_int(params['IP'].str.split('/').str[0])
+    server = ips_to_int(params['serverIP'])
+    label = params['proto'].str.contains('Telnet').to_numpy(dtype= 'int64')
+    pairs = pd.DataFrame({'key': np.concatenate([pairKeys(client, server), pairKeys(server, client)]),
+                          'label': np.concatenate([label, label])})
+    # a pair listed twice keeps its last label
+    pairs = pairs.drop_duplicates('key', keep= 'last').sort_values('key')
+    return pairs['key'].to_numpy(), pairs['label'].to_numpy(), np.unique(params['port'].to_numpy(dtype= 'int64'))
+
+
+def labelFlows(data: pd.DataFrame, truth, srcIP= None, dstIP= None):
+    """Ground truth label of every row of a flow log, srcIP/dstIP are its IPs as uint32 if already known"""
+    keys, labels, ports = truth
+    if len(keys) == 0:
+        return np.zeros(len(data), dtype= 'int64')
+    if srcIP is None:
+        srcIP = ips_to_int(data['source.IP'])
+        dstIP = ips_to_int(data['dest.IP'])
+    flowKeys = pairKeys(srcIP, dstIP)
+    idx = np.minimum(np.searchsorted(keys, flowKeys), len(keys) - 1)
+    known = keys[idx] == flowKeys
+    onPort = np.isin(data['source.port'].to_numpy(), ports) | np.isin(data['dest.port'].to_numpy(), ports)
+    return np.where(known & onPort, labels[idx], 0).astype('int64')
+
+
+## FEATURES
+def loadFeatures(numHosts: int, runId: int, model_descriptor: str, truth):
+    """
+    Return (X, y, times, srcIP, dstIP) of a classified log, reading them
+    from the cache if neither the log nor the ground truth its labels y
+    come from changed since it was written
+    """
+    log_path = os.path.join(sdn_fog_folder, 'test-data', model_descriptor, str(numHosts), 'test' + str(runId) + '.txt')
+    cache_path = os.path.join(cache_folder, model_descriptor, str(numHosts), 'test' + str(runId) + '.npz')
+    sources = np.array([os.path.getmtime(p) for p in (log_path,) + groundTruthFiles(numHosts, runId)])
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if 'sources' in cached and np.array_equal(cached['sources'], sources):
+                return cached['X'], cached['y'], cached['times'], cached['srcIP'], cached['dstIP']
+
+    data = pd.read_csv(log_path)
+    srcIP = ips_to_int(data['source.IP'])
+    dstIP = ips_to_int(data['dest.IP'])
+    X = predictor_matrix(data['source.port'], data['dest.port'], data[predictor_format[2:7]], srcIP, dstIP)
+    y = labelFlows(data, truth, srcIP, dstIP)
+    times = data['time'].to_numpy(dtype= 'float64')
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok= True)
+    tmp_path = cache_path[:-len('.npz')] + '.tmp.npz'
+    np.savez(tmp_path, X= X, y= y, times= times, srcIP= srcIP, dstIP= dstIP, sources= sources)
+    os.replace(tmp_path, cache_path)
+    return X, y, times, srcIP, dstIP
+
+
+## EVALUATION
+def loadModel(numHosts: int, model_descriptor: str):
+    """A model from the registry, loaded once per worker process"""
+    return load_model(os.path.join(sdn_fog_folder, 'model', str(numHosts), model_descriptor + '.pth'), predictor_format)
+
+def firstDetections(y, pred, times, srcIP, dstIP):
+    """
+    For every (client, server) pair of the flows to the server, in order of
+    appearance: a DataFrame indexed by client IP with
+      first_iter  its flow records up to and including the first one the
+                  model got right (all of them if it never did)
+      first_delay seconds from its first record to that one (nan if never)
+      attack      whether any of its records is labeled as attack
+    """
+    toServer = np.flatnonzero(dstIP == serverIP)
+    if len(toServer) == 0:
+        return pd.DataFrame({'first_iter': np.zeros(0, dtype= 'int64'), 'first_delay': np.zeros(0),
+                             'attack': np.zeros(0, dtype= bool)}, index= pd.Index(srcIP[toServer], name= 'host'))
+    keys = pairKeys(srcIP[toServer], dstIP[toServer])
+    # a stable sort keeps the records of every pair in log order
+    sort = np.argsort(keys, kind= 'stable')
+    keys, rows = keys[sort], toServer[sort]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    position = np.arange(len(keys)) - np.repeat(starts, counts)
+
+    # position of the first correct record of each pair, len(keys) if none
+    first = np.minimum.reduceat(np.where(pred[rows] == y[rows], position, len(keys)), starts)
+    detected = first < counts
+    t = times[rows]
+    pairs = pd.DataFrame({
+        'first_iter': np.where(detected, first + 1, counts),
+        'first_delay': np.where(detected, t[starts + np.minimum(first, counts - 1)] - t[starts], np.nan),
+        'attack': np.maximum.reduceat(y[rows], starts) > 0,
+    }, index= pd.Index(srcIP[rows[starts]], name= 'host'))
+    # back to the order the pairs first show up in the log
+    return pairs.iloc[np.argsort(rows[starts])]
+
+def delayStats(delays):
+    """p50/p95/max of the detection delays (nan for never detected) of some hosts"""
+    delays = np.asarray(delays, dtype= 'float64')
+    found = delays[~np.isnan(delays)]
+    stats = {'clients': int(len(delays)), 'detected': int(len(found))}
+    for name, q in (('p50', 50), ('p95', 95), ('max', 100)):
+        stats[name] = float(np.percentile(found, q)) if len(found) else None
+    return stats
+
+def evaluate(numHosts: int, runId: int, model_descriptor: str, truth):
+    """Score one model on one run"""
+    start = time.time()
+    result = {'hosts': numHosts, 'run': runId, 'model': model_descriptor}
+    try:
+        X, y, times, srcIP, dstIP = loadFeatures(numHosts, runId, model_descriptor, truth)
+        model = loadModel(numHosts, model_descriptor)
+        pred = np.asarray(model.predict(X)).astype('int64')
+    except Exception as e:
+        result['error'] = "{}: {}".format(type(e).__name__, e)
+        return result
+
+    pairs = firstDetections(y, pred, times, srcIP, dstIP)
+    hosts = [str(ipaddress.IPv4Address(int(ip))) for ip in pairs.index]
+    result.update({
+        'flows': int(len(y)),
+        'accuracy': float(np.mean(pred == y)) if len(y) else 0.0,
+        'tp': int(np.sum((y == 1) & (pred == 1))),
+        'tn': int(np.sum((y == 0) & (pred == 0))),
+        'fp': int(np.sum((y == 0) & (pred == 1))),
+        'fn': int(np.sum((y == 1) & (pred == 0))),
+        'first_iter': dict(zip(hosts, pairs['first_iter'].tolist())),
+        'first_delay': {ip: None if np.isnan(d) else d for ip, d in zip(hosts, pairs['first_delay'].tolist())},
+        'attack_hosts': [ip for ip, a in zip(hosts, pairs['attack']) if a],
+        'delay': delayStats(pairs['first_delay']),
+        'attack_delay': delayStats(pairs['first_delay'][pairs['attack'].to_numpy()]),
+        'seconds': time.time() - start,
+    })
+    return result
+
+
+def detectionSummary(results):
+    """Detection delays of every model on every N, pooled over its runs"""
+    pooled = dict()
+    for r in results:
+        if 'error' in r:
+            continue
+        delays, attack = pooled.setdefault((r['hosts'], r['model']), ([], []))
+        attackers = set(r['attack_hosts'])
+        for ip, d in r['first_delay'].items():
+            delays.append(np.nan if d is None else d)
+            attack.append(ip in attackers)
+    rows = list()
+    for (numHosts, model), (delays, attack) in pooled.items():
+        delays = np.array(delays, dtype= 'float64')
+        for hosts, subset in (('all', delays), ('attack', delays[np.array(attack, dtype= bool)])):
+            rows.append(dict({'hosts': numHosts, 'model': model, 'of': hosts}, **delayStats(subset)))
+    return rows
+
+
+def writeLegacy(results):
+    """Per run files in the formats test-ml-models.py and confusion.py write"""
+    totals = dict()
+    for r in results:
+        if 'error' in r:
+            continue
+        folder = os.path.join(sdn_fog_folder, 'test-data', r['model'], str(r['hosts']))
+        with open(os.path.join(folder, 'test' + str(r['run']) + '.csv'), 'w') as f:
+            f.write('host,first_iter,first_delay\n')
+            for ip, itr in r['first_iter'].items():
+                delay = r['first_delay'][ip]
+                f.write(ip + ',' + str(itr) + ',' + ('' if delay is None else str(delay)) + '\n')
+            f.write('accuracy,' + str(r['accuracy']) + '\n')
+        with open(os.path.join(folder, 'confusion' + str(r['run']) + '.csv'), 'w') as f:
+            f.write('tp,tn,fp,fn\n')
+            f.write(','.join(str(r[k]) for k in ('tp', 'tn', 'fp', 'fn')) + '\n')
+        total = totals.setdefault(folder, [0, 0, 0, 0])
+        for i, k in enumerate(('tp', 'tn', 'fp', 'fn')):
+            total[i] += r[k]
+    for folder, total in totals.items():
+        with open(os.path.join(folder, 'confusion_avg.csv'), 'w') as f:
+            f.write('tp,tn,fp,fn\n')
+            f.write(','.join(str(t) for t in total) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description= "Evaluate the classifiers on the replayed flow logs")
+    parser.add_argument('hosts', type= int, nargs= '+')
+    parser.add_argument('--models', nargs= '+', default= models)
+    parser.add_argument('--runs', type= int, nargs= '+', default= list(range(7, 11)))
+    parser.add_argument('--workers', type= int, default= None)
+    parser.add_argument('--report', default= os.path.join(sdn_fog_folder, 'test-data', 'report.json'))
+    parser.add_argument('--legacy', action= 'store_true', help= "also write the per run csv files of test-ml-models.py/confusion.py")
+    args = parser.parse_args()
+
+    start = time.time()
+    truths = {(n, r): loadGroundTruth(n, r) for n in args.hosts for r in args.runs}
+    results = list()
+    with ProcessPoolExecutor(max_workers= args.workers) as pool:
+        # a model's runs go out together so workers reuse the loaded model
+        jobs = [pool.submit(evaluate, n, r, m, truths[(n, r)]) for n in args.hosts for m in args.models for r in args.runs]
+        for job in as_completed(jobs):
+            results.append(job.result())
+    results.sort(key= lambda r: (r['hosts'], args.models.index(r['model']), r['run']))
+
+    detection = detectionSummary(results)
+    with open(args.report, 'w') as f:
+        json.dump({'elapsed': time.time() - start, 'results': results, 'detection': detection}, f, indent= 2)
+    if args.legacy:
+        writeLegacy(results)
+
+    summary = pd.DataFrame([r for r in results if 'error' not in r], columns= ['hosts', 'model', 'run', 'flows', 'accuracy', 'tp', 'tn', 'fp', 'fn'])
+    print(summary.to_string(index= False))
+    if detection:
+        print("\ndetection delay (s) per host, pooled over runs")
+        print(pd.DataFrame(detection).to_string(index= False, float_format= '{:.2f}'.format))
+    for r in results:
+        if 'error' in r:
+            print("{model} on {hosts} hosts, run {run}: {error}".format(**r))
+    print("{} jobs in {:.1f}s".format(len(results), time.time() - start))
@@ -0,0 +1,77 @@
+from pox.core import core
+from pox.lib.ioworker import RecocoIOLoop
+from pox.lib.ioworker.workers import BackoffWorker
+
+import json
+
+from telemetry_writer import encode_header, encode_batch
+
+log = core.getLogger()
+
+
+class FeatureExporter:
+    """
+    Streams every tick's flow records to a remote consumer over TCP
+
+    The socket is driven by a RecocoIOLoop, so sends never block the
+    controller, and the connection is re-established with backoff when it
+    drops. Each batch is framed either as one line of JSON ('ndjson') or as
+    length prefixed packed records ('bin', same framing as the binary
+    telemetry file, with the header resent on every new connection).
+
+    If more than max_buffer bytes are still waiting to go out, the consumer
+    is not keeping up and the tick is dropped. Flow counters are
+    cumulative, so the next batch that gets through supersedes the lost ones.
+    """
+    def __init__ (self, host, port, encoding= 'ndjson', max_buffer= 1 << 20):
+        assert encoding in ('ndjson', 'bin'), "unknown export encoding {}".format(encoding)
+        self.encoding = encoding
+        self.max_buffer = max_buffer
+        self.sent = 0
+        self.dropped = 0
+
+        self._worker = None
+        self._header_sent = False
+        self._loop = RecocoIOLoop()
+        self._loop.start()
+        BackoffWorker.begin(loop= self._loop, addr= str(host), port= int(port),
+                            connect_callback= self._handle_connect,
+                            disconnect_callback= self._handle_disconnect)
+
+    def _handle_connect (self, worker):
+        log.debug("feature consumer connected at %s:%s", worker.addr, worker.port)
+        self._worker = worker
+        self._header_sent = False
+
+    def _handle_disconnect (self, worker):
+        log.debug("feature consumer at %s:%s went away", worker.addr, worker.port)
+        if self._worker is worker:
+            self._worker = None
+
+    def encode (self, records):
+        """Frame one batch of flow records"""
+        if self.encoding == 'bin':
+            data = encode_batch(records)
+            if not self._header_sent:
+                data = encode_header(records.dtype) + data
+                self._header_sent = True
+            return data
+        batch = {'columns': list(records.dtype.names), 'rows': records.tolist()}
+        return (json.dumps(batch, separators= (',', ':')) + '\n').encode('utf-8')
+
+    def export (self, records):
+        """Queue a batch for sending, return False if it was dropped"""
+        worker = self._worker
+        if worker is None or worker.closed or len(worker.send_buf) > self.max_buffer:
+            self.dropped += 1
+            return False
+        worker.send(self.encode(records))
+        self.sent += 1
+        return True
+
+    def stop (self):
+        if self._worker is not None:
+            self._worker.disconnect_callback = lambda worker: False     # don't reconnect
+            self._worker.close()
+            self._worker = None
+        self._loop.stop()
@@ -0,0 +1,99 @@
+from pox.core import core
+from pox.lib.revent import Event, EventMixin
+
+import os
+import sys
+
+import numpy as np
+
+from flow_features import CLUSTER_FEATURES, normalize
+
+# DyClee lives at the top of the project and uses flat imports of its own
+_DYCLEE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'dyclee')
+if _DYCLEE_PATH not in sys.path:
+    sys.path.append(_DYCLEE_PATH)
+from dyclee import Context, DyClee
+from forget_methods import ExponentialDecay
+import checkpoint
+
+log = core.getLogger()
+
+
+class FlowsClustered (Event):
+    """
+    Cluster labels of one tick's flow records
+
+    labels[i] is the cluster of records[i] as of the last density phase, -1
+    for flows in outlier (or not yet clustered) microclusters.
+    reclustered tells whether the density phase ran on this tick.
+    """
+    def __init__ (self, records, labels, reclustered):
+        super(FlowsClustered, self).__init__()
+        self.records = records
+        self.labels = labels
+        self.reclustered = reclustered
+
+    @property
+    def outliers (self):
+        return self.labels < 0
+
+
+class FlowClusterer (EventMixin):
+    """
+    Unsupervised counterpart of the flow classifier
+
+    Every tick's flow records are fed to DyClee's distance phase as one block;
+    the density phase, which relabels the microclusters, runs every cadence
+    ticks. Each tick raises FlowsClustered with a label per record.
+
+    With decay (per second) set, microclusters fade exponentially with the
+    time since they last received a flow, and once they weigh less than
+    min_weight they are pruned at the density phase.
+
+    With a checkpoint path, the model is restored from it if it exists and
+    written back every checkpoint_every ticks and at shutdown, from a
+    background thread.
+    """
+    _eventMixin_events = set([FlowsClustered])
+
+    def __init__ (self, relative_size= 0.06, cadence= 10, max_non_overlaps= 0, decay= None, min_weight= None,
+                  checkpoint_path= None, checkpoint_every= 60):
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.dyclee = checkpoint.load(checkpoint_path, mmap= True)
+            log.info("restored {} microclusters from {}".format(self.dyclee.numMicroClusters, checkpoint_path))
+        else:
+            context = [Context(0.0, 1.0)] * len(CLUSTER_FEATURES)
+            forget = None if decay is None else ExponentialDecay(decay)
+            self.dyclee = DyClee(relative_size, context, forget_method= forget, maxNonOverlaps= max_non_overlaps,
+                                 minWeight= min_weight)
+        self.cadence = cadence
+        self.ticks = 0
+        self.checkpoint_every = checkpoint_every
+        self.checkpointer = None
+        if checkpoint_path is not None:
+            self.checkpointer = checkpoint.BackgroundCheckpointer(checkpoint_path)
+
+    def push (self, records):
+        """Cluster one tick's flow records"""
+        now = records['time'][0] if len(records) > 0 else None
+        rows = self.dyclee.partial_fit(normalize(records), now)
+        self.ticks += 1
+        reclustered = self.ticks % self.cadence == 0
+        if reclustered:
+            remap = self.dyclee.densityBasedClustering(now)
+            if remap is not None:
+                # pruning renumbered the microclusters
+                rows = remap[rows]
+            log.debug("{} microclusters, {} outliers".format(self.dyclee.numMicroClusters, len(self.dyclee.OList)))
+        labels = self.dyclee.microClusters.label[rows]
+        labels[rows < 0] = -1
+        if self.checkpointer is not None and self.ticks % self.checkpoint_every == 0:
+            self.checkpointer.submit(self.dyclee)
+        self.raiseEvent(FlowsClustered, records, labels, reclustered)
+
+    def close (self):
+        """Write a last checkpoint, if checkpointing"""
+        if self.checkpointer is not None:
+            self.checkpointer.submit(self.dyclee)
+            self.checkpointer.close()
+            self.checkpointer = None
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# record fields clustered per flow, with the value they saturate at; they are
+# log scaled so the heavy tailed counters fill [0, 1] reasonably evenly
+CLUSTER_FEATURES = [('fwd_packets', 1e6), ('fwd_bytes', 1e9), ('bwd_packets', 1e6), ('bwd_bytes', 1e9),
+                    ('duration', 3600.0), ('iat', 60.0), ('rtt', 60.0)]
+
+# input of the supervised classifiers, in the column order they were trained with
+PREDICTOR_FORMAT = ['source.port', 'dest.port', 'fwd.total_packets', 'fwd.total_bytes', 'bwd.total_packets', 'bwd.total_bytes',
+                    'duration', 'source.IP.1', 'dest.IP.1', 'source.IP.2', 'dest.IP.2', 'source.IP.3', 'dest.IP.3',
+                    'source.IP.4', 'dest.IP.4']
+
+# record field of each column of the csv flow logs
+CSV_FIELDS = {'time': 'time', 'source.IP': 'nw_src', 'dest.IP': 'nw_dst', 'source.port': 'tp_src', 'dest.port': 'tp_dst',
+              'nw_proto': 'nw_proto', 'fwd.total_packets': 'fwd_packets', 'fwd.total_bytes': 'fwd_bytes',
+              'bwd.total_packets': 'bwd_packets', 'bwd.total_bytes': 'bwd_bytes', 'duration': 'duration',
+              'iat_est': 'iat', 'rtt_est': 'rtt'}
+
+
+def normalize (records):
+    """
+    Feature matrix of flow records scaled to [0, 1]; records is anything
+    indexed by record field, e.g. a structured array or a DataFrame with
+    its columns renamed by CSV_FIELDS
+    """
+    X = np.empty((len(records), len(CLUSTER_FEATURES)))
+    for i, (field, cap) in enumerate(CLUSTER_FEATURES):
+        X[:, i] = np.log1p(np.maximum(records[field], 0)) / np.log1p(cap)
+    return np.clip(X, 0.0, 1.0, out= X)
+
+
+def ips_to_int (ips):
+    """Dotted quad strings (any sequence or Series) as uint32 array"""
+    # logs repeat a handful of addresses, so only the distinct ones are parsed
+    codes, unique = pd.factorize(pd.Series(ips, copy= False).astype('str'))
+    octets = pd.Series(unique).str.split('.', expand= True).to_numpy(dtype= np.uint32).reshape(-1, 4)
+    return ((octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3])[codes]
+
+def ip_octets (ips):
+    """(n, 4) octets, most significant first, of IPs given as uint32"""
+    ips = np.asarray(ips, dtype= np.uint32)
+    return (ips[:, None] >> np.array([24, 16, 8, 0], dtype= np.uint32)) & 0xff
+
+
+def predictor_matrix (tp_src, tp_dst, counters, nw_src, nw_dst):
+    """
+    (n, 15) matrix in PREDICTOR_FORMAT order from ports, the (n, 5)
+    fwd/bwd packet & byte counters plus duration, and uint32 IPs; used
+    both online and in the offline evaluation so the models see the same
+    features in either case
+    """
+    X = np.empty((len(tp_src), len(PREDICTOR_FORMAT)), dtype= np.float64)
+    X[:, 0] = tp_src
+    X[:, 1] = tp_dst
+    X[:, 2:7] = counters
+    # octets of source & dest IP interleaved
+    X[:, 7::2] = ip_octets(nw_src)
+    X[:, 8::2] = ip_octets(nw_dst)
+    return X
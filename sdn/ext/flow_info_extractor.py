@@ -2,225 +2,138 @@ from pox.core import core
 import pox.openflow.libopenflow_01 as of
 from pox.lib.util import dpid_to_str
 from pox.openflow.of_json import flow_stats_to_list
+from pox.openflow.util import flow_stats_to_tuples
 import pox.lib.packet as pkt
 
 from time import time
-import csv
-import socket
+from collections import deque
 import json
 import os
-import copy
-import pickle
-import sklearn
+import numpy as np
 import pandas as pd
 
+from flow_store import FlowTable
+from flow_poller import FlowStatsPoller
+from telemetry_writer import TelemetryWriter
+from feature_exporter import FeatureExporter
+from inference_pool import InferencePool
+from flow_clusterer import FlowClusterer
+from flow_features import PREDICTOR_FORMAT
+from model_registry import load_model
+
 ## GLOBAL VARS
 # learning rates
 gamma_iat = 0.7
 gamma_rtt = 0.7
 # sampling period
 T = 1
+# flows missing from stats replies this long (in seconds) are evicted
+flow_idle_timeout = 30
 # pox logger
 log = core.getLogger()
 
-# dict to store data about unique flows 
-flows = {}      # current stats about flows
-history = {}    # stats about flow in previous sampling time
+# columnar store of unique flows, with their stats in previous sampling time
+flows = FlowTable()
 # header for csv with flow data stored
 header = ['time', 'source.IP', 'dest.IP', 'source.port', 'dest.port', 'nw_proto', 'fwd.total_packets', 'fwd.total_bytes', 'bwd.total_packets', 'bwd.total_bytes', 'duration', 'iat_est', 'rtt_est']
+header_summary = header + ['start_time', 'last_seen', 'reason']
 header_labeled = ['time', 'source.IP', 'dest.IP', 'source.port', 'dest.port', 'nw_proto', 'fwd.total_packets', 'fwd.total_bytes', 'bwd.total_packets', 'bwd.total_bytes', 'duration', 'iat_est', 'rtt_est', 'label']
-predictor_format = c = ['source.port', 'dest.port', 'fwd.total_packets', 'fwd.total_bytes','bwd.total_packets', 'bwd.total_bytes', 'duration',
-'source.IP.1', 'dest.IP.1', 'source.IP.2', 'dest.IP.2', 'source.IP.3',
-'dest.IP.3', 'source.IP.4', 'dest.IP.4']
-
-
-# def send_data(sock, data_list):
-#     data = str(data_list).encode('utf-8')
-#     sock.send(data)
+# online DyClee clustering of the emitted records, if enabled
+clusterer = None
+# flow stats poller driving the sampling ticks, set by launch()
+poller = None
+# label written for flows the classifier had no capacity for, or failed on
+unlabeled = -1
+# ticks of the inference pool waiting to be written, oldest first: a tick
+# goes out only once all before it have, so rows stay in time order
+pending = deque()
+predictor_format = c = PREDICTOR_FORMAT
 
 
 ## TIMER MODULE FUNCTION
-# timer function that invokes write-out periodically
-def _timer_func (writer, sock):
-    for connection in core.openflow._connections.values():
-        connection.send(of.ofp_stats_request(body=of.ofp_flow_stats_request()))
-        # connection.send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
-        log.debug("Sent flow stats request to %s", dpid_to_str(connection.dpid))
-        log.debug("updating flow stats in file...")
-        now = time()
-        for key, f in flows.items():
-            l = f.to_list(now)
-            writer.writerow(l)
-
-            flows[key].update_rtt_iat(key)                  # update iat & rtt every sampling time
-            history[key] = copy.deepcopy(flows[key])        # store current state in history
-            # send_data(sock, json.dumps(f.to_list()))
-
-def _timer_func_predictor(writer, sock, loaded_model):
-    for connection in core.openflow._connections.values():
-        connection.send(of.ofp_stats_request(body=of.ofp_flow_stats_request()))
-        # connection.send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
-        log.debug("Sent flow stats request to %s", dpid_to_str(connection.dpid))
-        log.debug("updating flow stats & predictions in file...")
-        now = time()
-        for key, f in flows.items():
-            l = f.to_list(now)
-            pred = loaded_model.predict(f.parse_for_prediction())[0]
-            l.append(pred)
-            writer.writerow(l)
-
-            flows[key].update_rtt_iat(key)                  # update iat & rtt every sampling time
-            history[key] = copy.deepcopy(flows[key])        # store current state in history
-            # send_data(sock, json.dumps(f.to_list()))
-
-
-
-
-## FLOW CLASS
-class Flow:
-    def __init__ (self, nw_src, nw_dst, tp_src, tp_dst, dpid, nw_proto, dl_type, packets=0, bytes=0):
-        # attributes that uniquely identify a flow
-        self.start_time = time()
-        self.nw_src = nw_src
-        self.nw_dst = nw_dst
-        self.tp_src = tp_src
-        self.tp_dst = tp_dst
-        self.dpid = dpid
-        self.nw_proto = nw_proto
-        self.dl_type = dl_type
-
-        # attributes that are collected over time
-        self.fwd_packets = packets
-        self.fwd_bytes = bytes
-        self.bwd_packets = 0
-        self.bwd_bytes = 0
-        self.duration = 0.00
-
-        # iat & rtt for further estimates
-        self.iat = 0.00
-        self.rtt = 0.00
-
-    def update_forward (self, packets, bytes, duration):
-        # curr_time = time()
-        self.fwd_packets = packets
-        self.fwd_bytes = bytes
-        self.duration = duration
-        # self.duration = time() - self.start_time
-
-    def update_reverse (self, packets, bytes, duration):
-        # curr_time = time()
-        self.bwd_packets = packets
-        self.bwd_bytes = bytes
-        self.duration = duration
-        # self.duration = time() - self.start_time
-
-    def update_rtt_iat (self, key):
-        # sampled info
-        del_f = self.fwd_packets - history[key].fwd_packets
-        del_b = self.bwd_packets - history[key].bwd_packets
-        d = self.duration - history[key].duration
-            
-        # debug info
-        # self.print_flow()
-        # history[key].print_flow()
-        # print("d = %f, del_f = %f, del_b = %f"%(d,del_f, del_b))
-            
-        # update rtt
-        if del_f == 0 and del_b == 0:
-          pass
-        if del_f > del_b and del_f != 0:
-           self.rtt = gamma_rtt*self.rtt + (1-gamma_rtt)*(del_b/del_f + (del_f - del_b)*2*d)/del_f
-        elif del_b > del_f and del_b != 0:
-           self.rtt = gamma_rtt*self.rtt + (1-gamma_rtt)*(del_f*d + (del_b - del_f)*2*d)/del_b
-        else:
-           pass
-            
-        # update iat
-        # if both directed flows are giving differences, take avg
-        if del_f != 0 and del_b != 0:
-            self.iat = gamma_iat*self.iat + (1-gamma_iat)*(d/del_f + d/del_b)/2
-        # else take the non zero one
-        elif del_f != 0:
-            self.iat = gamma_iat*self.iat + (1-gamma_iat)*(d/del_f)
-        elif del_b != 0:
-            self.iat = gamma_iat*self.iat + (1-gamma_iat)*(d/del_b)
-        # else don't update
-        else:
-            pass
-    
-    def parse_for_prediction (self):
-        nw_src_parsed = self.nw_src.split(".")
-        nw_dst_parsed = self.nw_dst.split(".")
-        t = self.to_list(0)
-        t = t[3:10]
-        for i in range(4):
-            t.append(nw_src_parsed[i])
-            t.append(nw_dst_parsed[i])
-        
-        df = pd.DataFrame([dict(zip(predictor_format, t))])
-        return df
-
-    def to_list (self, time):
-        return [time, self.nw_src, self.nw_dst, self.tp_src, self.tp_dst, self.nw_proto,
-            self.fwd_packets, self.fwd_bytes, self.bwd_packets,  self.bwd_bytes, self.duration,
-            self.iat, self.rtt]
-    
-    def print_flow (self):
-        print("flow [{}:{} -> {}:{}] stats => ({}, {}, {}, {}, {})".format(self.nw_src, self.tp_src, self.nw_dst, self.tp_dst, self.fwd_packets, self.fwd_bytes, self.bwd_packets, self.bwd_bytes, self.duration))
+# invoked by the poller once per sampling period to write out all flows
+def _timer_func (writer, exporter):
+    log.debug("updating flow stats in file...")
+    _emit(writer, exporter, flows.to_records(time()))
+    _advance()
+
+def _timer_func_predictor(writer, exporter, loaded_model):
+    log.debug("updating flow stats & predictions in file...")
+    if len(flows) == 0:
+        return
+    # one predict call for the whole tick instead of one per flow
+    preds = loaded_model.predict(flows.feature_matrix())
+    _emit(writer, exporter, flows.to_records(time(), preds))
+    _advance()
+
+def _timer_func_pool(writer, exporter, pool):
+    log.debug("updating flow stats & queueing predictions...")
+    if len(flows) == 0:
+        return
+    # the tick's records are written once the labels come back from the pool
+    tick = [flows.to_records(time(), unlabeled), False]
+    pending.append(tick)
+    def _labeled (preds):
+        if preds is not None:
+            tick[0]['label'] = preds
+        tick[1] = True
+        _flush(writer, exporter)
+    if not pool.submit(flows.feature_matrix(), _labeled):
+        log.debug("inference pool busy, writing tick unlabeled")
+        tick[1] = True
+        _flush(writer, exporter)
+    _advance()
+
+def _flush (writer, exporter, everything= False):
+    """Write the pending ticks that are done, or all of them"""
+    while pending and (everything or pending[0][1]):
+        _emit(writer, exporter, pending.popleft()[0])
+
+def _emit (writer, exporter, records):
+    """Hand the tick's records to the writer & exporter"""
+    if exporter is not None:
+        exporter.export(records)
+    writer.write_batch(records)
+    if clusterer is not None:
+        clusterer.push(records)
+
+def _advance ():
+    flows.update_rtt_iat(gamma_iat, gamma_rtt)      # update iat & rtt every sampling time
+    flows.snapshot()                                # store current state in history
+    flows.expire(time(), flow_idle_timeout)             # drop flows the switches no longer report
 
 
 ## RESPONSE HANDLER
 # handler to update flow statistics received in given file 
 def _handle_flowstats_received (event):
-    stats = flow_stats_to_list(event.stats)
-    # log.debug("flow stats received from %s: %s", dpid_to_str(event.connection.dpid), stats)
-    for f in stats:
-        # flow essential attributes
-        match = f['match']
-        proto = match['nw_proto']
-        nw_src = match['nw_src'][:-3]
-        nw_dst = match['nw_dst'][:-3]
-        # filter arp msgs
+    now = time()
+    dpid = event.connection.dpid
+    # log.debug("flow stats received from %s: %s", dpid_to_str(dpid), event.stats)
+    for (nw_src, nw_dst, tp_src, tp_dst, proto, dl_type,
+         packet_count, byte_count, duration_sec, duration_nsec) in flow_stats_to_tuples(event.stats):
+        # filter arp msgs and other non-IP entries, their addresses read as 0.0.0.0
+        if dl_type != pkt.ethernet.IP_TYPE:
+            continue
+        # and ICMP & IGMP ones
         if proto == 1 or proto == 2:
-        # if 'tp_src' not in match.keys():        # happens for ARP msg, need special care
-            # log.debug("[ skipping arp msg ]")
             continue
-        tp_src = match['tp_src']
-        tp_dst = match['tp_dst']
-        dpid = event.connection.dpid
-        dl_type = match['dl_type']
-        packet_count = f['packet_count']
-        byte_count = f['byte_count']
-        duration = f['duration_sec'] + f['duration_nsec']*1e-9
-
-        # key to find in hash table
-        fwd_key = hash(''.join([nw_src, nw_dst, str(tp_src), str(tp_dst), str(dpid)]))
-        bwd_key = hash(''.join([nw_dst, nw_src, str(tp_dst), str(tp_src), str(dpid)]))
-
-        # if the fwd flow is present
-        if fwd_key in flows.keys():
-            # log.debug("Updating forward flow")
-            #history[fwd_key] = copy.deepcopy(flows[fwd_key])
-            flows[fwd_key].update_forward(packet_count, byte_count, duration)
-        # if the bwd flow is also present
-        if bwd_key in flows.keys():
-            # log.debug("Updating backward flow")
-            #history[bwd_key] = copy.deepcopy(flows[bwd_key])
-            flows[bwd_key].update_reverse(packet_count, byte_count, duration)
-        
-        # else create flow entry for both direction flows
-        else:
-            flows[fwd_key] = Flow(nw_src, nw_dst, tp_src, tp_dst, dpid, proto, dl_type, packet_count, byte_count)
-            history[fwd_key] = Flow(nw_src, nw_dst, tp_src, tp_dst, dpid, proto, dl_type , 0, 0)        # zero count history
-            
-            flows[bwd_key] = Flow(nw_dst, nw_src, tp_dst, tp_src, dpid, proto, dl_type, packet_count, byte_count)
-            history[bwd_key] = Flow(nw_src, nw_dst, tp_src, tp_dst, dpid, proto, dl_type, 0, 0)         # zero count history 
-   # for key in flows.keys():
-   #     flows[key].update_rtt_iat(key)
+        duration = duration_sec + duration_nsec*1e-9
+        flows.update(nw_src, nw_dst, tp_src, tp_dst, proto, dpid, dl_type,
+                     packet_count, byte_count, duration, now)
 
 
+# handler to retire flows the switch removed, with their final counters
+def _handle_flow_removed (event):
+    (nw_src, nw_dst, tp_src, tp_dst, proto, dl_type,
+     packet_count, byte_count, duration_sec, duration_nsec), = flow_stats_to_tuples([event.ofp])
+    dpid = event.connection.dpid
+    if flows.find(nw_src, nw_dst, tp_src, tp_dst, proto, dpid) is None:
+        return
+    now = time()
+    flows.update(nw_src, nw_dst, tp_src, tp_dst, proto, dpid, dl_type,
+                 packet_count, byte_count, duration_sec + duration_nsec*1e-9, now)
+    flows.remove(nw_src, nw_dst, tp_src, tp_dst, proto, dpid, now)
 
-    
 
 # handler to display port statistics received in JSON format
 def _handle_portstats_received (event):
@@ -229,43 +142,67 @@ def _handle_portstats_received (event):
 
 
 
-def launch (filename, HOST= None, PORT = None, classifier= None):
-    from pox.lib.recoco import Timer
-
-    # attach listeners
-    core.openflow.addListenerByName("FlowStatsReceived", _handle_flowstats_received)
+def launch (filename, HOST= None, PORT = None, classifier= None, output_format= 'csv', rotate_bytes= None, rotate_secs= None,
+            export_format= 'ndjson', workers= None, max_in_flight= 2, idle_timeout= 30, max_flows= None,
+            cluster= False, cluster_size= 0.06, cluster_every= 10, cluster_decay= None, cluster_min_weight= 0.1,
+            cluster_checkpoint= None, cluster_checkpoint_every= 60):
+    global flow_idle_timeout, clusterer, poller
+    flow_idle_timeout = float(idle_timeout)
+    if max_flows is not None:
+        # checked by FlowTable like a constructor argument
+        flows.max_flows = int(max_flows)
     # core.openflow.addListenerByName("PortStatsReceived", _handle_portstats_received)
+    core.openflow.addListenerByName("FlowRemoved", _handle_flow_removed)
 
-    # prepare the csv file from given path
+    # output file from given path, written on a background thread
     path = "./poxLogs/"+filename
-    file = open(path, 'w+')
+    writer = TelemetryWriter(path, header if classifier is None else header_labeled, fmt= output_format,
+                             rotate_bytes= None if rotate_bytes is None else int(rotate_bytes),
+                             rotate_secs= None if rotate_secs is None else float(rotate_secs))
+    core.addListenerByName("GoingDownEvent", lambda event: writer.close())
     log.debug("opened log file {} successfully".format(path))
-    writer = csv.writer(file)
-    # writer.writerow(header)
 
+    # final records of evicted flows go to a file of their own
+    summary_writer = TelemetryWriter(path + ".summary", header_summary, fmt= output_format,
+                                     rotate_bytes= writer.rotate_bytes, rotate_secs= writer.rotate_secs)
+    core.addListenerByName("GoingDownEvent", lambda event: summary_writer.close())
+    flows.on_evict = summary_writer.write_batch
 
-    # data sending over network to data plane/intelligence
-    sock = None
+
+    # data streaming over network to data plane/intelligence
+    exporter = None
     if not (HOST is None or PORT is None):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((str(HOST), int(PORT)))
-            log.debug("successfully connected to server")
-        except:
-            log.debug("failure in socket")
+        exporter = FeatureExporter(HOST, PORT, encoding= export_format)
+        core.addListenerByName("GoingDownEvent", lambda event: exporter.stop())
+
+    # unsupervised labels, raised as FlowsClustered events on core.flow_clusterer
+    if cluster:
+        clusterer = FlowClusterer(relative_size= float(cluster_size), cadence= int(cluster_every),
+                                  decay= None if cluster_decay is None else float(cluster_decay),
+                                  min_weight= None if cluster_decay is None else float(cluster_min_weight),
+                                  checkpoint_path= cluster_checkpoint, checkpoint_every= int(cluster_checkpoint_every))
+        core.register("flow_clusterer", clusterer)
+        core.addListenerByName("GoingDownEvent", lambda event: clusterer.close())
 
     # load classifier
     if classifier is not None:
         classifier_path = "./model/" + classifier + ".pth"
-        loaded_model = pickle.load(open(classifier_path, 'rb'))
-        log.debug("successfully loaded model {}".format(classifier))
-        writer.writerow(header_labeled)
-            # timer to execute stats request periodically
-        Timer(T, _timer_func_predictor, args= [writer, sock, loaded_model], recurring=True)
-        
-    else:
-        writer.writerow(header)
-        # timer to execute stats request periodically
-        Timer(T, _timer_func, args= [writer, sock], recurring=True)
-
+        if workers is not None:
+            # evaluate the model in worker processes
+            pool = InferencePool(classifier_path, predictor_format, workers= int(workers), max_in_flight= int(max_in_flight))
+            core.addListenerByName("GoingDownEvent", lambda event: pool.shutdown())
+            # ticks still waiting on labels go out unlabeled, before the writer closes
+            core.addListenerByName("GoingDownEvent", lambda event: _flush(writer, exporter, everything= True),
+                                   priority= 1)
+            log.debug("started {} inference workers for model {}".format(workers, classifier))
+            poller = FlowStatsPoller(T, lambda: _timer_func_pool(writer, exporter, pool), _handle_flowstats_received)
+        else:
+            # feature schema is checked on load, prediction runs on NumPy arrays
+            loaded_model = load_model(classifier_path, predictor_format)
+            log.debug("successfully loaded model {}".format(classifier))
+            # poller to execute stats requests periodically, staggered over switches
+            poller = FlowStatsPoller(T, lambda: _timer_func_predictor(writer, exporter, loaded_model), _handle_flowstats_received)
 
+    else:
+        # poller to execute stats requests periodically, staggered over switches
+        poller = FlowStatsPoller(T, lambda: _timer_func(writer, exporter), _handle_flowstats_received)
@@ -0,0 +1,70 @@
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+from pox.lib.util import dpid_to_str
+from pox.lib.recoco import Timer
+
+from time import time
+
+log = core.getLogger()
+
+
+class FlowStatsPoller:
+    """
+    Per-switch flow stats polling
+
+    Requests to the connected switches are spread evenly over the sampling
+    period instead of being sent in one burst. Replies are matched to their
+    request by xid; replies nobody asked for (e.g. triggered by another
+    component) are ignored. on_tick is called once at the start of every
+    period, before the next round of requests, so everything gathered in the
+    previous period is emitted exactly once.
+    """
+    def __init__ (self, period, on_tick, on_stats):
+        self.period = period
+        self.on_tick = on_tick      # on_tick() -> called once per sampling interval
+        self.on_stats = on_stats    # on_stats(event) -> called for every solicited reply
+        self.pending = dict()       # xid -> (dpid, send time)
+
+        self._listener = core.openflow.addListenerByName("FlowStatsReceived", self._handle_FlowStatsReceived)
+        self.timer = Timer(period, self._tick, recurring= True)
+
+    def _tick (self):
+        self.on_tick()
+        self._expire(time())
+
+        connections = list(core.openflow._connections.values())
+        if len(connections) == 0:
+            return
+        step = self.period / len(connections)
+        for i, connection in enumerate(connections):
+            if i == 0:
+                self._request(connection)
+            else:
+                Timer(i*step, self._request, args= [connection])
+
+    def _expire (self, now):
+        """Forget requests that went unanswered for a whole period"""
+        for xid, (dpid, sent) in list(self.pending.items()):
+            if now - sent > self.period:
+                log.debug("flow stats request %s to %s timed out", xid, dpid_to_str(dpid))
+                del self.pending[xid]
+
+    def _request (self, connection):
+        # the switch may have gone away since the round was scheduled
+        if core.openflow.getConnection(connection.dpid) is not connection:
+            return
+        msg = of.ofp_stats_request(body=of.ofp_flow_stats_request())
+        self.pending[msg.xid] = (connection.dpid, time())
+        connection.send(msg)
+        log.debug("Sent flow stats request %s to %s", msg.xid, dpid_to_str(connection.dpid))
+
+    def _handle_FlowStatsReceived (self, event):
+        xid = event.ofp[0].xid
+        if self.pending.pop(xid, None) is None:
+            return
+        self.on_stats(event)
+
+    def stop (self):
+        self.timer.cancel()
+        core.openflow.removeListener(self._listener)
+        self.pending.clear()
@@ -0,0 +1,304 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from flow_features import predictor_matrix
+
+# columns of the per-flow counter block, both for current stats and history
+FWD_PACKETS = 0
+FWD_BYTES = 1
+BWD_PACKETS = 2
+BWD_BYTES = 3
+DURATION = 4
+NUM_COUNTERS = 5
+
+# packed record of one flow as written by the binary telemetry output
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('nw_src', '<u4'), ('nw_dst', '<u4'), ('tp_src', '<u2'), ('tp_dst', '<u2'),
+                         ('nw_proto', 'u1'), ('fwd_packets', '<u8'), ('fwd_bytes', '<u8'), ('bwd_packets', '<u8'),
+                         ('bwd_bytes', '<u8'), ('duration', '<f8'), ('iat', '<f8'), ('rtt', '<f8')])
+LABELED_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr + [('label', '<i8')])
+# final record of an evicted flow
+SUMMARY_DTYPE = np.dtype(RECORD_DTYPE.descr + [('start_time', '<f8'), ('last_seen', '<f8'), ('reason', 'u1')])
+
+# why a flow was evicted
+EVICT_IDLE = 0          # not in any stats reply for idle_timeout
+EVICT_REMOVED = 1       # the switch reported it removed
+EVICT_LRU = 2           # pushed out by the max_flows cap
+
+# dotted quads kept between batches before the cache starts over
+IP_STR_CACHE = 1 << 16
+
+
+def flow_key (nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid):
+    """
+    Direction independent key of a flow packed into one integer
+
+    The two endpoints are ordered so both directions of a conversation give
+    the same key; swapped tells whether (nw_src, tp_src) was the higher one.
+    Built only from the header fields, so unlike hash() of a string it is
+    the same in every process.
+    """
+    src = (nw_src << 16) | tp_src
+    dst = (nw_dst << 16) | tp_dst
+    swapped = src > dst
+    if swapped:
+        src, dst = dst, src
+    return (((((src << 48) | dst) << 8) | nw_proto) << 64) | dpid, swapped
+
+
+def ip_to_str (ip):
+    """Dotted quad string of an IPv4 address given as integer"""
+    ip = int(ip)
+    return "{}.{}.{}.{}".format(ip >> 24, (ip >> 16) & 0xff, (ip >> 8) & 0xff, ip & 0xff)
+
+def records_to_rows (records, ip_str):
+    """
+    Turn records from FlowTable.to_records into csv rows with dotted quad
+    IPs; ip_str is a dict caching the strings of IPs as int across calls
+    """
+    # bounded, so addresses of long gone flows don't pile up
+    if len(ip_str) > IP_STR_CACHE:
+        ip_str.clear()
+    for ip in np.unique(np.concatenate([records['nw_src'], records['nw_dst']])).tolist():
+        if ip not in ip_str:
+            ip_str[ip] = ip_to_str(ip)
+    return [[r[0], ip_str[r[1]], ip_str[r[2]]] + list(r[3:]) for r in records.tolist()]
+
+
+class FlowTable:
+    """
+    Struct-of-arrays store for unidirectional flows
+
+    Every flow occupies one row; identifying fields and counters live in
+    NumPy columns that grow by doubling. The two directions of a
+    conversation sit in the adjacent rows 2k (first seen) and 2k+1, and one
+    index entry keyed on flow_key points at the row of the non-swapped
+    direction, the other one is found with row ^ 1.
+
+    Conversations are evicted as a pair: by expire() once no stats reply
+    mentioned them for idle_timeout, by remove(), or least recently seen
+    first when a new one would exceed max_flows rows. Evicted pairs are
+    handed to on_evict as SUMMARY_DTYPE records and their slot is filled
+    with the last pair, so the table stays dense.
+    """
+    def __init__ (self, capacity= 1024, max_flows= None, on_evict= None):
+        assert capacity % 2 == 0, "capacity must hold whole row pairs"
+        self.size = 0
+        self.max_flows = max_flows
+        self.on_evict = on_evict    # on_evict(records) -> final records of evicted flows
+        self.index = OrderedDict()  # flow_key -> row of the non-swapped direction, least recently seen first
+        self._alloc(capacity)
+
+    @property
+    def max_flows (self):
+        return self._max_flows
+
+    @max_flows.setter
+    def max_flows (self, max_flows):
+        if max_flows is not None and max_flows < 2:
+            raise ValueError("max_flows must fit a row pair, got {}".format(max_flows))
+        self._max_flows = max_flows
+
+    def _alloc (self, capacity):
+        self.capacity = capacity
+        # attributes that uniquely identify a flow
+        self.nw_src = np.zeros(capacity, dtype= np.uint32)
+        self.nw_dst = np.zeros(capacity, dtype= np.uint32)
+        self.tp_src = np.zeros(capacity, dtype= np.uint16)
+        self.tp_dst = np.zeros(capacity, dtype= np.uint16)
+        self.nw_proto = np.zeros(capacity, dtype= np.uint8)
+        self.dl_type = np.zeros(capacity, dtype= np.uint16)
+        self.dpid = np.zeros(capacity, dtype= np.uint64)
+        self.start_time = np.zeros(capacity, dtype= np.float64)
+        self.last_seen = np.zeros(capacity, dtype= np.float64)
+
+        # attributes that are collected over time
+        self.counters = np.zeros((capacity, NUM_COUNTERS), dtype= np.float64)
+        self.history = np.zeros((capacity, NUM_COUNTERS), dtype= np.float64)
+
+        # iat & rtt for further estimates
+        self.iat = np.zeros(capacity, dtype= np.float64)
+        self.rtt = np.zeros(capacity, dtype= np.float64)
+
+    def _columns (self):
+        return [col for col in self.__dict__.values() if isinstance(col, np.ndarray)]
+
+    def _grow (self):
+        old = self._columns()
+        self._alloc(self.capacity * 2)
+        for col, new in zip(old, self._columns()):
+            new[:self.size] = col[:self.size]
+
+    def __len__ (self):
+        return self.size
+
+    def _insert (self, row, nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid, dl_type, now, packets, bytes):
+        """Fill row with a new flow with zeroed history"""
+        self.nw_src[row] = nw_src
+        self.nw_dst[row] = nw_dst
+        self.tp_src[row] = tp_src
+        self.tp_dst[row] = tp_dst
+        self.nw_proto[row] = nw_proto
+        self.dpid[row] = dpid
+        self.dl_type[row] = dl_type
+        self.start_time[row] = now
+        self.last_seen[row] = now
+        self.counters[row] = (packets, bytes, 0, 0, 0.00)
+        self.history[row] = 0
+        self.iat[row] = 0.00
+        self.rtt[row] = 0.00
+
+    def update (self, nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid, dl_type, packets, bytes, duration, now):
+        """
+        Apply one flow stats entry
+
+        The entry sets the forward counters of its own flow and the backward
+        counters of the reverse flow; both directions are created on first sight.
+        """
+        key, swapped = flow_key(nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid)
+        row = self.index.get(key)
+
+        if row is not None:
+            fwd = row ^ swapped
+            bwd = fwd ^ 1
+            self.counters[fwd, FWD_PACKETS] = packets
+            self.counters[fwd, FWD_BYTES] = bytes
+            self.counters[fwd, DURATION] = duration
+            self.counters[bwd, BWD_PACKETS] = packets
+            self.counters[bwd, BWD_BYTES] = bytes
+            self.counters[bwd, DURATION] = duration
+            self.last_seen[fwd] = self.last_seen[bwd] = now
+            self.index.move_to_end(key)
+        # else create flow entry for both direction flows
+        else:
+            if self.max_flows is not None and self.size + 2 > self.max_flows:
+                oldest = next(iter(self.index.values()))
+                self._evict([oldest & ~1], now, EVICT_LRU)
+            if self.size == self.capacity:
+                self._grow()
+            fwd = self.size
+            self.size += 2
+            self.index[key] = fwd ^ swapped
+            self._insert(fwd, nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid, dl_type, now, packets, bytes)
+            self._insert(fwd ^ 1, nw_dst, nw_src, tp_dst, tp_src, nw_proto, dpid, dl_type, now, packets, bytes)
+
+    def find (self, nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid):
+        """Row of the given direction of a flow, None if unknown"""
+        key, swapped = flow_key(nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid)
+        row = self.index.get(key)
+        if row is None:
+            return None
+        return row ^ swapped
+
+    def expire (self, now, idle_timeout):
+        """Evict conversations not seen in a stats reply for idle_timeout"""
+        n = self.size
+        seen = np.maximum(self.last_seen[0:n:2], self.last_seen[1:n:2])
+        idle = np.flatnonzero(seen < now - idle_timeout) * 2
+        if len(idle):
+            self._evict(idle, now, EVICT_IDLE)
+        return len(idle)
+
+    def remove (self, nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid, now):
+        """Evict the conversation of the given flow, False if unknown"""
+        row = self.find(nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid)
+        if row is None:
+            return False
+        self._evict([row & ~1], now, EVICT_REMOVED)
+        return True
+
+    def _evict (self, bases, now, reason):
+        """Drop the row pairs starting at the even rows in bases"""
+        bases = np.sort(np.asarray(bases, dtype= np.int64))
+        rows = np.empty(2*len(bases), dtype= np.int64)
+        rows[0::2] = bases
+        rows[1::2] = bases + 1
+        if self.on_evict is not None:
+            self.on_evict(self._summary(rows, now, reason))
+
+        columns = self._columns()
+        # highest first, so the last pair moved into a hole is never one being evicted
+        for base in bases[::-1].tolist():
+            del self.index[self._key(base)[0]]
+            last = self.size - 2
+            if base != last:
+                key, swapped = self._key(last)
+                for col in columns:
+                    col[base:base+2] = col[last:last+2]
+                self.index[key] = base ^ swapped
+            self.size -= 2
+
+    def _key (self, row):
+        return flow_key(int(self.nw_src[row]), int(self.nw_dst[row]), int(self.tp_src[row]),
+                        int(self.tp_dst[row]), int(self.nw_proto[row]), int(self.dpid[row]))
+
+    def _summary (self, rows, now, reason):
+        rec = np.empty(len(rows), dtype= SUMMARY_DTYPE)
+        self._fill_records(rec, rows, now)
+        rec['start_time'] = self.start_time[rows]
+        rec['last_seen'] = self.last_seen[rows]
+        rec['reason'] = reason
+        return rec
+
+    def update_rtt_iat (self, gamma_iat, gamma_rtt):
+        """EWMA update of iat & rtt for all flows from the change since last snapshot"""
+        n = self.size
+        cur = self.counters[:n]
+        old = self.history[:n]
+        del_f = cur[:, FWD_PACKETS] - old[:, FWD_PACKETS]
+        del_b = cur[:, BWD_PACKETS] - old[:, BWD_PACKETS]
+        d = cur[:, DURATION] - old[:, DURATION]
+
+        # zero deltas are masked out below, keep the divisions quiet
+        safe_f = np.where(del_f != 0, del_f, 1)
+        safe_b = np.where(del_b != 0, del_b, 1)
+
+        # update rtt
+        rtt = self.rtt[:n]
+        fwd_more = (del_f > del_b) & (del_f != 0)
+        bwd_more = (del_b > del_f) & (del_b != 0)
+        rtt[fwd_more] = (gamma_rtt*rtt + (1-gamma_rtt)*(del_b/safe_f + (del_f - del_b)*2*d)/safe_f)[fwd_more]
+        rtt[bwd_more] = (gamma_rtt*rtt + (1-gamma_rtt)*(del_f*d + (del_b - del_f)*2*d)/safe_b)[bwd_more]
+
+        # update iat
+        # if both directed flows are giving differences, take avg, else take the non zero one
+        iat = self.iat[:n]
+        both = (del_f != 0) & (del_b != 0)
+        only_f = (del_f != 0) & (del_b == 0)
+        only_b = (del_f == 0) & (del_b != 0)
+        iat[both] = (gamma_iat*iat + (1-gamma_iat)*(d/safe_f + d/safe_b)/2)[both]
+        iat[only_f] = (gamma_iat*iat + (1-gamma_iat)*(d/safe_f))[only_f]
+        iat[only_b] = (gamma_iat*iat + (1-gamma_iat)*(d/safe_b))[only_b]
+
+    def snapshot (self):
+        """Store current counters as history"""
+        self.history[:self.size] = self.counters[:self.size]
+
+    def to_records (self, time, labels= None):
+        """Structured array of RECORD_DTYPE (LABELED_RECORD_DTYPE if labels are given)"""
+        n = self.size
+        rec = np.empty(n, dtype= RECORD_DTYPE if labels is None else LABELED_RECORD_DTYPE)
+        self._fill_records(rec, slice(0, n), time)
+        if labels is not None:
+            rec['label'] = labels
+        return rec
+
+    def _fill_records (self, rec, rows, time):
+        rec['time'] = time
+        rec['nw_src'] = self.nw_src[rows]
+        rec['nw_dst'] = self.nw_dst[rows]
+        rec['tp_src'] = self.tp_src[rows]
+        rec['tp_dst'] = self.tp_dst[rows]
+        rec['nw_proto'] = self.nw_proto[rows]
+        rec['fwd_packets'] = self.counters[rows, FWD_PACKETS]
+        rec['fwd_bytes'] = self.counters[rows, FWD_BYTES]
+        rec['bwd_packets'] = self.counters[rows, BWD_PACKETS]
+        rec['bwd_bytes'] = self.counters[rows, BWD_BYTES]
+        rec['duration'] = self.counters[rows, DURATION]
+        rec['iat'] = self.iat[rows]
+        rec['rtt'] = self.rtt[rows]
+
+    def feature_matrix (self):
+        """Return a (size, 15) matrix in predictor_format column order"""
+        n = self.size
+        return predictor_matrix(self.tp_src[:n], self.tp_dst[:n], self.counters[:n], self.nw_src[:n], self.nw_dst[:n])
@@ -0,0 +1,90 @@
+from pox.core import core
+
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from multiprocessing import get_context
+from time import time
+
+import inference_worker
+
+log = core.getLogger()
+
+
+class InferencePool:
+    """
+    Evaluates the classifier in worker processes off the controller thread
+
+    Feature matrices are pickled to the workers over the executor's pipes and
+    the predicted labels are handed back on the recoco thread through
+    core.callLater. At most max_in_flight batches are outstanding; further
+    batches are refused so a slow model sheds ticks instead of piling up.
+    Batches complete in no particular order.
+
+    Workers are spawned rather than forked, as the controller process holds
+    threads, locks and the switches' sockets by the time the pool starts.
+    """
+    def __init__ (self, model_path, columns, workers= 1, max_in_flight= 2):
+        self.columns = columns
+        self.max_in_flight = max_in_flight
+        self._executor = ProcessPoolExecutor(max_workers= workers, mp_context= get_context('spawn'),
+                                             initializer= inference_worker.init, initargs= (model_path, columns))
+        # metrics
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def submit (self, X, callback):
+        """
+        Predict X asynchronously, callback(labels) runs on the recoco thread,
+        with labels None if the batch failed
+        """
+        if self.in_flight >= self.max_in_flight:
+            self.dropped += 1
+            return False
+        self.in_flight += 1
+        self.submitted += 1
+        start = time()
+        future = self._executor.submit(inference_worker.predict, X)
+        future.add_done_callback(lambda f: core.callLater(self._handle_done, f, start, callback))
+        return True
+
+    def _handle_done (self, future, start, callback):
+        self.in_flight -= 1
+        latency = time() - start
+        try:
+            labels = future.result()
+        except CancelledError:
+            self.failed += 1
+            callback(None)
+            return
+        except Exception:
+            self.failed += 1
+            log.exception("inference batch failed")
+            callback(None)
+            return
+        self.completed += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+        log.debug("labeled {} flows in {:.3f}s, {} in flight".format(len(labels), latency, self.in_flight))
+        callback(labels)
+
+    def metrics (self):
+        return {
+            'queue_depth': self.in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'last_latency': self.last_latency,
+            'mean_latency': self.total_latency/self.completed if self.completed else 0.0,
+            'max_latency': self.max_latency,
+        }
+
+    def shutdown (self):
+        log.info("inference pool: {}".format(self.metrics()))
+        self._executor.shutdown(wait= False, cancel_futures= True)
@@ -0,0 +1,16 @@
+from model_registry import load_model
+
+# Worker side of InferencePool. The workers are spawned, not forked, so they
+# import this module fresh; it must not need POX, whose core only exists in
+# the controller process.
+
+# model of the worker process, loaded once by init
+_model = None
+
+
+def init (model_path, columns):
+    global _model
+    _model = load_model(model_path, columns)
+
+def predict (X):
+    return _model.predict(X)
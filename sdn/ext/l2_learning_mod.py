@@ -172,6 +172,8 @@ class LearningSwitch (object):
         msg.match = of.ofp_match.from_packet(packet, event.port)
         msg.idle_timeout = of.OFP_FLOW_PERMANENT
         msg.hard_timeout = of.OFP_FLOW_PERMANENT
+        # final counters come back when the switch drops it, for the flow table
+        msg.flags = of.OFPFF_SEND_FLOW_REM
         msg.actions.append(of.ofp_action_output(port = port))
         msg.data = event.ofp # 6a
         self.connection.send(msg)
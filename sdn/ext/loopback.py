@@ -0,0 +1,149 @@
+from pox.datapaths.switch import SoftwareSwitch, OFConnection
+from pox.openflow.libopenflow_01 import ofp_type_map, OFPST_FLOW, OFP_MAX_PORT_NAME_LEN
+import pox.openflow.of_01 as of_01
+
+from collections import Counter
+
+
+class CountingSwitch (SoftwareSwitch):
+    """
+    SoftwareSwitch whose physical ports are sinks: packets sent out of them
+    are only counted, as are the OpenFlow messages it exchanges by type
+    """
+    def __init__ (self, *args, **kw):
+        # the base class already announces its ports
+        self.delivered = 0
+        self.sent = Counter()
+        self.received = Counter()
+        super(CountingSwitch, self).__init__(*args, **kw)
+
+    def _gen_port_name (self, port_no):
+        # the base class's names outgrow the limit from port 1000 on, and
+        # the features reply then fails to pack
+        name = "s%d-eth%d" % (self.dpid, port_no)
+        return name if len(name) <= OFP_MAX_PORT_NAME_LEN else "eth%d" % port_no
+
+    def _output_packet_physical (self, packet, port_no):
+        self.delivered += 1
+
+    def rx_message (self, connection, msg):
+        self.received[ofp_type_map.get(msg.header_type, msg.header_type)[5:]] += 1
+        super(CountingSwitch, self).rx_message(connection, msg)
+
+    def send (self, message, connection= None):
+        self.sent[ofp_type_map.get(message.header_type, message.header_type)[5:]] += 1
+        super(CountingSwitch, self).send(message, connection)
+
+
+class StatsSwitch (CountingSwitch):
+    """
+    CountingSwitch answering flow stats requests with the packed replies of
+    flow_stats(xid) instead of from its table, e.g. with synthetic counters
+    of far more flows than packets could be pushed through it
+    """
+    def __init__ (self, flow_stats, *args, **kw):
+        self.flow_stats = flow_stats
+        super(StatsSwitch, self).__init__(*args, **kw)
+
+    def _rx_stats_request (self, ofp, connection):
+        if ofp.type != OFPST_FLOW:
+            super(StatsSwitch, self)._rx_stats_request(ofp, connection)
+            return
+        for reply in self.flow_stats(ofp.xid):
+            self.sent['STATS_REPLY'] += 1
+            connection.send(reply)
+
+
+class _SwitchWorker:
+    """The bits of an IOWorker OFConnection uses, over the link's buffers"""
+    class socket:
+        @staticmethod
+        def getpeername ():
+            return ('loopback', 0)
+
+    def __init__ (self, link):
+        self.link = link
+        self.rx_handler = None
+
+    def peek (self):
+        return bytes(self.link.to_switch)
+
+    def consume_receive_buf (self, length):
+        del self.link.to_switch[:length]
+
+    def send (self, data):
+        self.link.to_controller += data
+
+    def shutdown (self):
+        self.link.closed = True
+
+
+class _ControllerSocket:
+    """The bits of a socket of_01.Connection uses, over the link's buffers"""
+    def __init__ (self, link):
+        self.link = link
+
+    def recv (self, size):
+        data = bytes(self.link.to_controller[:size])
+        del self.link.to_controller[:size]
+        return data
+
+    def fileno (self):
+        return -1
+
+    def shutdown (self, how):
+        self.link.closed = True
+
+    def close (self):
+        self.link.closed = True
+
+
+class _ControllerConnection (of_01.Connection):
+    """of_01.Connection writing straight into the link instead of a socket"""
+    def __init__ (self, link):
+        self.link = link
+        super(_ControllerConnection, self).__init__(_ControllerSocket(link))
+
+    def send (self, data):
+        if self.disconnected:
+            return
+        if type(data) is not bytes:
+            data = data.pack()
+        self.link.to_switch += data
+
+
+class LoopbackLink:
+    """
+    In-memory OpenFlow channel between a switch and the controller of this
+    process
+
+    Messages either side sends are buffered until pump() delivers them, so
+    nothing runs re-entrantly and no recoco task or socket is involved; the
+    usual handshake runs on creation and raises ConnectionUp as for a switch
+    connecting over TCP, a handshake which does not complete raises
+    RuntimeError.
+    """
+    def __init__ (self, switch):
+        self.to_switch = bytearray()
+        self.to_controller = bytearray()
+        self.closed = False
+        self.switch = switch
+        self._worker = _SwitchWorker(self)
+        self.switch_side = OFConnection(self._worker)
+        switch.set_connection(self.switch_side)
+        self.controller_side = _ControllerConnection(self)
+        self.pump()
+        if self.controller_side.dpid is None:
+            raise RuntimeError("handshake with {} did not complete".format(switch.name))
+
+    @property
+    def pending (self):
+        return len(self.to_switch) > 0 or len(self.to_controller) > 0
+
+    def pump (self):
+        """Deliver buffered messages both ways until neither side has more to say"""
+        while self.pending and not self.closed:
+            if self.to_switch:
+                self.switch_side.read(self._worker)
+            if self.to_controller:
+                self.controller_side.read()
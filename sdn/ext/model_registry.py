@@ -0,0 +1,248 @@
+import os
+import pickle
+import tempfile
+import zipfile
+
+import numpy as np
+
+from flow_features import PREDICTOR_FORMAT
+
+# Trained classifiers are exported once from their sklearn pickle (.pth) to a
+# .npz next to it holding only NumPy arrays. Later loads read the .npz, which
+# needs neither sklearn nor unpickling, and predict with plain array
+# operations. Models of a kind that cannot be exported are used through
+# sklearn as before.
+
+
+class SchemaError (ValueError):
+    """The model was trained on other features than the ones it would be given"""
+
+
+def check_schema (model, columns):
+    """Raise SchemaError unless model was fitted on exactly columns, in that order"""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        if list(names) != list(columns):
+            raise SchemaError("model expects features {}, got {}".format(list(names), list(columns)))
+    elif getattr(model, 'n_features_in_', len(columns)) != len(columns):
+        raise SchemaError("model expects {} features, got {}".format(model.n_features_in_, len(columns)))
+
+
+class TreeModel:
+    """
+    Decision tree or forest as flattened node arrays
+
+    The nodes of all trees are concatenated; leaves point to themselves, so
+    walking every (sample, tree) pair depth times from the roots ends on
+    their leaves. value holds the class distribution of every node.
+    """
+    kind = 'tree'
+
+    def __init__ (self, classes, feature, threshold, left, right, value, roots, depth):
+        self.classes = classes
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+
+    @classmethod
+    def from_sklearn (cls, model):
+        trees = getattr(model, 'estimators_', [model])
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            leaf = t.children_left < 0
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            left.append(np.where(leaf, nodes, t.children_left) + offset)
+            right.append(np.where(leaf, nodes, t.children_right) + offset)
+            counts = t.value[:, 0, :]
+            value.append(counts / counts.sum(axis= 1, keepdims= True))
+            roots.append(offset)
+            offset += t.node_count
+        return cls(model.classes_, np.concatenate(feature).astype(np.intp), np.concatenate(threshold),
+                   np.concatenate(left).astype(np.intp), np.concatenate(right).astype(np.intp),
+                   np.concatenate(value), np.array(roots, dtype= np.intp),
+                   max(tree.tree_.max_depth for tree in trees))
+
+    def arrays (self):
+        return {'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+                'value': self.value, 'roots': self.roots, 'depth': np.array(self.depth)}
+
+    def predict_proba (self, X):
+        # sklearn compares features as float32 against float64 thresholds
+        X = np.asarray(X, dtype= np.float32)
+        flat = X.ravel()
+        # offset of each sample's row in flat, once per (sample, tree) pair
+        base = np.repeat(np.arange(len(X)) * X.shape[1], len(self.roots))
+        node = np.tile(self.roots, len(X))
+        # children[2*i] is the left child of node i, children[2*i + 1] the right one
+        children = np.column_stack((self.left, self.right)).ravel()
+        for _ in range(self.depth):
+            goRight = flat[base + self.feature[node]] > self.threshold[node]
+            node = children[2*node + goRight]
+        return self.value[node].reshape(len(X), len(self.roots), -1).mean(axis= 1)
+
+    def predict (self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis= 1)]
+
+
+class LinearModel:
+    """Linear classifier as its weight matrix and intercepts"""
+    kind = 'linear'
+
+    def __init__ (self, classes, coef, intercept):
+        self.classes = classes
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def from_sklearn (cls, model):
+        return cls(model.classes_, np.asarray(model.coef_, dtype= np.float64),
+                   np.asarray(model.intercept_, dtype= np.float64))
+
+    def arrays (self):
+        return {'coef': self.coef, 'intercept': self.intercept}
+
+    def decision_function (self, X):
+        return np.asarray(X, dtype= np.float64) @ self.coef.T + self.intercept
+
+    def predict (self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return self.classes[(scores[:, 0] > 0).astype(np.intp)]
+        return self.classes[np.argmax(scores, axis= 1)]
+
+
+class GaussianNBModel:
+    """Gaussian naive Bayes as per class means, variances and log priors"""
+    kind = 'gaussian_nb'
+
+    def __init__ (self, classes, theta, var, log_prior):
+        self.classes = classes
+        self.theta = theta
+        self.var = var
+        self.log_prior = log_prior
+
+    @classmethod
+    def from_sklearn (cls, model):
+        return cls(model.classes_, model.theta_, model.var_, np.log(model.class_prior_))
+
+    def arrays (self):
+        return {'theta': self.theta, 'var': self.var, 'log_prior': self.log_prior}
+
+    def predict (self, X):
+        X = np.asarray(X, dtype= np.float64)
+        jll = self.log_prior - 0.5*np.sum(np.log(2.0*np.pi*self.var), axis= 1)
+        jll = jll - 0.5*np.sum(np.square(X[:, None, :] - self.theta) / self.var, axis= 2)
+        return self.classes[np.argmax(jll, axis= 1)]
+
+
+class SklearnModel:
+    """Fallback for models with no array form, predicting through sklearn"""
+    kind = None
+
+    def __init__ (self, model, columns):
+        self.model = model
+        self.columns = list(columns)
+        self.classes = getattr(model, 'classes_', None)
+
+    def predict (self, X):
+        import pandas as pd
+        return np.asarray(self.model.predict(pd.DataFrame(X, columns= self.columns)))
+
+
+# sklearn class name -> array form it is exported to
+_EXPORTERS = {
+    'DecisionTreeClassifier': TreeModel,
+    'ExtraTreeClassifier': TreeModel,
+    'RandomForestClassifier': TreeModel,
+    'ExtraTreesClassifier': TreeModel,
+    'SGDClassifier': LinearModel,
+    'LogisticRegression': LinearModel,
+    'LinearSVC': LinearModel,
+    'Perceptron': LinearModel,
+    'RidgeClassifier': LinearModel,
+    'GaussianNB': GaussianNBModel,
+}
+_KINDS = {cls.kind: cls for cls in (TreeModel, LinearModel, GaussianNBModel)}
+
+
+def export (model, columns= PREDICTOR_FORMAT):
+    """Array form of a fitted sklearn model, or None if it has none"""
+    check_schema(model, columns)
+    exporter = _EXPORTERS.get(type(model).__name__)
+    if exporter is None:
+        return None
+    return exporter.from_sklearn(model)
+
+
+def save (compiled, path, columns= PREDICTOR_FORMAT):
+    """Write an exported model to path (a .npz), replacing it atomically"""
+    # a file of its own, as other processes may be exporting the same model
+    fd, tmp = tempfile.mkstemp(dir= os.path.dirname(os.path.abspath(path)), suffix= '.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, kind= np.array(compiled.kind), classes= compiled.classes,
+                     columns= np.array(list(columns)), **compiled.arrays())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load (path, columns= PREDICTOR_FORMAT):
+    """Read an exported model back from path, checking it takes columns"""
+    with np.load(path, allow_pickle= False) as f:
+        arrays = {name: f[name] for name in f.files}
+    if arrays.pop('columns').tolist() != list(columns):
+        raise SchemaError("model {} was exported for other features".format(path))
+    cls = _KINDS[str(arrays.pop('kind'))]
+    return cls(**arrays)
+
+
+# (path, columns) -> (mtime of path, model), so a model is read once per process
+_registry = dict()
+
+def load_model (path, columns= PREDICTOR_FORMAT):
+    """
+    Model trained to take columns, pickled at path (a .pth), with a
+    predict(X) taking X as a float array in that column order
+
+    The first load exports the model to a .npz next to path if it has an
+    array form and the folder is writable; the .npz is used as long as it
+    is newer than the pickle and readable.
+    """
+    key = (os.path.abspath(path), tuple(columns))
+    mtime = os.path.getmtime(path)
+    cached = _registry.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    npz_path = os.path.splitext(path)[0] + '.npz'
+    model = None
+    if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= mtime:
+        try:
+            model = load(npz_path, columns)
+        except SchemaError:
+            raise
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            pass        # cut short or damaged, export it again
+    if model is None:
+        with open(path, 'rb') as f:
+            fitted = pickle.load(f)
+        model = export(fitted, columns)
+        if model is None:
+            model = SklearnModel(fitted, columns)
+        else:
+            try:
+                save(model, npz_path, columns)
+            except OSError:
+                pass        # read only model folder, export again next time
+    _registry[key] = (mtime, model)
+    return model
@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from replay_clock import ReplayClock
+
+# The controller of the offline scripts (replay-offline.py,
+# synthetic-traffic.py): l2_learning_mod and flow_info_extractor in the
+# scripts' own process, on trace time, with switches wired in memory.
+
+
+def start (log_name, classifier= None, now= 0.0):
+    """
+    Boot POX in this process on a replay clock set to now, return (clock,
+    core, poller)
+
+    Flows go to poxLogs/<log_name> under the working folder. recoco never
+    runs: timers and callLater stay queued, the caller drives the poller's
+    ticks and the switches' links itself.
+    """
+    # before anything that binds time.time on import
+    clock = ReplayClock().install()
+    clock.now = now
+    os.makedirs('poxLogs', exist_ok= True)
+
+    import pox.core
+    core = pox.core.initialize(handle_signals= False)
+    core.scheduler.quit()
+    core.scheduler._selectHub.break_idle()
+    import pox.openflow
+    pox.openflow.launch()
+    import l2_learning_mod
+    import flow_info_extractor
+
+    l2_learning_mod.launch()
+    flow_info_extractor.launch(log_name, classifier= classifier)
+    return clock, core, flow_info_extractor.poller
+
+
+def run (fn, *args):
+    """fn(*args) in a fresh process, which may start() a controller"""
+    # POX is a singleton and the clock is process wide, so a process per run
+    with ProcessPoolExecutor(max_workers= 1, mp_context= get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
@@ -0,0 +1,21 @@
+import time
+
+
+class ReplayClock:
+    """
+    Trace time of an offline run, standing in for time.time
+
+    install() must come before importing the ext modules that bind
+    time.time on import (from time import time), so that switch flow
+    durations, flow record timestamps and idle eviction all follow the
+    trace instead of the wall clock.
+    """
+    def __init__ (self):
+        self.now = 0.0
+
+    def time (self):
+        return self.now
+
+    def install (self):
+        time.time = self.time
+        return self
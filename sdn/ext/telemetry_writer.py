@@ -0,0 +1,156 @@
+from pox.core import core
+
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+from time import time
+
+import numpy as np
+
+from flow_store import records_to_rows
+
+log = core.getLogger()
+
+# binary files start with MAGIC, a version byte and a length prefixed JSON
+# description of the record dtype; after that every batch is a uint32 byte
+# count followed by that many bytes of packed records
+MAGIC = b'FLOW'
+VERSION = 1
+_LEN = struct.Struct('<I')
+
+
+def encode_header (dtype):
+    """File/stream header announcing the record dtype"""
+    descr = json.dumps(dtype.descr).encode('utf-8')
+    return MAGIC + bytes([VERSION]) + _LEN.pack(len(descr)) + descr
+
+def encode_batch (records, dtype= None):
+    """Length prefixed chunk of packed records"""
+    data = np.ascontiguousarray(records, dtype= dtype).tobytes()
+    return _LEN.pack(len(data)) + data
+
+
+def read_records (path):
+    """Read a binary telemetry file back into one structured array"""
+    with open(path, 'rb') as f:
+        assert f.read(len(MAGIC)) == MAGIC, "not a telemetry file"
+        version = f.read(1)[0]
+        assert version == VERSION, "unsupported version {}".format(version)
+        (n,) = _LEN.unpack(f.read(_LEN.size))
+        dtype = np.dtype([tuple(d) for d in json.loads(f.read(n))])
+        chunks = list()
+        while True:
+            prefix = f.read(_LEN.size)
+            if len(prefix) < _LEN.size:
+                break
+            (n,) = _LEN.unpack(prefix)
+            chunks.append(np.frombuffer(f.read(n), dtype= dtype))
+    if len(chunks) == 0:
+        return np.zeros(0, dtype= dtype)
+    return np.concatenate(chunks)
+
+
+class TelemetryWriter:
+    """
+    Buffered flow record writer running on its own thread
+
+    Batches (one per sampling tick) are handed over through a bounded queue
+    and formatted and written in bulk, so neither serialization nor disk
+    stalls block the recoco thread; when the queue is full the batch is
+    dropped and counted instead.
+
+    Batches are NumPy structured arrays of flow records, written as csv
+    rows with dotted quad IPs (fmt 'csv') or packed as they are (fmt 'bin',
+    see read_records). The output is rotated to
+    <path>.<n> once it exceeds rotate_bytes or is older than rotate_secs.
+    """
+    def __init__ (self, path, header, fmt= 'csv', rotate_bytes= None, rotate_secs= None, queue_size= 64):
+        assert fmt in ('csv', 'bin'), "unknown output format {}".format(fmt)
+        self.path = path
+        self.header = header
+        self.fmt = fmt
+        self.rotate_bytes = rotate_bytes
+        self.rotate_secs = rotate_secs
+        self.rotations = 0
+        self.dropped = 0
+
+        self._dtype = None
+        self._ip_str = dict()       # IP as int -> dotted quad, for records_to_rows
+        self._file = None
+        self._queue = queue.Queue(maxsize= queue_size)
+        self._open()
+        self._thread = threading.Thread(target= self._run, name= "TelemetryWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def binary (self):
+        return self.fmt == 'bin'
+
+    def write_batch (self, batch):
+        """Queue a batch for writing, return False if it had to be dropped"""
+        try:
+            self._queue.put_nowait(batch)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            log.warning("telemetry queue full, dropped batch ({} so far)".format(self.dropped))
+            return False
+
+    def close (self):
+        """Write out what is queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _open (self):
+        self._file = open(self.path, 'wb' if self.binary else 'w', newline= None if self.binary else '')
+        self._opened = time()
+        if self.binary:
+            self._dtype = None          # header is written along with the first batch
+        else:
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.header)
+
+    def _rotate (self):
+        self._file.close()
+        self.rotations += 1
+        os.replace(self.path, "{}.{}".format(self.path, self.rotations))
+        log.debug("rotated {} ({})".format(self.path, self.rotations))
+        self._open()
+
+    def _should_rotate (self):
+        if self.rotate_bytes is not None and self._file.tell() >= self.rotate_bytes:
+            return True
+        if self.rotate_secs is not None and time() - self._opened >= self.rotate_secs:
+            return True
+        return False
+
+    def _write (self, batch):
+        if not self.binary:
+            self._csv.writerows(records_to_rows(batch, self._ip_str))
+            return
+        if self._dtype is None:
+            self._dtype = batch.dtype
+            self._file.write(encode_header(batch.dtype))
+        self._file.write(encode_batch(batch, self._dtype))
+
+    def _run (self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            try:
+                self._write(batch)
+                if self._should_rotate():
+                    self._rotate()
+                elif self._queue.empty():
+                    self._file.flush()
+            except Exception:
+                log.exception("failed writing telemetry batch")
+        self._file.close()
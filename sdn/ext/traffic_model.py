@@ -0,0 +1,311 @@
+import struct
+
+import numpy as np
+
+import pox.openflow.libopenflow_01 as of
+
+# Synthetic stand-in for the recorded D-ITG runs, for host counts past the
+# 10-80 of flow-data. Every client holds a signaling connection to the
+# server's port 9000 and sends one data flow to it, either bulk TCP (benign)
+# or Telnet (attack), each packet acked by the server. Rates, frame sizes and
+# durations are drawn around what the recorded runs show; everything comes
+# from the seed, so the same arguments always give the same traffic.
+
+EPOCH = 1648160000.0            # wall clock start of a run, when the recorded ones were taken
+SERVER_IP = (10 << 24) + 1
+SIGNALING_PORT = 9000
+ACK_SIZE = 66                   # ethernet + ipv4 + tcp with timestamp option, no payload
+BENIGN_SIZE = ACK_SIZE + 512    # ITGSend -c 512
+BENIGN_PPS = (1000.0, 11000.0)
+TELNET_PPS = (45.0, 100.0)
+TELNET_PAYLOAD = (15.0, 35.0)   # range of the mean payload of a Telnet flow
+RTT = 0.008                     # 2ms links, client -> switch -> server and back
+# frame sizes of the signaling connection, in order, at its start & end
+SIGNALING_FWD = [74, 66, 66, 83, 66, 66, 66, 66, 66, 66, 83, 66]
+SIGNALING_BWD = [74, 66, 66, 66, 68, 66, 66, 68, 68]
+
+# flow table entries of every client, in this order
+DATA_FWD, DATA_BWD, SIGNALING_FWD_ENTRY, SIGNALING_BWD_ENTRY = range(4)
+
+# wire format of an exact match ofp_flow_stats with a single output action
+FLOW_STATS = np.dtype([
+    ('length', '>u2'), ('table_id', 'u1'), ('pad0', 'u1'),
+    ('wildcards', '>u4'), ('in_port', '>u2'), ('dl_src', 'u1', 6), ('dl_dst', 'u1', 6),
+    ('dl_vlan', '>u2'), ('dl_vlan_pcp', 'u1'), ('pad1', 'u1'), ('dl_type', '>u2'),
+    ('nw_tos', 'u1'), ('nw_proto', 'u1'), ('pad2', 'u1', 2),
+    ('nw_src', '>u4'), ('nw_dst', '>u4'), ('tp_src', '>u2'), ('tp_dst', '>u2'),
+    ('duration_sec', '>u4'), ('duration_nsec', '>u4'), ('priority', '>u2'),
+    ('idle_timeout', '>u2'), ('hard_timeout', '>u2'), ('pad3', 'u1', 6),
+    ('cookie', '>u8'), ('packet_count', '>u8'), ('byte_count', '>u8'),
+    ('action_type', '>u2'), ('action_len', '>u2'), ('out_port', '>u2'), ('max_len', '>u2')])
+_STATS_HEADER = struct.Struct('!BBHLHH')
+# flow stats per reply message, so its length fits the 16 bit header field
+STATS_PER_REPLY = (0xffff - _STATS_HEADER.size) // FLOW_STATS.itemsize
+# ports of a switch, so its features reply fits the 16 bit header field too
+MAX_SWITCH_PORTS = (0xffff - len(of.ofp_features_reply())) // len(of.ofp_phy_port())
+# clients per switch unless given
+SWITCH_SIZE = 1000
+
+
+def host_mac (host):
+    """MAC of host h<host>, its number as address like mininet's --mac"""
+    return ':'.join('{:02x}'.format((host >> shift) & 0xff) for shift in range(40, -8, -8))
+
+def _mac_bytes (hosts):
+    """(n, 6) bytes of host_mac() of every host number"""
+    hosts = np.asarray(hosts, dtype= np.uint64)
+    return ((hosts[:, None] >> np.arange(40, -8, -8, dtype= np.uint64)) & np.uint64(0xff)).astype(np.uint8)
+
+def ip_str (ip):
+    return '.'.join(str((int(ip) >> shift) & 0xff) for shift in (24, 16, 8, 0))
+
+
+def build_frame (src, dst, sport, dport, proto, size, src_mac, dst_mac):
+    """Ethernet frame of size bytes from src:sport to dst:dport, addresses as strings"""
+    from pox.lib.addresses import EthAddr, IPAddr
+    from pox.lib.packet import ethernet, ipv4, tcp, udp
+    l4 = tcp(srcport= sport, dstport= dport, off= 5, flags= tcp.ACK_flag) if proto == ipv4.TCP_PROTOCOL \
+        else udp(srcport= sport, dstport= dport)
+    # a plain tcp header is 54 bytes with ethernet, anything above is payload
+    l4.payload = bytes(max(size - 54, 0))
+    ip = ipv4(srcip= IPAddr(src), dstip= IPAddr(dst), protocol= proto)
+    ip.payload = l4
+    eth = ethernet(src= EthAddr(src_mac), dst= EthAddr(dst_mac), type= ethernet.IP_TYPE)
+    eth.payload = ip
+    return eth.pack()
+
+
+class SyntheticTraffic:
+    """
+    Clients h2..h<num_hosts> of a run with server h1, and the packets and
+    flow table counters of their flows over time
+
+    Times are seconds from the start of the run. The clients fill switches
+    1, 2, ... switch_size (SWITCH_SIZE by default) at a time, from port 2
+    on; port 1 of every switch leads to the server. With a single switch
+    h<i> is on port i, as in the recorded runs.
+    """
+    def __init__ (self, num_hosts, seed= 0, attack_fraction= 0.5, duration= 10.0, start_spread= 2.0,
+                  rate_scale= 1.0, switch_size= None):
+        n = num_hosts - 1
+        if n < 1:
+            raise ValueError("need at least one client besides the server")
+        self.num_hosts = num_hosts
+        # anything default_rng takes, e.g. [seed, run]
+        self.seed = [int(x) for x in np.atleast_1d(seed)]
+        self.duration = float(duration)
+        self.switch_size = int(switch_size or min(n, SWITCH_SIZE))
+        if self.switch_size + 1 > MAX_SWITCH_PORTS:
+            raise ValueError("a switch has at most {} client ports".format(MAX_SWITCH_PORTS - 1))
+        rng = np.random.default_rng(self.seed)
+
+        self.hosts = np.arange(2, n + 2)
+        self.ips = self._sample_ips(rng, n)
+        self.attack = rng.random(n) < attack_fraction
+        self.start = rng.uniform(0.0, start_spread, n)
+        self.pps = np.where(self.attack, rng.uniform(*TELNET_PPS, n), rng.uniform(*BENIGN_PPS, n)) * rate_scale
+        # the data flow starts once its signaling connection is up
+        self.data_start = self.start + 0.05
+        self.total = np.floor(self.duration * self.pps).astype(np.int64)
+        self.payload = np.where(self.attack, rng.uniform(*TELNET_PAYLOAD, n), BENIGN_SIZE - ACK_SIZE)
+        self.data_port = rng.integers(10000, 2**16 - 1, n)
+        self.data_sport = rng.integers(32768, 61000, n)
+        self.signaling_sport = rng.integers(32768, 61000, n)
+
+        self.port = np.arange(n) % self.switch_size + 2
+        self._entries = self._flow_table()
+
+    @staticmethod
+    def _sample_ips (rng, n):
+        """n distinct client addresses in 10.0.0.2 - 10.255.255.255, like generateIPs.py"""
+        low, high = SERVER_IP + 1, (11 << 24)
+        ips = np.empty(0, dtype= np.int64)
+        while len(ips) < n:
+            ips = np.unique(np.concatenate([ips, rng.integers(low, high, 2*n)]))
+        return rng.permutation(ips)[:n].astype(np.uint32)
+
+    @property
+    def switches (self):
+        return -(-len(self.hosts) // self.switch_size)
+
+    def clients_of (self, dpid):
+        """Slice of the clients on switch dpid"""
+        return slice((dpid - 1) * self.switch_size, min(dpid * self.switch_size, len(self.hosts)))
+
+    def switch_ports (self, dpid):
+        """Number of ports of switch dpid, the server port included"""
+        clients = self.clients_of(dpid)
+        return clients.stop - clients.start + 1
+
+    ## RUN DESCRIPTION
+    def topology (self):
+        """Rows (host, IP) of the run's topo.csv"""
+        return [('h1', ip_str(SERVER_IP) + '/8')] + \
+               [('h' + str(h), ip_str(ip) + '/8') for h, ip in zip(self.hosts, self.ips)]
+
+    def send_params (self):
+        """Rows (host, serverIP, port, duration, size, proto) of the run's sendParams.csv"""
+        return [('h' + str(h), ip_str(SERVER_IP), int(port), int(self.duration * 1000), 512,
+                 'TCP Telnet' if attack else 'TCP ')
+                for h, port, attack in zip(self.hosts, self.data_port, self.attack)]
+
+    ## FLOW STATS
+    def _flow_table (self):
+        """The fields of all flow table entries that stay fixed, as FLOW_STATS"""
+        n = len(self.hosts)
+        entries = np.zeros((n, 4), dtype= FLOW_STATS)
+        entries['length'] = FLOW_STATS.itemsize
+        entries['dl_vlan'] = of.OFP_VLAN_NONE
+        entries['dl_type'] = 0x0800
+        entries['nw_proto'] = 6
+        entries['priority'] = of.OFP_DEFAULT_PRIORITY
+        entries['action_type'] = of.OFPAT_OUTPUT
+        entries['action_len'] = 8
+
+        client_mac = _mac_bytes(self.hosts)[:, None, :]
+        server_mac = _mac_bytes([1])[:, None, :]
+        fwd = [DATA_FWD, SIGNALING_FWD_ENTRY]
+        bwd = [DATA_BWD, SIGNALING_BWD_ENTRY]
+        entries['in_port'][:, fwd] = self.port[:, None]
+        entries['out_port'][:, fwd] = 1
+        entries['in_port'][:, bwd] = 1
+        entries['out_port'][:, bwd] = self.port[:, None]
+        entries['dl_src'][:, fwd] = client_mac
+        entries['dl_dst'][:, fwd] = server_mac
+        entries['dl_src'][:, bwd] = server_mac
+        entries['dl_dst'][:, bwd] = client_mac
+        entries['nw_src'][:, fwd] = self.ips[:, None]
+        entries['nw_dst'][:, fwd] = SERVER_IP
+        entries['nw_src'][:, bwd] = SERVER_IP
+        entries['nw_dst'][:, bwd] = self.ips[:, None]
+        for (src, dst), sport, dport in (((DATA_FWD, DATA_BWD), self.data_sport, self.data_port),
+                                         ((SIGNALING_FWD_ENTRY, SIGNALING_BWD_ENTRY), self.signaling_sport,
+                                          SIGNALING_PORT)):
+            entries['tp_src'][:, src] = sport
+            entries['tp_dst'][:, src] = dport
+            entries['tp_src'][:, dst] = dport
+            entries['tp_dst'][:, dst] = sport
+        return entries
+
+    def counters (self, now, clients= slice(None)):
+        """
+        (installed, packets, bytes), each (clients, 4), of the flow table
+        entries of clients (a slice) at time now; an entry is installed with
+        the first packet of its direction
+        """
+        start, data_start, pps, total, payload = (a[clients] for a in (self.start, self.data_start, self.pps,
+                                                                       self.total, self.payload))
+        n = len(start)
+        installed = np.empty((n, 4), dtype= bool)
+        packets = np.empty((n, 4), dtype= np.int64)
+        bytes = np.empty((n, 4), dtype= np.int64)
+
+        for entry, first in ((DATA_FWD, data_start), (DATA_BWD, data_start + RTT)):
+            sent = np.clip(np.floor((now - first) * pps) + 1, 0, total).astype(np.int64)
+            installed[:, entry] = now >= first
+            packets[:, entry] = sent
+        bytes[:, DATA_FWD] = packets[:, DATA_FWD] * ACK_SIZE + np.rint(packets[:, DATA_FWD] * payload).astype(np.int64)
+        bytes[:, DATA_BWD] = packets[:, DATA_BWD] * ACK_SIZE
+
+        # half of the signaling frames open the connection, the rest close it
+        close = data_start + self.duration + 0.5
+        for entry, sizes, first in ((SIGNALING_FWD_ENTRY, SIGNALING_FWD, start),
+                                    (SIGNALING_BWD_ENTRY, SIGNALING_BWD, start + RTT)):
+            opening = len(sizes) // 2
+            sent = np.where(now >= first, opening, 0) + np.where(now >= close + first - start, len(sizes) - opening, 0)
+            installed[:, entry] = now >= first
+            packets[:, entry] = sent
+            bytes[:, entry] = np.cumsum([0] + sizes)[sent]
+        return installed, packets, bytes
+
+    def flow_stats (self, now, dpid= None):
+        """FLOW_STATS array of the entries installed at time now, of switch dpid or of all of them"""
+        clients = slice(None) if dpid is None else self.clients_of(dpid)
+        installed, packets, bytes = self.counters(now, clients)
+        start, data_start = self.start[clients], self.data_start[clients]
+        first = np.stack([data_start, data_start + RTT, start, start + RTT], axis= 1)
+        stats = self._entries[clients][installed]
+        age = now - first[installed]
+        stats['duration_sec'] = age
+        stats['duration_nsec'] = (age % 1.0) * 1e9
+        stats['packet_count'] = packets[installed]
+        stats['byte_count'] = bytes[installed]
+        return stats
+
+    def flow_stats_replies (self, now, xid, dpid= None):
+        """
+        Packed OFPT_STATS_REPLY messages answering flow stats request xid at
+        time now, split in as many as the 64k message size asks for
+        """
+        stats = self.flow_stats(now, dpid)
+        replies = list()
+        for offset in range(0, max(len(stats), 1), STATS_PER_REPLY):
+            part = stats[offset:offset + STATS_PER_REPLY]
+            more = of.OFPSF_REPLY_MORE if offset + STATS_PER_REPLY < len(stats) else 0
+            replies.append(_STATS_HEADER.pack(of.OFP_VERSION, of.OFPT_STATS_REPLY,
+                                              _STATS_HEADER.size + part.nbytes, xid, of.OFPST_FLOW, more)
+                           + part.tobytes())
+        return replies
+
+    ## PACKETS
+    def packets (self, client):
+        """
+        (times, frames) of everything client (an index into hosts) sends
+        and receives, in time order, as a capture on its interface holds it
+
+        Data packets go out evenly paced, Telnet ones jittered within their
+        slot, so their count at any time is within one of counters().
+        """
+        rng = np.random.default_rng(self.seed + [int(self.hosts[client])])
+        ip, start, pps, total = ip_str(self.ips[client]), self.start[client], self.pps[client], self.total[client]
+        data_start = self.data_start[client]
+        mac, server_mac, server = host_mac(int(self.hosts[client])), host_mac(1), ip_str(SERVER_IP)
+        sport, dport, sig_sport = int(self.data_sport[client]), int(self.data_port[client]), int(self.signaling_sport[client])
+
+        slot = np.arange(total, dtype= np.float64)
+        if self.attack[client]:
+            slot += rng.random(total)
+            mean = self.payload[client]
+            sizes = ACK_SIZE + rng.integers(1, max(int(2*mean), 2), total)
+        else:
+            sizes = np.full(total, BENIGN_SIZE)
+        times = [data_start + slot / pps, data_start + slot / pps + RTT]
+        kinds = [np.full(total, DATA_FWD), np.full(total, DATA_BWD)]
+        frame_sizes = [sizes, np.full(total, ACK_SIZE)]
+
+        close = data_start + self.duration + 0.5
+        for kind, sizes, first in ((SIGNALING_FWD_ENTRY, SIGNALING_FWD, start),
+                                   (SIGNALING_BWD_ENTRY, SIGNALING_BWD, start + RTT)):
+            opening = len(sizes) // 2
+            at = np.r_[np.full(opening, first), np.full(len(sizes) - opening, close + first - start)]
+            times.append(at + 1e-4 * np.arange(len(sizes)))
+            kinds.append(np.full(len(sizes), kind))
+            frame_sizes.append(np.array(sizes))
+        times, kinds, frame_sizes = map(np.concatenate, (times, kinds, frame_sizes))
+        order = np.argsort(times, kind= 'stable')
+
+        ends = {DATA_FWD: (ip, server, sport, dport, mac, server_mac),
+                DATA_BWD: (server, ip, dport, sport, server_mac, mac),
+                SIGNALING_FWD_ENTRY: (ip, server, sig_sport, SIGNALING_PORT, mac, server_mac),
+                SIGNALING_BWD_ENTRY: (server, ip, SIGNALING_PORT, sig_sport, server_mac, mac)}
+        frames = dict()
+        def frame (kind, size):
+            cached = frames.get((kind, size))
+            if cached is None:
+                src, dst, sp, dp, smac, dmac = ends[kind]
+                cached = frames[(kind, size)] = build_frame(src, dst, sp, dp, 6, size, smac, dmac)
+            return cached
+        return times[order], [frame(kinds[i], frame_sizes[i]) for i in order]
+
+
+def write_pcap (path, times, frames, epoch= EPOCH):
+    """Write frames captured at epoch + times to a libpcap file (microsecond resolution)"""
+    times = np.asarray(times, dtype= np.float64) + epoch
+    sec = np.floor(times).astype(np.int64)
+    usec = np.minimum(np.rint((times - sec) * 1e6), 999999).astype(np.int64)
+    record = struct.Struct('<IIII')
+    with open(path, 'wb') as f:
+        # magic, version 2.4, utc offset, accuracy, snaplen, ethernet
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        f.write(b''.join(record.pack(s, u, len(frame), len(frame)) + frame
+                         for s, u, frame in zip(sec.tolist(), usec.tolist(), frames)))
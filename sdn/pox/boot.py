@@ -372,7 +372,7 @@ class POXOptions (Options):
     self.enable_openflow = True
     self.log_config = None
     self.threaded_selecthub = True
-    self.epoll_selecthub = False
+    self.epoll_selecthub = None # Wherever there's epoll
     self.handle_signals = True
 
   def _set_h (self, given_name, name, value):
@@ -213,7 +213,7 @@ class POXCore (EventMixin):
   version = (0,7,0)
   version_name = "gar"
 
-  def __init__ (self, threaded_selecthub=True, epoll_selecthub=False,
+  def __init__ (self, threaded_selecthub=True, epoll_selecthub=None,
                 handle_signals=True):
     self.debug = False
     self.running = True
@@ -663,7 +663,7 @@ class POXCore (EventMixin):
 
 core = None
 
-def initialize (threaded_selecthub=True, epoll_selecthub=False,
+def initialize (threaded_selecthub=True, epoll_selecthub=None,
                 handle_signals=True):
   global core
   core = POXCore(threaded_selecthub=threaded_selecthub,
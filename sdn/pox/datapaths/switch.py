@@ -505,24 +505,21 @@ class SoftwareSwitchBase (object):
             self.log.warn("Illegal fragment processing mode: %i", frag_mode)
 
     self.port_stats[in_port].rx_packets += 1
-    if packet_data is not None:
-      self.port_stats[in_port].rx_bytes += len(packet_data)
-    else:
-      self.port_stats[in_port].rx_bytes += len(packet.pack()) # Expensive
+    if packet_data is None:
+      packet_data = packet.pack() # Expensive
+    self.port_stats[in_port].rx_bytes += len(packet_data)
 
     self._lookup_count += 1
     entry = self.table.entry_for_packet(packet, in_port)
     if entry is not None:
       self._matched_count += 1
-      entry.touch_packet(len(packet))
+      entry.touch_packet(len(packet_data))
       self._process_actions_for_packet(entry.actions, packet, in_port)
     else:
       # no matching entry
       if port.config & OFPPC_NO_PACKET_IN:
         return
       buffer_id = self._buffer_packet(packet, in_port)
-      if packet_data is None:
-        packet_data = packet.pack()
       self.send_packet_in(in_port, buffer_id, packet_data,
                           reason=OFPR_NO_MATCH, data_length=self.miss_send_len)
 
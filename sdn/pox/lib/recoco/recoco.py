@@ -20,6 +20,7 @@ import time
 import threading
 from threading import Thread
 import select
+import heapq
 import traceback
 import sys
 import os
@@ -158,13 +159,20 @@ class Scheduler (object):
   """ Scheduler for Tasks """
 
   def __init__ (self, isDefaultScheduler = None, startInThread = True,
-                daemon = False, use_epoll=False, threaded_selecthub = True):
+                daemon = False, use_epoll=None, threaded_selecthub = True):
+    """
+    use_epoll picks the EpollSelectHub over the select() based SelectHub;
+    None (the default) means wherever the platform has epoll.
+    """
 
     self._ready = deque()
     self._hasQuit = False
 
-    self._selectHub = SelectHub(self, use_epoll=use_epoll,
-                                threaded=threaded_selecthub)
+    if use_epoll is None: use_epoll = hasattr(select, 'epoll')
+    if use_epoll:
+      self._selectHub = EpollSelectHub(self, threaded=threaded_selecthub)
+    else:
+      self._selectHub = SelectHub(self, threaded=threaded_selecthub)
     self._thread = None
 
     self._lock = threading.Lock()
@@ -955,6 +963,216 @@ class SelectHub (object):
     self._scheduler.fast_schedule(sleepingTask)
 
 
+class _EpollWait (object):
+  """
+  A task's Select on an EpollSelectHub
+
+  It stays with the task (as task._epoll_wait) after the task is resumed,
+  so that Selecting the same objects again can just reactivate it.
+  """
+  __slots__ = ['task', 'token', 'active', 'lists', 'disarmed']
+
+  def __init__ (self, task, lists):
+    self.task = task
+    self.token = None
+    self.active = False
+    self.lists = lists # None once it can't be reused
+    self.disarmed = {} # fd -> entry which fired since the task was resumed
+
+
+class EpollSelectHub (SelectHub):
+  """
+  A SelectHub on one persistent epoll set
+
+  SelectHub builds the whole fd set and scans every task for the nearest
+  timeout on each cycle.  Here each fd stays registered across Selects with
+  EPOLLONESHOT, so an fd fires once and is then disarmed until a task waits
+  on it again.  Selecting an fd which is still armed for the event costs no
+  syscall, and only fds which fired are re-armed.  A task Selecting the
+  very same objects as the last time (as the OpenFlow task does with all
+  its sockets) reactivates its last wait instead of going through them.
+  Timeouts live on a heap, and waits which are over are dropped when they
+  come up in it or on an fd.  So the work per cycle follows the ready fds
+  and expired timers, not the fds and tasks waiting.
+
+  Readiness is reported as select() would: hangups and errors make an fd
+  readable (and errors writable), and errors or priority data put it in
+  the exceptional list.
+  """
+  def __init__ (self, scheduler, threaded=True):
+    # fd -> [obj, events armed (0 once fired, None if not in the set),
+    #        reader, writer, xwaiter], where the waiters are _EpollWaits
+    self._fds = {}
+    self._timers = [] # Heap of (time, token, wait)
+    self._tokens = 0
+    self._epoll = select.epoll()
+    super(EpollSelectHub, self).__init__(scheduler, threaded=False)
+    # Registered for good and level-triggered, so pings are never missed
+    self._pinger_fd = self._pinger.fileno()
+    self._epoll.register(self._pinger_fd, select.EPOLLIN)
+
+    # Only start polling once the pinger is in the set
+    if threaded:
+      self._thread = Thread(target = self._threadProc)
+      self._thread.daemon = True
+      self._thread.start()
+      self._event = threading.Event()
+
+  def _arm (self, fd, e, events):
+    events |= select.EPOLLONESHOT
+    try:
+      if e[1] is None:
+        self._epoll.register(fd, events)
+      else:
+        self._epoll.modify(fd, events)
+    except FileExistsError:
+      self._epoll.modify(fd, events)
+    except FileNotFoundError:
+      # Closed and gone from the set since
+      self._epoll.register(fd, events)
+    e[1] = events
+
+  def _rearm (self, fd, e):
+    """
+    Arms a fired fd for whoever still waits on it
+
+    Waits which are over but may be reactivated remember it instead.
+    """
+    events = 0
+    for slot,event in ((2,select.EPOLLIN), (3,select.EPOLLOUT),
+                       (4,select.EPOLLPRI)):
+      w = e[slot]
+      if w is None: continue
+      if w.active:
+        events |= event
+      elif w.lists is not None:
+        w.disarmed[fd] = e
+    if events: self._arm(fd, e, events)
+
+  def _add (self, task, rlist, wlist, xlist, timeout, rets):
+    self._tokens += 1
+    lists = (tuple(rlist) if rlist else (), tuple(wlist) if wlist else (),
+             tuple(xlist) if xlist else ())
+    fds = self._fds
+    wait = getattr(task, '_epoll_wait', None)
+    if wait is not None:
+      assert not wait.active
+      if wait.lists != lists or wait.lists is None:
+        wait.lists = None
+        wait = None
+      else:
+        for fd,e in wait.disarmed.items():
+          if fds.get(fd) is not e:
+            # The fd went to another object meanwhile
+            wait.lists = None
+            wait = None
+            break
+
+    if wait is not None:
+      wait.active = True
+      wait.token = self._tokens
+      if wait.disarmed:
+        for fd,e in wait.disarmed.items():
+          self._rearm(fd, e)
+        wait.disarmed.clear()
+    else:
+      wait = task._epoll_wait = _EpollWait(task, lists)
+      wait.active = True
+      wait.token = self._tokens
+      arm = None
+      for objs,slot,event in ((lists[0],2,select.EPOLLIN),
+                              (lists[1],3,select.EPOLLOUT),
+                              (lists[2],4,select.EPOLLPRI)):
+        for obj in objs:
+          fd = obj if isinstance(obj, int) else obj.fileno()
+          e = fds.get(fd)
+          if e is None or e[0] is not obj:
+            if fd < 0:
+              # Closed; select() would have raised
+              wait.lists = None
+              if wait not in rets: rets[wait] = ([],[],[])
+              if obj not in rets[wait][2]: rets[wait][2].append(obj)
+              continue
+            if e is not None:
+              # The fd number now belongs to another object.  Its old file
+              # may still be in the set (if it was dup()ed), so start over.
+              for w in e[2:]:
+                if w is not None: w.lists = None
+              try:
+                self._epoll.unregister(fd)
+              except OSError:
+                pass
+            e = fds[fd] = [obj, None, None, None, None]
+          old = e[slot]
+          if old is not wait:
+            # Its waiter can't count on being set up here anymore
+            if old is not None: old.lists = None
+            e[slot] = wait
+          # Armed for events of earlier waiters too, if they're over it just
+          # fires for nobody once
+          if e[1] is None or not e[1] & event:
+            if arm is None: arm = {}
+            arm[fd] = arm.get(fd, e[1] or 0) | event
+      if arm:
+        for fd,events in arm.items():
+          self._arm(fd, fds[fd], events)
+
+    if timeout is not None:
+      heapq.heappush(self._timers, (timeout, wait.token, wait))
+
+  def _select (self, tasks, rets):
+    timers = self._timers
+    while timers and (not timers[0][2].active
+                      or timers[0][2].token != timers[0][1]):
+      heapq.heappop(timers)
+    if timers:
+      timeout = max(0, timers[0][0] - time.time())
+    else:
+      timeout = CYCLE_MAXIMUM
+
+    try:
+      events = self._epoll.poll(timeout)
+    except InterruptedError:
+      events = ()
+
+    fired = []
+    for fd,ev in events:
+      if fd == self._pinger_fd:
+        self._pinger.pongAll()
+        while not self._incoming.empty():
+          self._add(*self._incoming.get(True), rets=rets)
+          self._incoming.task_done()
+        continue
+      e = self._fds.get(fd)
+      if e is None: continue
+      # EPOLLONESHOT disarmed it
+      e[1] = 0
+      fired.append((fd, e))
+      r = ev & (select.EPOLLIN | select.EPOLLHUP | select.EPOLLERR)
+      w = ev & (select.EPOLLOUT | select.EPOLLERR)
+      x = ev & (select.EPOLLPRI | select.EPOLLERR)
+      for hit,slot,i in ((r,2,0), (w,3,1), (x,4,2)):
+        wait = e[slot]
+        if hit and wait is not None and wait.active:
+          if wait not in rets: rets[wait] = ([],[],[])
+          rets[wait][i].append(e[0])
+
+    if timers and timers[0][0] <= time.time():
+      now = time.time()
+      while timers and timers[0][0] <= now:
+        _, token, wait = heapq.heappop(timers)
+        if wait.active and wait.token == token and wait not in rets:
+          rets[wait] = ([],[],[])
+
+    for wait,v in rets.items():
+      wait.active = False
+      self._return(wait.task, v)
+    rets.clear()
+
+    for fd,e in fired:
+      self._rearm(fd, e)
+
+
 class ScheduleTask (BaseTask):
   """
   If multiple real threads (such as a recoco scheduler thread and any
@@ -21,6 +21,20 @@ from pox.lib.revent import *
 
 import time
 import math
+import itertools
+import operator
+
+
+# Reads the stored match fields directly, skipping ofp_match.__getattr__
+_match_fields = operator.attrgetter(*['_' + f for f in ofp_match_data])
+
+def _exact_key (match):
+  """
+  Hashable form of an exact match's fields, or None if it has wildcards
+  """
+  if match.is_wildcarded: return None
+  return _match_fields(match)
+
 
 # FlowTable Entries:
 #   match - ofp_match (13-tuple)
@@ -208,6 +222,12 @@ class FlowTable (EventMixin):
     # Table is a list of TableEntry sorted by descending effective_priority.
     self._table = []
 
+    # Exact-match entries outrank every wildcarded one, so they form a prefix
+    # of _table.  They are also indexed by their match fields, which lets
+    # entry_for_packet() find them without scanning.
+    self._exact = {}
+    self._exact_count = 0
+
   def _dirty (self):
     """
     Call when table changes
@@ -242,6 +262,12 @@ class FlowTable (EventMixin):
         low = middle + 1
     table.insert(low, entry)
 
+    key = _exact_key(entry.match)
+    if key is not None:
+      # Equal entries are inserted in front, so the newest one wins scans
+      self._exact[key] = entry
+      self._exact_count += 1
+
     self._dirty()
 
     self.raiseEvent(FlowTableModification(added=[entry]))
@@ -249,6 +275,7 @@ class FlowTable (EventMixin):
   def remove_entry (self, entry, reason=None):
     assert isinstance(entry, TableEntry)
     self._table.remove(entry)
+    self._unindex(entry)
     self._dirty()
     self.raiseEvent(FlowTableModification(removed=[entry], reason=reason))
 
@@ -285,6 +312,7 @@ class FlowTable (EventMixin):
       entry = self._table[i]
       if entry in remove_flows:
         del self._table[i]
+        self._unindex(entry)
         remove_flows.remove(entry)
         if not remove_flows: break
       else:
@@ -292,6 +320,21 @@ class FlowTable (EventMixin):
     assert len(remove_flows) == 0
     self.raiseEvent(FlowTableModification(removed=flows, reason=reason))
 
+  def _unindex (self, entry):
+    """
+    Drops a removed entry from the exact-match index
+    """
+    key = _exact_key(entry.match)
+    if key is None: return
+    self._exact_count -= 1
+    if self._exact.get(key) is not entry: return
+    del self._exact[key]
+    # Another entry with the same match may be left
+    for e in self._table[:self._exact_count]:
+      if _exact_key(e.match) == key:
+        self._exact[key] = e
+        break
+
   def remove_expired_entries (self, now=None):
     idle = []
     hard = []
@@ -319,7 +362,14 @@ class FlowTable (EventMixin):
     """
     packet_match = ofp_match.from_packet(packet, in_port, spec_frags = True)
 
-    for entry in self._table:
+    # An exact entry only matches a packet with exactly its fields
+    key = _exact_key(packet_match)
+    if key is not None:
+      entry = self._exact.get(key)
+      if entry is not None:
+        return entry
+
+    for entry in itertools.islice(self._table, self._exact_count, None):
       if entry.match.matches_with_wildcards(packet_match,
                                             consider_other_wildcards=False):
         return entry
@@ -15,6 +15,7 @@
 import pox.openflow.libopenflow_01 as of
 import struct
 from pox.lib.revent import EventMixin
+from pox.lib.addresses import IPAddr
 import pox.openflow
 
 def make_type_to_unpacker_table ():
@@ -32,6 +33,29 @@ def make_type_to_unpacker_table ():
   return r
 
 
+def _ip_h (addr):
+  # unset match fields hold a plain 0 instead of an IPAddr
+  return addr.toUnsigned() if isinstance(addr, IPAddr) else addr
+
+
+def flow_stats_to_tuples (stats):
+  """
+  Yields one tuple of plain numbers per ofp_flow_stats in stats
+
+  The tuples are
+    (nw_src, nw_dst, tp_src, tp_dst, nw_proto, dl_type,
+     packet_count, byte_count, duration_sec, duration_nsec)
+  with the addresses as unsigned ints in host order.  Fields are read
+  straight off the unpacked entries, so unlike of_json.flow_stats_to_list()
+  no dicts or strings are built.  Wildcarded fields come out as 0.
+  """
+  for s in stats:
+    m = s.match
+    yield (_ip_h(m._nw_src), _ip_h(m._nw_dst), m._tp_src, m._tp_dst,
+           m._nw_proto, m._dl_type, s.packet_count, s.byte_count,
+           s.duration_sec, s.duration_nsec)
+
+
 class DPIDWatcher (EventMixin):
   """
   Strains OpenFlow messages by DPID
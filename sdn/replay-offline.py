@@ -0,0 +1,262 @@
+#!/bin/python
+
+# Offline replay of recorded runs through the controller, without Mininet,
+# tcpreplay or sudo. One pox.datapaths SoftwareSwitch with a port per host
+# of flow-data/<N>/pcaps/<run>/topo.csv is wired in memory to the real
+# controller (l2_learning_mod + flow_info_extractor) in this process, and the
+# run's packets are pushed through it.
+#
+# Packets come from the host captures h<i>.pcap of the run folder if there
+# are any. Otherwise they are rebuilt from the recorded pox log of the run,
+# flow-data/<N>/poxLogs/test<run>.txt: every flow sends, in every sampling
+# period, as many packets and bytes as its counters grew by in that period.
+#
+# The process runs on trace time: time.time is replaced by the replay clock
+# before POX is imported, so switch flow durations, flow record timestamps
+# and idle eviction all follow the packets, and the sampling ticks are
+# driven from here instead of recoco timers. --speed 0 (the default) replays
+# as fast as possible, --speed 10 ten times faster than recorded. Every run
+# goes to a fresh process and writes poxLogs/replay<run>.txt. --data reads
+# the runs from another folder laid out like flow-data, e.g. synthetic ones
+# from synthetic-traffic.py pcap.
+#
+#   ./replay-offline.py 10 [--runs 7 8 9 10] [--classifier 10/gaussianNB] [--speed 0] [--data flow-data] [--json report.json]
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sdn_fog_folder = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(sdn_fog_folder, 'ext'))
+import offline_controller
+from traffic_model import build_frame, host_mac
+
+serverIP = '10.0.0.1'
+TCP_HEADER = 14 + 20 + 20       # ethernet + ipv4 + tcp without options
+
+
+## TOPOLOGY
+def loadTopology(dataFolder: str, numHosts: int, runId: int):
+    """(hosts, ports): host name -> IP, and IP -> switch port (h<i> is on port i)"""
+    topo = pd.read_csv(os.path.join(dataFolder, str(numHosts), 'pcaps', str(runId), 'topo.csv'))
+    hosts = dict(zip(topo['host'], topo['IP'].str.split('/').str[0]))
+    ports = {ip: int(host[1:]) for host, ip in hosts.items()}
+    return hosts, ports
+
+
+## PACKET SOURCES
+def readPcap(path: str):
+    """Yield (timestamp, frame bytes) of a libpcap file"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+        magic = header[:4]
+        if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+            endian = '<'
+        elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+            endian = '>'
+        else:
+            raise ValueError("{} is not a pcap file".format(path))
+        # nanosecond resolution files have their own magic
+        scale = 1e-9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e-6
+        record = struct.Struct(endian + 'IIII')
+        while True:
+            head = f.read(record.size)
+            if len(head) < record.size:
+                return
+            sec, frac, captured, _ = record.unpack(head)
+            yield sec + frac*scale, f.read(captured)
+
+def pcapPackets(paths, ports):
+    """
+    (events, end): (time, in_port, frame) of all packets of the host
+    captures in time order, and the time of the last one; a packet enters
+    the switch on the port of its source IP, as the captures hold both what
+    the host sent and what it got back
+    """
+    from pox.lib.packet import ethernet, ipv4
+    seen = set()
+    events = list()
+    for path in paths:
+        for ts, frame in readPcap(path):
+            eth = ethernet(frame)
+            ip = eth.find('ipv4')
+            if ip is None or str(ip.srcip) not in ports:
+                continue
+            # a packet between two captured hosts is in both captures
+            key = (ts, frame)
+            if key in seen:
+                continue
+            seen.add(key)
+            events.append((ts, ports[str(ip.srcip)], frame))
+    events.sort(key= lambda e: e[0])
+    return events, events[-1][0] if events else 0.0
+
+def logPackets(dataFolder: str, numHosts: int, runId: int, ports):
+    """
+    (events, end): (time, in_port, frame) of packets rebuilt from the
+    recorded pox log, and the time the log ends. Per flow and sampling
+    period, its counter increments in each direction are spread evenly over
+    the period, with frame sizes that add up to its byte count
+    """
+    data = pd.read_csv(os.path.join(dataFolder, str(numHosts), 'poxLogs', 'test' + str(runId) + '.txt'))
+    # every conversation is logged in both directions, keep the one to the server
+    data = data[(data['dest.IP'] == serverIP) & data['source.IP'].isin(list(ports))]
+    data = data.sort_values('time', kind= 'stable')
+    # the controller kept sampling the idle flows after the traffic stopped
+    end = float(data['time'].max()) if len(data) else 0.0
+    flows = data.groupby(['source.IP', 'dest.IP', 'source.port', 'dest.port', 'nw_proto'], sort= False)
+
+    times, flowIds, directions, sizes = [], [], [], []
+    keys = list()
+    for key, rows in flows:
+        t = rows['time'].to_numpy()
+        start = np.r_[t[0] - 1.0, t[:-1]]
+        for direction, (packets, bytes) in enumerate((('fwd.total_packets', 'fwd.total_bytes'),
+                                                       ('bwd.total_packets', 'bwd.total_bytes'))):
+            dp = np.diff(np.r_[0, rows[packets].to_numpy(dtype= np.int64)]).clip(0)
+            db = np.diff(np.r_[0, rows[bytes].to_numpy(dtype= np.int64)]).clip(0)
+            n = int(dp.sum())
+            if n == 0:
+                continue
+            period = np.repeat(np.arange(len(t)), dp)
+            index = np.arange(n) - np.repeat(np.cumsum(dp) - dp, dp)
+            times.append(start[period] + (t - start)[period] * (index + 1) / dp[period])
+            # the first db % dp packets of a period are a byte longer
+            size = db[period] // dp[period] + (index < db[period] % dp[period])
+            sizes.append(np.maximum(size, TCP_HEADER))
+            flowIds.append(np.full(n, len(keys)))
+            directions.append(np.full(n, direction))
+        keys.append(key)
+    if not times:
+        return [], end
+    times, flowIds, directions, sizes = map(np.concatenate, (times, flowIds, directions, sizes))
+    order = np.argsort(times, kind= 'stable')
+
+    frames = dict()
+    def frame(flow, direction, size):
+        cached = frames.get((flow, direction, size))
+        if cached is None:
+            src, dst, sport, dport, proto = keys[flow]
+            if direction:
+                src, dst, sport, dport = dst, src, dport, sport
+            cached = frames[(flow, direction, size)] = build_frame(src, dst, int(sport), int(dport), int(proto), int(size),
+                                                                   host_mac(ports[src]), host_mac(ports[dst]))
+        return cached
+
+    return [(times[i], ports[keys[flowIds[i]][1] if directions[i] else keys[flowIds[i]][0]],
+             frame(flowIds[i], directions[i], sizes[i])) for i in order], end
+
+## REPLAY
+def replay(numHosts: int, runId: int, classifier: str, speed: float, source: str, dataFolder: str):
+    os.chdir(sdn_fog_folder)
+
+    hosts, ports = loadTopology(dataFolder, numHosts, runId)
+    pcaps = sorted(glob.glob(os.path.join(dataFolder, str(numHosts), 'pcaps', str(runId), 'h*.pcap')))
+    if source == 'auto':
+        source = 'pcap' if pcaps else 'log'
+    events, end = pcapPackets(pcaps, ports) if source == 'pcap' else logPackets(dataFolder, numHosts, runId, ports)
+    if not events:
+        return {'hosts': numHosts, 'run': runId, 'error': "no packets to replay"}
+
+    # ticks come from here
+    clock, core, poller = offline_controller.start('replay' + str(runId) + '.txt', classifier, now= events[0][0])
+    from pox.lib.packet import ethernet
+    from loopback import LoopbackLink, CountingSwitch
+
+    switch = CountingSwitch(dpid= 1, ports= max(ports.values()))
+    link = LoopbackLink(switch)
+
+    def tick(now):
+        clock.now = now
+        switch.table.remove_expired_entries()
+        poller._tick()
+        link.pump()
+
+    wall = time.perf_counter()
+    period = poller.period
+    nextTick = clock.now + period
+    ticks = 0
+    parsed = dict()
+    for ts, port, frame in events:
+        while nextTick <= ts:
+            tick(nextTick)
+            ticks += 1
+            nextTick += period
+        if speed > 0:
+            lag = (ts - events[0][0]) / speed - (time.perf_counter() - wall)
+            if lag > 0:
+                time.sleep(lag)
+        clock.now = ts
+        packet = parsed.get(frame)
+        if packet is None:
+            packet = parsed[frame] = ethernet(frame)
+        switch.rx_packet(packet, port, packet_data= frame)
+        if link.pending:
+            link.pump()
+    # sample up to the end of the recording, and once more for what came in
+    # after the last tick
+    while True:
+        tick(nextTick)
+        ticks += 1
+        if nextTick > end:
+            break
+        nextTick += period
+    elapsed = time.perf_counter() - wall
+    core.quit()
+
+    trace = end - events[0][0]
+    return {
+        'hosts': numHosts,
+        'run': runId,
+        'source': source,
+        'packets': len(events),
+        'bytes': int(sum(len(e[2]) for e in events)),
+        'delivered': switch.delivered,
+        'packet_ins': switch.sent['PACKET_IN'],
+        'flow_mods': switch.received['FLOW_MOD'],
+        'stats_replies': switch.sent['STATS_REPLY'],
+        'flows': len(switch.table),
+        'ticks': ticks,
+        'trace_seconds': trace,
+        'seconds': elapsed,
+        'packets_per_sec': len(events) / elapsed if elapsed > 0 else 0.0,
+        'speedup': trace / elapsed if elapsed > 0 else 0.0,
+        'log': os.path.join('poxLogs', 'replay' + str(runId) + '.txt'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description= "Replay recorded runs through an in-process switch and controller")
+    parser.add_argument('hosts', type= int)
+    parser.add_argument('--runs', type= int, nargs= '+', default= list(range(7, 11)))
+    parser.add_argument('--classifier', help= "model to label flows with, e.g. 10/gaussianNB")
+    parser.add_argument('--speed', type= float, default= 0.0, help= "times faster than recorded, 0 for as fast as possible")
+    parser.add_argument('--source', choices= ['auto', 'pcap', 'log'], default= 'auto',
+                        help= "host captures or the recorded pox log, auto prefers the captures")
+    parser.add_argument('--data', default= os.path.join(sdn_fog_folder, 'flow-data'),
+                        help= "folder with the runs, e.g. one written by synthetic-traffic.py pcap")
+    parser.add_argument('--json', help= "also write the results to this file")
+    args = parser.parse_args()
+
+    results = list()
+    for runId in args.runs:
+        results.append(offline_controller.run(replay, args.hosts, runId, args.classifier, args.speed, args.source,
+                                              os.path.abspath(args.data)))
+
+    columns = ['hosts', 'run', 'source', 'packets', 'delivered', 'packet_ins', 'flow_mods', 'stats_replies', 'ticks',
+               'trace_seconds', 'seconds', 'packets_per_sec', 'speedup']
+    print(pd.DataFrame([r for r in results if 'error' not in r], columns= columns)
+          .to_string(index= False, float_format= '{:.2f}'.format))
+    for r in results:
+        if 'error' in r:
+            print("run {run}: {error}".format(**r))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent= 2)
@@ -0,0 +1,190 @@
+#!/bin/python
+
+# Deterministic synthetic runs for scaling tests past the recorded 10-80
+# hosts: benign and Telnet clients of one server, calibrated on flow-data
+# (see ext/traffic_model.py). The same arguments always give the same
+# traffic.
+#
+# pcap     writes <data>/<N>/pcaps/<run>/ laid out like flow-data: topo.csv,
+#          sendParams.csv and a capture h<i>.pcap per client, for
+#          replay-offline.py --data and the ground truth of evaluate.py.
+#          --rate-scale thins the packets out, benign clients send
+#          thousands per second.
+# replies  writes the packed OFPST_FLOW replies each switch would send at
+#          every sampling time to <out>/s<dpid>.of, the xid numbering ticks.
+# stats    answers the flow stats requests of the real controller with those
+#          replies over in-memory links, without any packets, and times how
+#          long flow_info_extractor takes to ingest them and to write out
+#          (and classify) the flows every tick. Each host count runs in a
+#          fresh process on a replay clock, writing poxLogs/synthetic<N>.txt.
+#
+#   ./synthetic-traffic.py pcap 200 [--runs 1 2] [--rate-scale 0.1] [--data flow-data-synthetic]
+#   ./synthetic-traffic.py replies 10000 --out replies [--switch-size 1000] [--seconds 60]
+#   ./synthetic-traffic.py stats 1000 10000 100000 [--switch-size 1000] [--seconds 60] [--classifier 10/gaussianNB] [--json report.json]
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sdn_fog_folder = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(sdn_fog_folder, 'ext'))
+import offline_controller
+from traffic_model import EPOCH, FLOW_STATS, SyntheticTraffic, write_pcap
+
+
+def trafficArgs(args, numHosts: int, runId: int):
+    """SyntheticTraffic arguments of a run, picklable so that workers can rebuild it"""
+    return dict(num_hosts= numHosts, seed= [args.seed, runId], attack_fraction= args.attack_fraction,
+                duration= args.duration, start_spread= args.start_spread, rate_scale= args.rate_scale,
+                switch_size= args.switch_size)
+
+
+## PCAP
+traffic = None
+
+def initWorker(kwargs):
+    # every worker draws the same traffic instead of having it pickled over
+    global traffic
+    traffic = SyntheticTraffic(**kwargs)
+
+def writeCapture(client: int, folder: str):
+    times, frames = traffic.packets(client)
+    write_pcap(os.path.join(folder, 'h' + str(traffic.hosts[client]) + '.pcap'), times, frames)
+    return len(frames), sum(len(f) for f in frames)
+
+def writeRun(kwargs, folder: str, workers):
+    run = SyntheticTraffic(**kwargs)
+    os.makedirs(folder, exist_ok= True)
+    pd.DataFrame(run.topology(), columns= ['host', 'IP']).to_csv(os.path.join(folder, 'topo.csv'), index= False)
+    pd.DataFrame(run.send_params(), columns= ['host', 'serverIP', 'port', 'duration', 'size', 'proto']) \
+        .to_csv(os.path.join(folder, 'sendParams.csv'), index= False)
+    with ProcessPoolExecutor(max_workers= workers, initializer= initWorker, initargs= (kwargs,)) as pool:
+        written = list(pool.map(writeCapture, range(len(run.hosts)), [folder] * len(run.hosts), chunksize= 16))
+    return {'hosts': run.num_hosts, 'attack': int(run.attack.sum()), 'packets': sum(p for p, _ in written),
+            'bytes': sum(b for _, b in written), 'folder': folder}
+
+
+## REPLIES
+def writeReplies(kwargs, folder: str, seconds: float, period: float):
+    run = SyntheticTraffic(**kwargs)
+    os.makedirs(folder, exist_ok= True)
+    ticks = int(seconds / period) + 1
+    size = 0
+    for dpid in range(1, run.switches + 1):
+        with open(os.path.join(folder, 's' + str(dpid) + '.of'), 'wb') as f:
+            for tick in range(ticks):
+                replies = run.flow_stats_replies(tick * period, tick, dpid)
+                f.write(b''.join(replies))
+                size += sum(len(r) for r in replies)
+    return {'hosts': run.num_hosts, 'switches': run.switches, 'ticks': ticks, 'bytes': size, 'folder': folder}
+
+
+## STATS
+def driveStats(kwargs, seconds: float, classifier: str):
+    run = SyntheticTraffic(**kwargs)
+    os.chdir(sdn_fog_folder)
+    # requests and ticks come from here
+    clock, core, poller = offline_controller.start('synthetic' + str(run.num_hosts) + '.txt', classifier, now= EPOCH)
+    import flow_info_extractor
+    from loopback import LoopbackLink, StatsSwitch
+
+    # seconds spent building replies, and flow stats entries in them
+    generate, entries = [0.0], [0]
+    def repliesOf(dpid):
+        def flowStats(xid):
+            start = time.perf_counter()
+            replies = run.flow_stats_replies(clock.now - EPOCH, xid, dpid)
+            generate[0] += time.perf_counter() - start
+            entries[0] += sum(len(r) - 12 for r in replies) // FLOW_STATS.itemsize
+            return replies
+        return flowStats
+    switches = [StatsSwitch(repliesOf(dpid), dpid= dpid, ports= run.switch_ports(dpid))
+                for dpid in range(1, run.switches + 1)]
+    links = [LoopbackLink(switch) for switch in switches]
+
+    # the poller's round, with the requests staggered over the period as its
+    # timers would
+    period = poller.period
+    step = period / len(links)
+    ticks = int(seconds / period) + 1
+    ingest, emit = np.zeros(ticks), np.zeros(ticks)
+    tracked = 0
+    for tick in range(ticks):
+        clock.now = EPOCH + tick * period
+        start = time.perf_counter()
+        poller.on_tick()
+        poller._expire(clock.now)
+        emit[tick] = time.perf_counter() - start
+        tracked = max(tracked, len(flow_info_extractor.flows))
+        for i, link in enumerate(links):
+            clock.now = EPOCH + tick * period + i * step
+            generated = generate[0]
+            start = time.perf_counter()
+            poller._request(link.controller_side)
+            link.pump()
+            ingest[tick] += time.perf_counter() - start - (generate[0] - generated)
+    tracked = max(tracked, len(flow_info_extractor.flows))
+    core.quit()
+
+    return {
+        'hosts': run.num_hosts,
+        'switches': run.switches,
+        'entries': entries[0],
+        'flows': tracked,
+        'ticks': ticks,
+        'stats_replies': sum(switch.sent['STATS_REPLY'] for switch in switches),
+        'generate_seconds': generate[0],
+        'ingest_seconds': float(ingest.sum()),
+        'ingest_max': float(ingest.max()),
+        'emit_seconds': float(emit.sum()),
+        'emit_max': float(emit.max()),
+        'entries_per_sec': entries[0] / ingest.sum() if ingest.sum() > 0 else 0.0,
+        'log': os.path.join('poxLogs', 'synthetic' + str(run.num_hosts) + '.txt'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description= "Generate synthetic runs and measure how the controller scales with them")
+    parser.add_argument('mode', choices= ['pcap', 'replies', 'stats'])
+    parser.add_argument('hosts', type= int, nargs= '+', help= "host counts, the server included")
+    parser.add_argument('--runs', type= int, nargs= '+', default= [1])
+    parser.add_argument('--seed', type= int, default= 0)
+    parser.add_argument('--attack-fraction', type= float, default= 0.5, help= "share of Telnet clients")
+    parser.add_argument('--duration', type= float, default= 10.0, help= "seconds each data flow lasts")
+    parser.add_argument('--start-spread', type= float, default= 2.0, help= "clients start within this many seconds")
+    parser.add_argument('--rate-scale', type= float, default= 1.0, help= "factor on the packet rates of all flows")
+    parser.add_argument('--switch-size', type= int, help= "clients per switch, 1000 by default")
+    parser.add_argument('--seconds', type= float, default= 60.0, help= "sampling time covered by replies & stats")
+    parser.add_argument('--period', type= float, default= 1.0, help= "sampling period of the replies")
+    parser.add_argument('--classifier', help= "model to label flows with in stats, e.g. 10/gaussianNB")
+    parser.add_argument('--data', default= os.path.join(sdn_fog_folder, 'flow-data-synthetic'))
+    parser.add_argument('--out', default= 'replies', help= "folder of the replies")
+    parser.add_argument('--workers', type= int, default= None)
+    parser.add_argument('--json', help= "also write the results to this file")
+    args = parser.parse_args()
+
+    results = list()
+    for numHosts in args.hosts:
+        for runId in args.runs:
+            kwargs = trafficArgs(args, numHosts, runId)
+            if args.mode == 'pcap':
+                folder = os.path.join(args.data, str(numHosts), 'pcaps', str(runId))
+                results.append(dict(writeRun(kwargs, folder, args.workers), run= runId))
+            elif args.mode == 'replies':
+                folder = os.path.join(args.out, str(numHosts), str(runId))
+                results.append(dict(writeReplies(kwargs, folder, args.seconds, args.period), run= runId))
+            else:
+                results.append(dict(offline_controller.run(driveStats, kwargs, args.seconds, args.classifier),
+                                    run= runId))
+
+    print(pd.DataFrame(results).drop(columns= ['folder', 'log'], errors= 'ignore')
+          .to_string(index= False, float_format= '{:.3f}'.format))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent= 2)
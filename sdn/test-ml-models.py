@@ -1,5 +1,6 @@
 #!/bin/python
 
+import os
 import sys
 from doctest import testmod
 from unittest import result
@@ -7,6 +8,12 @@ import numpy as np
 import pandas as pd
 import ipaddress
 
+from evaluate import loadGroundTruth, labelFlows, firstDetections
+# features are computed as online, by the controller's ext/ modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ext'))
+from flow_features import PREDICTOR_FORMAT as predictor_format, ips_to_int, ip_octets
+from model_registry import load_model
+
 #@title number of hosts
 # choose number of hosts to generate combined_train.csv
 numHosts = int(sys.argv[1])
@@ -15,54 +22,13 @@ models = ['dtree_depth5', 'dtree_depth10', 'random_forest50_depth10', 'lin_loglo
 sdn_fog_folder = './'
 
 def ParseCSV(hostNum:int, runId:int, model_descriptor:str):
-  folderpath = sdn_fog_folder + '/flow-data/' + str(hostNum) + '/'
-  send_params_path = folderpath + 'pcaps/' + str(runId) + '/sendParams.csv'
-  topo_path = folderpath + 'pcaps/' + str(runId) + '/topo.csv'
-
   # classified pox log
   flow_log_path = sdn_fog_folder + 'test-data/' + model_descriptor + '/' +str(hostNum) + '/test' + str(runId) + '.txt'
 
-  topo = dict()
-  with open(topo_path, 'r') as f:
-    lines = f.readlines()[1:]
-    for line in lines:
-      s = line.split(',')
-      topo[s[0]] = s[1][:-3]
-
-  # print(topo)
-
-  flow_labels = dict()
-  ports = list()
-
-  with open(send_params_path, 'r') as f:
-    lines = f.readlines()[1:]
-    for line in lines:
-      comps = line.split(',')
-      nw_src = topo[comps[0]]
-      nw_dst = comps[1]
-
-      flow_labels[hash(''.join([nw_src, nw_dst]))] = 1 if "Telnet" in comps[-1] else 0
-      flow_labels[hash(''.join([nw_dst, nw_src]))] = flow_labels[hash(''.join([nw_src, nw_dst]))]
-      ports.append(int(comps[2]))
-
-  # print(flow_labels)
-  # print(ports)
-
+  # labels from the run's ground truth, matched on the (source IP, dest IP)
+  # pair of the flows that use one of the client ports
   data = pd.read_csv(flow_log_path)
-
-  labels = list()
-  for i in range(len(data)):
-    flow = data.iloc[i, :]
-    nw_src = flow['source.IP']
-    nw_dst = flow['dest.IP']
-    tp_src = flow['source.port']
-    tp_dst = flow['dest.port']
-    key = hash(''.join([nw_src, nw_dst]))
-    if (tp_src in ports) or (tp_dst in ports):
-      labels.append(flow_labels[key])
-    else:
-      labels.append(0)
-  data['labels'] = pd.Series(labels)
+  data['labels'] = labelFlows(data, loadGroundTruth(hostNum, runId))
 
   # print(data.head())
   #data.to_csv(folderpath + "/labeled_flow.csv", index= False)
@@ -82,7 +48,8 @@ def formatData(numHosts:int, runId:int, model_descriptor:str):
     #filename = "combined_train_" + model_descriptor + '_' + str(numHosts) + ".csv"
     #train = pd.read_csv('./test-data/' + filename, usecols= cols)
     train = ParseCSV(numHosts, runId, model_descriptor)
-    train = train.loc[:, cols]
+    # sampling time is kept for the detection delays, it is no model input
+    train = train.loc[:, cols + ['time']]
 
     train['source.IP'] = train['source.IP'].astype('str')
     train['dest.IP'] = train['dest.IP'].astype('str')
@@ -102,53 +69,35 @@ class IPTransformer(BaseEstimator, TransformerMixin):
     pass
 
   def parseIP(self, ip_list):
-    ip1 = []
-    ip2 = []
-    ip3 = []
-    ip4 = []
-    for ip in ip_list:
-      s = ip.split('.')
-      # print(s)
-      ip1.append(int(s[0]))
-      ip2.append(int(s[1]))
-      ip3.append(int(s[2]))
-      ip4.append(int(s[3]))
-    
-    return ip1, ip2, ip3, ip4
+    """(n, 4) octets of dotted quad IPs, split from their uint32 value"""
+    return ip_octets(ips_to_int(ip_list))
   
   def fit(self, X, y=None):
     return self
 
   def transform(self, X):
-    df = pd.DataFrame(columns= cols)
     if isinstance(X, pd.Series):
       # print("series input")
-      df = df.append(X, ignore_index= True)
-    else:
-      # print("dataframe input")
-      df = pd.concat([df, X], ignore_index= True)
+      X = X.to_frame().T
+    # cols first, then whatever else X has
+    df = X.reindex(columns= cols + [c for c in X.columns if c not in cols]).reset_index(drop= True)
 
-    nw_src_list = df['source.IP']
-    nw_dst_list = df['dest.IP']
-    src_ip_parsed = self.parseIP(nw_src_list)
-    dst_ip_parsed = self.parseIP(nw_dst_list)
+    src_ip_parsed = self.parseIP(df['source.IP'])
+    dst_ip_parsed = self.parseIP(df['dest.IP'])
 
     df = df.drop(['source.IP', 'dest.IP'], axis= 1)
 
     for i in range(4):
-      df['source.IP.'+ str(i+1)] = pd.Series(np.array(src_ip_parsed[i]))
-      df['dest.IP.'+ str(i+1)] = pd.Series(np.array(dst_ip_parsed[i]))
+      df['source.IP.'+ str(i+1)] = src_ip_parsed[:, i]
+      df['dest.IP.'+ str(i+1)] = dst_ip_parsed[:, i]
     
     
     return df
 
-import pickle
-
-def getIP(instance, type:str):
-    ip = 0
-    for i in range(4):
-        ip += instance[type + '.IP.'+ str(i+1)] << 8*(3-i)
-    return ip
+def getIPs(X, type:str):
+    """uint32 IPs of all rows, from their octet columns"""
+    octets = X.loc[:, [type + '.IP.' + str(i+1) for i in range(4)]].to_numpy(dtype= 'int64')
+    return (octets << np.array([24, 16, 8, 0])).sum(axis= 1).astype('uint32')
 
 def testModel(numHosts:int, runId:int, model_descriptor:str, file):
     testData = formatData(numHosts, runId,model_descriptor)
@@ -161,29 +110,17 @@ def testModel(numHosts:int, runId:int, model_descriptor:str, file):
     X = parsed_test.drop(['labels'], axis= 1)
 
     model_file = sdn_fog_folder + 'model/' + str(numHosts) + '/' + model_descriptor + '.pth'
-    model = pickle.load(open(model_file, 'rb'))
-    result = model.score(X, y)
-
-    serverIP = (10 << 24) + 1
-    # find first correct prediction of model
-    ip_status = dict()
-    pred = model.predict(X)
-    
-    for i, instance in X.iterrows():
-        srcIP = getIP(instance, 'source')
-        destIP = getIP(instance, 'dest')
-        if destIP == serverIP:
-            if srcIP not in ip_status:
-                ip_status[srcIP] = [0 , 0]
-            if ip_status[srcIP][1] == 0:
-                if pred[i] == y[i]:
-                    ip_status[srcIP][1] = 1
-                ip_status[srcIP][0] += 1
-    file.write('host,first_iter\n')
-    for key in ip_status:
-        ip = str(ipaddress.IPv4Address(key))
-        itr = ip_status[key][0]
-        file.write(ip + ',' + str(itr) + '\n')
+    model = load_model(model_file, predictor_format)
+    pred = model.predict(X.loc[:, predictor_format].to_numpy(dtype= 'float64'))
+    result = np.mean(pred == np.asarray(y))
+
+    # find first correct prediction of model for every client of the server
+    pairs = firstDetections(np.asarray(y), np.asarray(pred), X['time'].to_numpy(dtype= 'float64'),
+                            getIPs(X, 'source'), getIPs(X, 'dest'))
+    file.write('host,first_iter,first_delay\n')
+    for key, itr, delay in zip(pairs.index, pairs['first_iter'], pairs['first_delay']):
+        ip = str(ipaddress.IPv4Address(int(key)))
+        file.write(ip + ',' + str(itr) + ',' + ('' if np.isnan(delay) else str(delay)) + '\n')
     
     file.write('accuracy,' + str(result) + '\n')
 
@@ -0,0 +1,117 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(__file__) + "/../../../../dyclee")
+
+import numpy as np
+
+import checkpoint
+from dyclee import Context, DyClee
+from forget_methods import TrapezoidalDecay
+
+
+class CheckpointTest (unittest.TestCase):
+  def setUp (self):
+    self.folder = tempfile.mkdtemp()
+    self.path = os.path.join(self.folder, 'dyclee.ckpt')
+    self.rng = np.random.default_rng(3)
+    self.dyclee = DyClee(0.1, [Context(0.0, 1.0), Context(-5.0, 5.0)],
+                         forget_method=TrapezoidalDecay(20.0, 5.0),
+                         maxNonOverlaps=1, minWeight=0.2)
+    for now in range(5):
+      self.dyclee.partial_fit(self.samples(), float(now))
+      self.dyclee.densityBasedClustering(float(now))
+
+  def tearDown (self):
+    shutil.rmtree(self.folder)
+
+  def samples (self):
+    centers = np.array([(0.2, -3.0), (0.7, 0.0), (0.4, 3.0)])
+    picked = centers[self.rng.integers(len(centers), size=100)]
+    return picked + self.rng.normal(0, (0.03, 0.3), size=picked.shape)
+
+  def assertSameModel (self, a, b):
+    self.assertEqual(a.relativeSize, b.relativeSize)
+    self.assertEqual(a.dataContext, b.dataContext)
+    self.assertEqual(a.maxNonOverlaps, b.maxNonOverlaps)
+    self.assertEqual(a.minWeight, b.minWeight)
+    self.assertIs(type(a.forget_method), type(b.forget_method))
+    self.assertEqual(vars(a.forget_method), vars(b.forget_method))
+    self.assertEqual((a.meanDensity, a.medianDensity, a.clusteredAt),
+                     (b.meanDensity, b.medianDensity, b.clusteredAt))
+    self.assertEqual(a.AList, b.AList)
+    self.assertEqual(a.OList, b.OList)
+    self.assertEqual(a.numMicroClusters, b.numMicroClusters)
+    size = a.numMicroClusters
+    for name in ('n', 'LS', 'SS', 'tl', 'ts', 'label'):
+      np.testing.assert_array_equal(getattr(a.microClusters, name)[:size],
+                                    getattr(b.microClusters, name)[:size], err_msg=name)
+
+  def round_trip (self, mmap):
+    checkpoint.save(self.dyclee, self.path)
+    restored = checkpoint.load(self.path, mmap=mmap)
+    self.assertSameModel(self.dyclee, restored)
+
+    # both carry on alike, the restored one searching all connections again
+    with open(self.path, 'rb') as f:
+      saved = f.read()
+    X = self.samples()
+    for dyclee in (self.dyclee, restored):
+      dyclee.partial_fit(X, 5.0)
+      dyclee.densityBasedClustering(5.0)
+    self.assertSameModel(self.dyclee, restored)
+    self.assertEqual(self.dyclee.neighbors, restored.neighbors)
+    # mapped copy-on-write, updates never reach the file
+    with open(self.path, 'rb') as f:
+      self.assertEqual(f.read(), saved)
+    return restored
+
+  def test_round_trip (self):
+    restored = self.round_trip(False)
+    self.assertNotIsInstance(restored.microClusters.n, np.memmap)
+
+  def test_round_trip_mmap (self):
+    checkpoint.save(self.dyclee, self.path)
+    self.assertIsInstance(checkpoint.load(self.path, mmap=True).microClusters.n, np.memmap)
+    self.round_trip(True)
+
+  def test_empty (self):
+    dyclee = DyClee(0.1, [Context(0.0, 1.0)])
+    checkpoint.save(dyclee, self.path)
+    for mmap in (False, True):
+      restored = checkpoint.load(self.path, mmap=mmap)
+      self.assertEqual(restored.numMicroClusters, 0)
+      self.assertIsNone(restored.forget_method)
+      self.assertIsNone(restored.clusteredAt)
+      restored.partial_fit(np.array([[0.5]]), 1.0)
+      self.assertEqual(restored.numMicroClusters, 1)
+
+  def test_background (self):
+    writer = checkpoint.BackgroundCheckpointer(self.path)
+    writer.submit(self.dyclee)
+    # the copy was taken at submit
+    self.dyclee.partial_fit(self.samples(), 5.0)
+    writer.close()
+    self.assertGreaterEqual(writer.written, 1)
+    restored = checkpoint.load(self.path)
+    self.assertEqual(restored.clusteredAt, 4.0)
+    self.assertLess(restored.microClusters.n.sum(), self.dyclee.microClusters.n[:self.dyclee.numMicroClusters].sum())
+
+
+if __name__ == '__main__':
+  unittest.main()
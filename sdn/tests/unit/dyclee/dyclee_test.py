@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import copy
+
+sys.path.append(os.path.dirname(__file__) + "/../../../../dyclee")
+
+import numpy as np
+
+from dyclee import Context, DyClee
+from forget_methods import ExponentialDecay
+from union_find import UnionFind
+
+
+def model ():
+  """two features in [0, 1], hyperboxes of 0.1"""
+  return DyClee(0.1, [Context(0.0, 1.0)] * 2, forget_method=ExponentialDecay(0.05))
+
+def blobs (rng, centers, count, spread=0.01):
+  """count samples around randomly picked centers, far tighter than a hyperbox"""
+  centers = np.asarray(centers, dtype=float)
+  picked = centers[rng.integers(len(centers), size=count)]
+  return picked + rng.uniform(-spread, spread, size=picked.shape)
+
+
+class PartialFitTest (unittest.TestCase):
+  """
+  partial_fit matches the block against the microclusters as they were
+  before it, step one sample at a time: both agree as long as no sample is
+  near enough to two microclusters for their moves to matter
+  """
+  def setUp (self):
+    self.rng = np.random.default_rng(1)
+    self.centers = [(0.1, 0.1), (0.5, 0.1), (0.1, 0.5), (0.5, 0.5), (0.9, 0.9)]
+
+  def fit (self, batches, density=True):
+    sequential, block = model(), model()
+    for now, X in enumerate(batches):
+      now = float(now)
+      rows = [sequential.step(x, now) for x in X]
+      self.assertEqual(block.partial_fit(X, now).tolist(), rows)
+      if density:
+        sequential.densityBasedClustering(now)
+        block.densityBasedClustering(now)
+    return sequential, block
+
+  def assertSameState (self, sequential, block):
+    a, b = sequential.microClusters, block.microClusters
+    self.assertEqual(len(a), len(b))
+    for name in ('n', 'LS', 'SS', 'tl', 'ts', 'label'):
+      np.testing.assert_allclose(getattr(a, name)[:len(a)], getattr(b, name)[:len(b)], err_msg=name)
+    self.assertEqual(sequential.AList, block.AList)
+    self.assertEqual(sorted(sequential.OList), sorted(block.OList))
+
+  def test_new_microclusters (self):
+    # groups form in order of their first sample, as one by one
+    sequential, block = self.fit([blobs(self.rng, self.centers, 200)], density=False)
+    self.assertEqual(len(block.microClusters), len(self.centers))
+    self.assertSameState(sequential, block)
+
+  def test_existing_microclusters (self):
+    batches = [blobs(self.rng, self.centers[:3], 50),
+               blobs(self.rng, self.centers[:3], 100),
+               # new ones next to reached ones
+               blobs(self.rng, self.centers, 100)]
+    sequential, block = self.fit(batches)
+    self.assertEqual(len(block.microClusters), len(self.centers))
+    self.assertSameState(sequential, block)
+
+  def test_empty (self):
+    dyclee = model()
+    self.assertEqual(len(dyclee.partial_fit(np.zeros((0, 2)), 0.0)), 0)
+    self.assertEqual(dyclee.numMicroClusters, 0)
+
+
+class DensityTest (unittest.TestCase):
+  """
+  The density phase keeps connections and components between runs; they
+  must be what a run from scratch finds
+  """
+  def rebuilt (self, dyclee, now):
+    """a copy of dyclee with the last density phase redone from scratch"""
+    fresh = copy.deepcopy(dyclee)
+    fresh.dirty = set(range(fresh.numMicroClusters))
+    fresh.neighbors = dict()
+    fresh.denseRows = set()
+    fresh.components = UnionFind()
+    fresh.componentsStale = True
+    fresh.densityBasedClustering(now)
+    return fresh
+
+  def assertSameClusters (self, dyclee, fresh):
+    size = dyclee.numMicroClusters
+    self.assertEqual(dyclee.neighbors, fresh.neighbors)
+    self.assertEqual(dyclee.denseRows, fresh.denseRows)
+    np.testing.assert_array_equal(dyclee.microClusters.label[:size],
+                                  fresh.microClusters.label[:size])
+
+  def run_stream (self, dyclee, steps=40, seed=2):
+    """blobs drifting about, appearing and fading, one batch per step"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0.1, 0.9, size=(6, 2))
+    clustered = 0
+    for now in range(steps):
+      now = float(now)
+      centers = np.clip(centers + rng.normal(0, 0.03, size=centers.shape), 0, 1)
+      active = centers[rng.random(len(centers)) < 0.7]
+      if len(active):
+        dyclee.partial_fit(blobs(rng, active, 60, spread=0.08), now)
+      dyclee.densityBasedClustering(now)
+      self.assertSameClusters(dyclee, self.rebuilt(dyclee, now))
+      clustered += (dyclee.microClusters.label[:dyclee.numMicroClusters] >= 0).any()
+    # not trivially equal
+    self.assertGreater(clustered, steps // 2)
+
+  def test_incremental (self):
+    self.run_stream(model())
+
+  def test_pruned (self):
+    dyclee = model()
+    dyclee.minWeight = 0.5
+    self.run_stream(dyclee)
+
+
+if __name__ == '__main__':
+  unittest.main()
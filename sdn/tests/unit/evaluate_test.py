@@ -0,0 +1,124 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(__file__) + "/../..")
+
+import numpy as np
+import pandas as pd
+
+import evaluate
+
+
+def flow_log (rows):
+  """flow log DataFrame of (source.IP, dest.IP, source.port, dest.port) rows"""
+  return pd.DataFrame(rows, columns=['source.IP', 'dest.IP', 'source.port', 'dest.port'])
+
+
+class LabelFlowsTest (unittest.TestCase):
+  def setUp (self):
+    self.saved = evaluate.sdn_fog_folder
+    evaluate.sdn_fog_folder = tempfile.mkdtemp()
+    topo, params = evaluate.groundTruthFiles(10, 1)
+    os.makedirs(os.path.dirname(topo))
+    with open(topo, 'w') as f:
+      f.write("host,IP\nh1,10.0.0.1/8\nh2,10.0.0.2/8\nh3,10.0.0.3/8\nh4,10.0.0.4/8\n")
+    with open(params, 'w') as f:
+      f.write("host,serverIP,port,duration,size,proto\n"
+              "h2,10.0.0.1,40000,100,512,TCP \n"
+              "h3,10.0.0.1,40001,100,512,Telnet \n"
+              # listed twice, the last one counts
+              "h4,10.0.0.1,40002,100,512,Telnet \n"
+              "h4,10.0.0.1,40003,100,512,TCP \n")
+    self.truth = evaluate.loadGroundTruth(10, 1)
+
+  def tearDown (self):
+    shutil.rmtree(evaluate.sdn_fog_folder)
+    evaluate.sdn_fog_folder = self.saved
+
+  def test_ground_truth (self):
+    keys, labels, ports = self.truth
+    self.assertEqual(len(keys), 6)
+    self.assertTrue((keys[1:] > keys[:-1]).all())
+    server, h3 = (10 << 24) + 1, (10 << 24) + 3
+    for key in evaluate.pairKeys([h3, server], [server, h3]):
+      self.assertEqual(labels[keys.tolist().index(int(key))], 1)
+    self.assertEqual(ports.tolist(), [40000, 40001, 40002, 40003])
+
+  def test_labels (self):
+    data = flow_log([
+      ('10.0.0.3', '10.0.0.1', 40001, 23),     # telnet client
+      ('10.0.0.1', '10.0.0.3', 23, 40001),     # and its server side
+      ('10.0.0.2', '10.0.0.1', 40000, 80),     # benign client
+      ('10.0.0.4', '10.0.0.1', 40002, 23),     # relabeled benign
+      ('10.0.0.3', '10.0.0.1', 5555, 6666),    # not a port of the run
+      ('10.0.0.3', '10.0.0.2', 40001, 23),     # not a pair of the run
+      ('10.0.0.9', '10.0.0.1', 40001, 23),     # unknown host
+    ])
+    expected = [1, 1, 0, 0, 0, 0, 0]
+    labels = evaluate.labelFlows(data, self.truth)
+    self.assertEqual(labels.dtype, np.int64)
+    self.assertEqual(labels.tolist(), expected)
+    # IPs parsed by the caller
+    srcIP = evaluate.ips_to_int(data['source.IP'])
+    dstIP = evaluate.ips_to_int(data['dest.IP'])
+    self.assertEqual(evaluate.labelFlows(data, self.truth, srcIP, dstIP).tolist(), expected)
+
+  def test_no_truth (self):
+    data = flow_log([('10.0.0.3', '10.0.0.1', 40001, 23)])
+    empty = (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype='int64'), np.zeros(0, dtype='int64'))
+    self.assertEqual(evaluate.labelFlows(data, empty).tolist(), [0])
+
+  def test_past_last_key (self):
+    # beyond the highest key, searchsorted points past the end
+    data = flow_log([('255.255.255.255', '10.0.0.1', 40001, 23)])
+    self.assertEqual(evaluate.labelFlows(data, self.truth).tolist(), [0])
+
+
+class FirstDetectionsTest (unittest.TestCase):
+  def test_detections (self):
+    server = evaluate.serverIP
+    h2, h3, h4 = [server + i for i in (1, 2, 3)]
+    # (source, dest, time, label, prediction) in log order
+    log = [(h2, server, 0.0, 0, 1),
+           (h3, server, 1.0, 1, 1),     # right at once
+           (server, h2, 2.0, 0, 0),     # from the server, not counted
+           (h2, server, 3.0, 0, 1),
+           (h2, server, 5.0, 0, 0),     # right at the third
+           (h4, server, 6.0, 1, 0),     # never right
+           (h4, server, 7.0, 1, 0)]
+    srcIP, dstIP, times, y, pred = [np.array(col) for col in zip(*log)]
+    srcIP, dstIP = srcIP.astype(np.uint32), dstIP.astype(np.uint32)
+    pairs = evaluate.firstDetections(y, pred, times, srcIP, dstIP)
+    # in order of appearance
+    self.assertEqual(pairs.index.tolist(), [h2, h3, h4])
+    self.assertEqual(pairs['first_iter'].tolist(), [3, 1, 2])
+    np.testing.assert_array_equal(pairs['first_delay'].to_numpy(), [5.0, 0.0, np.nan])
+    self.assertEqual(pairs['attack'].tolist(), [False, True, True])
+
+  def test_nothing_to_server (self):
+    server = evaluate.serverIP
+    srcIP = np.array([server], dtype=np.uint32)
+    dstIP = np.array([server + 1], dtype=np.uint32)
+    pairs = evaluate.firstDetections(np.zeros(1, dtype='int64'), np.zeros(1, dtype='int64'),
+                                     np.zeros(1), srcIP, dstIP)
+    self.assertEqual(len(pairs), 0)
+    self.assertEqual(sorted(pairs.columns), ['attack', 'first_delay', 'first_iter'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import numpy as np
+
+from flow_store import RECORD_DTYPE
+from flow_clusterer import FlowClusterer, FlowsClustered
+
+
+def records (time, *groups):
+  """count identical records of every (fwd_packets, fwd_bytes, count) group"""
+  rec = np.zeros(sum(count for _, _, count in groups), dtype=RECORD_DTYPE)
+  rec['time'] = time
+  i = 0
+  for packets, nbytes, count in groups:
+    rec['fwd_packets'][i:i+count] = packets
+    rec['fwd_bytes'][i:i+count] = nbytes
+    i += count
+  return rec
+
+
+class FlowClustererTest (unittest.TestCase):
+  def setUp (self):
+    self.events = []
+
+  def push (self, clusterer, rec):
+    clusterer.addListener(FlowsClustered, self.events.append, once=True)
+    clusterer.push(rec)
+    return self.events[-1]
+
+  def test_labels (self):
+    clusterer = FlowClusterer(cadence=1)
+    event = self.push(clusterer, records(0.0, (10, 1000, 4), (10**5, 10**8, 4)))
+    self.assertTrue(event.reclustered)
+    self.assertEqual(len(set(event.labels[:4])), 1)
+    self.assertEqual(len(set(event.labels[4:])), 1)
+    self.assertNotEqual(event.labels[0], event.labels[4])
+    self.assertFalse(event.outliers.any())
+
+  def test_pruned_between_fit_and_label (self):
+    clusterer = FlowClusterer(cadence=1, decay=1.0, min_weight=0.1)
+    self.push(clusterer, records(0.0, (1, 100, 3), (100, 10**4, 3)))
+    # the first tick's microclusters fade out and get pruned at the density
+    # phase of the second, renumbering the ones the new records went to
+    event = self.push(clusterer, records(100.0, (10, 1000, 4), (10**5, 10**8, 4)))
+    self.assertEqual(clusterer.dyclee.numMicroClusters, 2)
+    self.assertEqual(sorted(event.labels.tolist()), [0] * 4 + [1] * 4)
+    self.assertEqual(len(set(event.labels[:4])), 1)
+    self.assertEqual(len(set(event.labels[4:])), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,81 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+from pox.core import core
+import pox.openflow
+import pox.openflow.libopenflow_01 as of
+from pox.lib.packet import ethernet
+
+
+class FlowRemovedTest (unittest.TestCase):
+  def setUp (self):
+    pox.openflow.launch()
+    import flow_info_extractor
+    from flow_store import FlowTable
+    self.fie = flow_info_extractor
+    self.saved = flow_info_extractor.flows
+    flow_info_extractor.flows = FlowTable()
+    self.evicted = []
+    flow_info_extractor.flows.on_evict = self.evicted.append
+    self.listeners = [
+      core.openflow.addListenerByName("FlowStatsReceived",
+          flow_info_extractor._handle_flowstats_received),
+      core.openflow.addListenerByName("FlowRemoved",
+          flow_info_extractor._handle_flow_removed)]
+
+  def tearDown (self):
+    core.openflow.removeListeners(self.listeners)
+    self.fie.flows = self.saved
+
+  def send (self, switch, link, src, dst, port):
+    """a frame between ports src[2] and dst[2] of hosts (number, IP, port)"""
+    from traffic_model import build_frame, host_mac
+    frame = build_frame(src[1], dst[1], src[2], dst[2], 6, 100,
+                        host_mac(src[0]), host_mac(dst[0]))
+    switch.rx_packet(ethernet(frame), port, packet_data=frame)
+    link.pump()
+
+  def test_removed_flow_is_evicted (self):
+    from loopback import LoopbackLink, CountingSwitch
+    from l2_learning_mod import LearningSwitch
+    from flow_store import EVICT_REMOVED
+    switch = CountingSwitch(dpid=4, ports=2)
+    link = LoopbackLink(switch)
+    LearningSwitch(link.controller_side, False)
+    h1, h2 = (1, '10.0.0.1', 5000), (2, '10.0.0.2', 40000)
+    # learn both hosts, the later packets install a flow each way
+    self.send(switch, link, h2, h1, 2)
+    self.send(switch, link, h1, h2, 1)
+    self.send(switch, link, h2, h1, 2)
+    self.assertEqual(len(switch.table), 2)
+    for entry in switch.table.entries:
+      self.assertTrue(entry.flags & of.OFPFF_SEND_FLOW_REM)
+    # one conversation, a row each way
+    self.assertEqual(len(self.fie.flows), 2)
+
+    link.controller_side.send(of.ofp_flow_mod(command=of.OFPFC_DELETE))
+    link.pump()
+    self.assertEqual(len(switch.table), 0)
+    self.assertEqual(len(self.fie.flows), 0)
+    self.assertEqual(len(self.evicted), 1)
+    self.assertEqual(self.evicted[0]['reason'].tolist(), [EVICT_REMOVED] * 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,68 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import IPAddr
+from pox.lib.packet import ethernet
+
+
+class Event (object):
+  class connection (object):
+    dpid = 7
+
+  def __init__ (self, stats):
+    self.stats = stats
+
+
+def entry (dl_type, nw_proto=0, nw_src=None, nw_dst=None, tp_src=0, tp_dst=0):
+  match = of.ofp_match(dl_type=dl_type, nw_proto=nw_proto, nw_src=nw_src,
+                       nw_dst=nw_dst, tp_src=tp_src, tp_dst=tp_dst)
+  return of.ofp_flow_stats(match=match, packet_count=3, byte_count=300,
+                           duration_sec=2)
+
+
+class FlowStatsReceivedTest (unittest.TestCase):
+  def setUp (self):
+    import flow_info_extractor
+    from flow_store import FlowTable
+    self.fie = flow_info_extractor
+    self.saved = flow_info_extractor.flows
+    flow_info_extractor.flows = FlowTable()
+
+  def tearDown (self):
+    self.fie.flows = self.saved
+
+  def test_ip_only (self):
+    src, dst = IPAddr('10.0.0.2'), IPAddr('10.0.0.1')
+    self.fie._handle_flowstats_received(Event([
+      entry(ethernet.IP_TYPE, 6, src, dst, 40000, 5000),
+      entry(ethernet.IP_TYPE, 6, dst, src, 5000, 40000),
+      entry(ethernet.ARP_TYPE, 1, src, dst),
+      entry(ethernet.LLDP_TYPE),
+      entry(0x86dd),
+    ]))
+    flows = self.fie.flows
+    self.assertEqual(len(flows), 2)
+    self.assertIsNotNone(flows.find(src.toUnsigned(), dst.toUnsigned(),
+                                    40000, 5000, 6, 7))
+    self.assertIsNone(flows.find(0, 0, 0, 0, 0, 7))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,201 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import numpy as np
+
+from flow_store import (FlowTable, flow_key, FWD_PACKETS, BWD_PACKETS,
+                        EVICT_IDLE, EVICT_LRU)
+
+A = 0x0a000001  # 10.0.0.1
+B = 0x0a000002  # 10.0.0.2
+
+
+def conversation (i):
+  """(nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid) of the i-th test flow"""
+  return (A, B, 1000 + i, 80, 6, 1)
+
+def reverse (flow):
+  nw_src, nw_dst, tp_src, tp_dst, nw_proto, dpid = flow
+  return (nw_dst, nw_src, tp_dst, tp_src, nw_proto, dpid)
+
+
+class FlowKeyTest (unittest.TestCase):
+  def test_packing (self):
+    key, swapped = flow_key(A, B, 1000, 80, 6, 7)
+    self.assertFalse(swapped)
+    self.assertEqual(key & (2**64 - 1), 7)
+    self.assertEqual((key >> 64) & 0xff, 6)
+    self.assertEqual((key >> 72) & (2**48 - 1), (B << 16) | 80)
+    self.assertEqual(key >> 120, (A << 16) | 1000)
+
+  def test_direction_independent (self):
+    key, swapped = flow_key(A, B, 1000, 80, 6, 7)
+    rkey, rswapped = flow_key(B, A, 80, 1000, 6, 7)
+    self.assertEqual(key, rkey)
+    self.assertNotEqual(swapped, rswapped)
+    # same address, the port decides the order
+    self.assertFalse(flow_key(A, A, 80, 1000, 6, 7)[1])
+    self.assertTrue(flow_key(A, A, 1000, 80, 6, 7)[1])
+
+  def test_fields_distinct (self):
+    keys = set([flow_key(A, B, 1000, 80, 6, 7)[0],
+                flow_key(A, B, 1000, 80, 17, 7)[0],
+                flow_key(A, B, 1000, 80, 6, 8)[0],
+                flow_key(A, B, 1001, 80, 6, 7)[0],
+                flow_key(A, B, 1000, 81, 6, 7)[0]])
+    self.assertEqual(len(keys), 5)
+
+
+class FlowTableTest (unittest.TestCase):
+  def setUp (self):
+    self.evicted = []
+    self.flows = FlowTable(capacity=4, on_evict=self.evicted.append)
+
+  def add (self, i, now, packets=1, reversed=False):
+    flow = conversation(i)
+    if reversed:
+      flow = reverse(flow)
+    self.flows.update(*flow[:5] + (flow[5], 0x800, packets, packets*100, 0.0, now))
+
+  def assertRow (self, flow):
+    row = self.flows.find(*flow)
+    self.assertIsNotNone(row)
+    f = self.flows
+    self.assertEqual((int(f.nw_src[row]), int(f.nw_dst[row]), int(f.tp_src[row]),
+                      int(f.tp_dst[row]), int(f.nw_proto[row]), int(f.dpid[row])), flow)
+    return row
+
+  def test_pair (self):
+    # first seen from the higher endpoint
+    self.add(0, 0.0, reversed=True)
+    self.assertEqual(len(self.flows), 2)
+    fwd = self.assertRow(reverse(conversation(0)))
+    bwd = self.assertRow(conversation(0))
+    self.assertEqual(fwd, 0)
+    self.assertEqual(bwd, fwd ^ 1)
+    self.add(0, 1.0, packets=5)
+    self.assertEqual(self.flows.counters[bwd, FWD_PACKETS], 5)
+    self.assertEqual(self.flows.counters[fwd, BWD_PACKETS], 5)
+
+  def test_grow (self):
+    for i in range(5):
+      self.add(i, 0.0)
+    self.assertEqual(len(self.flows), 10)
+    self.assertGreaterEqual(self.flows.capacity, 10)
+    for i in range(5):
+      self.assertRow(conversation(i))
+      self.assertRow(reverse(conversation(i)))
+
+  def test_evict_moves_last_pair (self):
+    self.add(0, 0.0)
+    self.add(1, 0.0)
+    # the last pair was first seen swapped, its index entry is the odd row
+    self.add(2, 0.0, packets=7, reversed=True)
+    self.assertTrue(self.flows.remove(*conversation(0) + (1.0,)))
+    self.assertEqual(len(self.flows), 4)
+    self.assertIsNone(self.flows.find(*conversation(0)))
+    self.assertEqual(self.assertRow(reverse(conversation(2))), 0)
+    self.assertEqual(self.assertRow(conversation(2)), 1)
+    self.assertEqual(self.flows.counters[0, FWD_PACKETS], 7)
+    self.assertEqual(self.assertRow(conversation(1)), 2)
+    self.assertEqual(len(self.evicted), 1)
+    self.assertEqual(self.evicted[0]['tp_src'].tolist(), [1000, 80])
+    self.assertFalse(self.flows.remove(*conversation(0) + (1.0,)))
+
+  def test_evict_several (self):
+    for i in range(5):
+      self.add(i, float(i))
+    # pairs 0, 1 and 3 go, the last pair is among them
+    self.flows.last_seen[8:10] = 10.0
+    self.flows.last_seen[4:6] = 10.0
+    self.assertEqual(self.flows.expire(10.0, 5.0), 3)
+    self.assertEqual(len(self.flows), 4)
+    self.assertEqual(self.evicted[0]['reason'].tolist(), [EVICT_IDLE] * 6)
+    self.assertEqual(sorted(self.evicted[0]['tp_src'].tolist()),
+                     [80, 80, 80, 1000, 1001, 1003])
+    for i in (2, 4):
+      self.assertRow(conversation(i))
+      self.assertRow(reverse(conversation(i)))
+    self.assertEqual(sorted(self.flows.index.values()), [0, 2])
+
+  def test_expire_either_direction (self):
+    self.add(0, 0.0)
+    self.add(1, 0.0)
+    # a reply about one direction keeps the conversation
+    self.flows.last_seen[self.flows.find(*reverse(conversation(0)))] = 9.0
+    self.assertEqual(self.flows.expire(10.0, 5.0), 1)
+    self.assertRow(conversation(0))
+    self.assertIsNone(self.flows.find(*conversation(1)))
+
+  def test_lru (self):
+    self.flows.max_flows = 6
+    for i in range(3):
+      self.add(i, float(i))
+    # seen again, so 1 is the least recently seen now
+    self.add(0, 3.0, packets=2)
+    self.add(3, 4.0)
+    self.assertEqual(len(self.flows), 6)
+    self.assertIsNone(self.flows.find(*conversation(1)))
+    self.assertEqual(self.evicted[0]['reason'].tolist(), [EVICT_LRU] * 2)
+    self.add(4, 5.0)
+    self.assertIsNone(self.flows.find(*conversation(2)))
+    for i in (0, 3, 4):
+      self.assertRow(conversation(i))
+    self.assertEqual(list(self.flows.index.keys()),
+                     [flow_key(*conversation(i))[0] for i in (0, 3, 4)])
+
+  def test_max_flows (self):
+    with self.assertRaises(ValueError):
+      self.flows.max_flows = 1
+
+  def test_update_rtt_iat (self):
+    flow = conversation(0)
+    self.flows.update(*flow + (0x800, 10, 1000, 0.0, 0.0))
+    self.flows.update(*flow + (0x800, 10, 1000, 1.0, 1.0))
+    self.flows.snapshot()
+    # 20 more packets one way over 2s, none the other; the reverse row
+    # sees them as backward packets
+    self.flows.update(*flow + (0x800, 30, 3000, 3.0, 3.0))
+    self.flows.update_rtt_iat(0.5, 0.5)
+    fwd = self.flows.find(*flow)
+    bwd = fwd ^ 1
+    np.testing.assert_allclose(self.flows.rtt[[fwd, bwd]],
+                               [0.5 * 20*2*2 / 20, 0.5 * 20*2*2 / 20])
+    np.testing.assert_allclose(self.flows.iat[[fwd, bwd]],
+                               [0.5 * 2 / 20, 0.5 * 2 / 20])
+
+    # as many both ways now, the iat averages them and the rtt stays
+    self.flows.snapshot()
+    self.flows.update(*flow + (0x800, 40, 4000, 5.0, 5.0))
+    self.flows.update(*reverse(flow) + (0x800, 10, 1000, 5.0, 5.0))
+    self.flows.update_rtt_iat(0.5, 0.5)
+    np.testing.assert_allclose(self.flows.rtt[fwd], 0.5 * 20*2*2 / 20)
+    np.testing.assert_allclose(self.flows.iat[fwd],
+                               0.5 * 0.05 + 0.5 * (2/10 + 2/10) / 2)
+
+    # nothing new, nothing moves
+    rtt, iat = self.flows.rtt[:2].copy(), self.flows.iat[:2].copy()
+    self.flows.snapshot()
+    self.flows.update_rtt_iat(0.5, 0.5)
+    np.testing.assert_array_equal(self.flows.rtt[:2], rtt)
+    np.testing.assert_array_equal(self.flows.iat[:2], iat)
+
+
+if __name__ == '__main__':
+  unittest.main()
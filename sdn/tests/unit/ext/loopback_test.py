@@ -0,0 +1,59 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+from pox.core import core
+import pox.openflow
+import pox.openflow.libopenflow_01 as of
+from pox.openflow.libopenflow_01 import OFP_MAX_PORT_NAME_LEN
+
+
+class StatsSwitchTest (unittest.TestCase):
+  def setUp (self):
+    pox.openflow.launch()
+
+  def test_many_ports (self):
+    from loopback import LoopbackLink, StatsSwitch
+    from traffic_model import SyntheticTraffic
+    run = SyntheticTraffic(1201, seed=[0, 1], switch_size=1200)
+    switch = StatsSwitch(lambda xid: run.flow_stats_replies(5.0, xid, 1),
+                         dpid=1, ports=run.switch_ports(1))
+    self.assertEqual(len(switch.ports), 1201)
+    for port in switch.ports.values():
+      self.assertLessEqual(len(port.name), OFP_MAX_PORT_NAME_LEN)
+
+    link = LoopbackLink(switch)
+    self.assertEqual(link.controller_side.dpid, 1)
+    stats = []
+    listener = core.openflow.addListenerByName("FlowStatsReceived",
+        lambda event: stats.extend(event.stats))
+    try:
+      link.controller_side.send(of.ofp_stats_request(
+          body=of.ofp_flow_stats_request()))
+      link.pump()
+    finally:
+      core.openflow.removeListener(listener)
+    self.assertEqual(len(stats), len(run.flow_stats(5.0, 1)))
+    self.assertGreater(len(stats), 1000)
+
+  def test_failed_handshake (self):
+    from loopback import LoopbackLink, CountingSwitch
+    class Mute (CountingSwitch):
+      def _rx_features_request (self, ofp, connection):
+        pass
+    self.assertRaises(RuntimeError, LoopbackLink, Mute(dpid=2, ports=2))
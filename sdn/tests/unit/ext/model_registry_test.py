@@ -0,0 +1,70 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os
+import os.path
+import pickle
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import numpy as np
+
+import model_registry
+from flow_features import PREDICTOR_FORMAT
+
+try:
+  from sklearn.naive_bayes import GaussianNB
+except ImportError:
+  GaussianNB = None
+
+
+@unittest.skipIf(GaussianNB is None, "requires sklearn")
+class LoadModelTest (unittest.TestCase):
+  def setUp (self):
+    self.folder = tempfile.mkdtemp()
+    self.path = os.path.join(self.folder, 'gaussianNB.pth')
+    self.npz = os.path.join(self.folder, 'gaussianNB.npz')
+    rng = np.random.default_rng(0)
+    self.X = rng.random((40, len(PREDICTOR_FORMAT)))
+    y = (self.X[:, 0] > 0.5).astype(int)
+    with open(self.path, 'wb') as f:
+      pickle.dump(GaussianNB().fit(self.X, y), f)
+    model_registry._registry.clear()
+
+  def tearDown (self):
+    shutil.rmtree(self.folder)
+    model_registry._registry.clear()
+
+  def test_export (self):
+    model = model_registry.load_model(self.path)
+    self.assertIsInstance(model, model_registry.GaussianNBModel)
+    self.assertEqual(sorted(os.listdir(self.folder)),
+                     ['gaussianNB.npz', 'gaussianNB.pth'])
+
+  def test_truncated_export (self):
+    expected = model_registry.load_model(self.path).predict(self.X)
+    with open(self.npz, 'r+b') as f:
+      f.truncate(100)
+    # still newer than the pickle, but unreadable
+    model_registry._registry.clear()
+    model = model_registry.load_model(self.path)
+    self.assertTrue((model.predict(self.X) == expected).all())
+    self.assertTrue((model_registry.load(self.npz).predict(self.X) == expected).all())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import csv
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import numpy as np
+
+from flow_store import RECORD_DTYPE
+from telemetry_writer import TelemetryWriter, read_records
+
+
+def records (n, time):
+  rec = np.zeros(n, dtype=RECORD_DTYPE)
+  rec['time'] = time
+  rec['nw_src'] = (10 << 24) + 1
+  rec['nw_dst'] = (10 << 24) + np.arange(2, n + 2)
+  rec['tp_src'] = 9000
+  rec['fwd_packets'] = np.arange(n)
+  return rec
+
+
+class TelemetryWriterTest (unittest.TestCase):
+  def setUp (self):
+    self.folder = tempfile.mkdtemp()
+    self.path = os.path.join(self.folder, 'flows.txt')
+
+  def tearDown (self):
+    shutil.rmtree(self.folder)
+
+  def test_csv (self):
+    writer = TelemetryWriter(self.path, list(RECORD_DTYPE.names))
+    writer.write_batch(records(3, 1.0))
+    writer.write_batch(records(2, 2.0))
+    writer.close()
+    with open(self.path) as f:
+      rows = list(csv.reader(f))
+    self.assertEqual(rows[0], list(RECORD_DTYPE.names))
+    self.assertEqual(len(rows), 6)
+    self.assertEqual(rows[1][:4], ['1.0', '10.0.0.1', '10.0.0.2', '9000'])
+    self.assertEqual(rows[5][:3], ['2.0', '10.0.0.1', '10.0.0.3'])
+
+  def test_bin (self):
+    writer = TelemetryWriter(self.path, list(RECORD_DTYPE.names), fmt='bin')
+    batches = [records(3, 1.0), records(2, 2.0)]
+    for batch in batches:
+      writer.write_batch(batch)
+    writer.close()
+    self.assertTrue((read_records(self.path) == np.concatenate(batches)).all())
+
+
+if __name__ == '__main__':
+  unittest.main()
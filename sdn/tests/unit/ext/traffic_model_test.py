@@ -0,0 +1,46 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+sys.path.append(os.path.dirname(__file__) + "/../../../ext")
+
+import pox.openflow.libopenflow_01 as of
+from traffic_model import MAX_SWITCH_PORTS, SWITCH_SIZE, SyntheticTraffic
+
+
+class SwitchSizeTest (unittest.TestCase):
+  def test_features_reply_fits (self):
+    reply = of.ofp_features_reply(datapath_id=1)
+    reply.ports = [of.ofp_phy_port(port_no=i) for i in range(MAX_SWITCH_PORTS)]
+    self.assertLessEqual(len(reply.pack()), 0xffff)
+    reply.ports.append(of.ofp_phy_port(port_no=MAX_SWITCH_PORTS))
+    self.assertGreater(len(reply), 0xffff)
+
+  def test_default (self):
+    self.assertEqual(SyntheticTraffic(80).switches, 1)
+    run = SyntheticTraffic(2 * SWITCH_SIZE + 2)
+    self.assertEqual(run.switches, 3)
+    self.assertEqual(run.switch_ports(1), SWITCH_SIZE + 1)
+    self.assertEqual(run.switch_ports(3), 2)
+
+  def test_too_many_ports (self):
+    SyntheticTraffic(MAX_SWITCH_PORTS, switch_size=MAX_SWITCH_PORTS - 1)
+    self.assertRaises(ValueError, SyntheticTraffic, MAX_SWITCH_PORTS + 1,
+                      switch_size=MAX_SWITCH_PORTS)
+
+
+if __name__ == '__main__':
+  unittest.main()
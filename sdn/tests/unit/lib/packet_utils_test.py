@@ -0,0 +1,44 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from pox.lib.packet.packet_utils import checksum
+
+
+class ChecksumTest (unittest.TestCase):
+  def test_even (self):
+    # RFC 1071 example: words 0x0001 0xf203 0xf4f5 0xf6f7
+    data = bytes([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7])
+    self.assertEqual(checksum(data), 0x220d)
+
+  def test_odd (self):
+    # a trailing byte counts as if padded with a zero byte
+    data = bytes([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6])
+    self.assertEqual(checksum(data), checksum(data + b'\0'))
+
+  def test_odd_packet (self):
+    from pox.lib.packet import ethernet, ipv4, tcp
+    from pox.lib.addresses import IPAddr
+    t = tcp(srcport=1234, dstport=80, off=5, flags=tcp.ACK_flag)
+    t.payload = b'x' * 7
+    ip = ipv4(srcip=IPAddr('10.0.0.2'), dstip=IPAddr('10.0.0.1'),
+              protocol=ipv4.TCP_PROTOCOL)
+    ip.payload = t
+    raw = ip.pack()
+    self.assertEqual(len(raw), 20 + 20 + 7)
+    parsed = ipv4(raw)
+    self.assertEqual(parsed.payload.csum, t.csum)
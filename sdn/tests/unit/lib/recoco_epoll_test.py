@@ -0,0 +1,206 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import socket
+import time
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from pox.lib.recoco.recoco import Scheduler, EpollSelectHub
+
+
+class FakeScheduler (object):
+  _hasQuit = False
+
+  def __init__ (self):
+    self.woken = []
+
+  def fast_schedule (self, task):
+    self.woken.append(task)
+
+
+class Task (object):
+  rv = None
+
+
+class CountingEpoll (object):
+  """Wraps the hub's epoll object, counting changes to the interest set"""
+  def __init__ (self, epoll):
+    self.epoll = epoll
+    self.changes = 0
+
+  def register (self, *args):
+    self.changes += 1
+    return self.epoll.register(*args)
+
+  def modify (self, *args):
+    self.changes += 1
+    return self.epoll.modify(*args)
+
+  def unregister (self, *args):
+    self.changes += 1
+    return self.epoll.unregister(*args)
+
+  def poll (self, *args):
+    return self.epoll.poll(*args)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "requires Linux")
+class EpollSelectHubTest (unittest.TestCase):
+  def setUp (self):
+    self.scheduler = FakeScheduler()
+    self.hub = EpollSelectHub(self.scheduler, threaded=False)
+    self.hub._epoll = CountingEpoll(self.hub._epoll)
+    self.a, self.b = socket.socketpair()
+
+  def tearDown (self):
+    self.a.close()
+    self.b.close()
+    self.hub._epoll.epoll.close()
+
+  def cycle (self, until=None, limit=1):
+    """
+    Runs the hub until task until is woken, or for limit seconds
+
+    Each cycle blocks up to the nearest timeout, as in an idle scheduler.
+    """
+    end = time.time() + limit
+    while time.time() < end:
+      self.hub.idle()
+      if until is not None and until in self.scheduler.woken:
+        return until.rv
+    return None
+
+  def test_read (self):
+    t = Task()
+    self.hub.registerSelect(t, [self.a], None, None, 5)
+    self.hub.idle()
+    self.assertNotIn(t, self.scheduler.woken)
+    self.b.send(b"x")
+    self.assertEqual(self.cycle(t), ([self.a],[],[]))
+
+  def test_write_and_read (self):
+    t = Task()
+    self.hub.registerSelect(t, [self.a], [self.a], [self.a])
+    self.assertEqual(self.cycle(t), ([],[self.a],[]))
+
+  def test_timeout (self):
+    t = Task()
+    start = time.time()
+    self.hub.registerTimer(t, 0.05)
+    self.assertEqual(self.cycle(t), ([],[],[]))
+    self.assertGreaterEqual(time.time() - start, 0.04)
+
+  def test_timers_in_order (self):
+    late, early = Task(), Task()
+    self.hub.registerTimer(late, 0.1)
+    self.hub.registerTimer(early, 0.02)
+    self.cycle(late)
+    self.assertEqual(self.scheduler.woken, [early, late])
+
+  def test_reselect_without_changes (self):
+    first = Task()
+    self.hub.registerSelect(first, [self.a], None, None, 0.01)
+    self.assertEqual(self.cycle(first), ([],[],[]))
+    changes = self.hub._epoll.changes
+    # Still armed for reading from the first Select
+    second = Task()
+    self.hub.registerSelect(second, [self.a], None, None, 5)
+    self.hub.idle()
+    self.assertNotIn(second, self.scheduler.woken)
+    self.assertEqual(self.hub._epoll.changes, changes)
+    self.b.send(b"x")
+    self.assertEqual(self.cycle(second), ([self.a],[],[]))
+
+  def test_same_task_reselects (self):
+    t = Task()
+    self.b.send(b"x")
+    for i in range(3):
+      self.hub.registerSelect(t, [self.a], None, [self.a], 5)
+      self.assertEqual(self.cycle(t), ([self.a],[],[]))
+      self.scheduler.woken = []
+    # Only re-armed after firing
+    self.assertEqual(self.hub._epoll.changes, 3)
+
+  def test_taken_over (self):
+    first, second = Task(), Task()
+    self.hub.registerSelect(first, [self.a], None, None, 0.01)
+    self.cycle(first)
+    self.hub.registerSelect(second, [self.a], None, None, 0.01)
+    self.cycle(second)
+    # The same Select as before, though it's not set up anymore
+    self.hub.registerSelect(first, [self.a], None, None, 5)
+    self.hub.idle()
+    self.b.send(b"x")
+    self.assertEqual(self.cycle(first), ([self.a],[],[]))
+
+  def test_ready_while_nobody_waits (self):
+    t = Task()
+    self.hub.registerSelect(t, [self.a], None, None, 0.01)
+    self.cycle(t)
+    # Fires with no one waiting, which disarms it...
+    self.b.send(b"x")
+    self.hub.idle()
+    # ...but a later Select still sees the data
+    t = Task()
+    self.hub.registerSelect(t, [self.a], None, None, 5)
+    self.assertEqual(self.cycle(t), ([self.a],[],[]))
+
+  def test_hangup_is_readable (self):
+    t = Task()
+    self.hub.registerSelect(t, [self.a], None, None, 5)
+    self.hub.idle()
+    self.b.close()
+    self.assertEqual(self.cycle(t), ([self.a],[],[]))
+
+  def test_closed_socket (self):
+    c, d = socket.socketpair()
+    c.close()
+    d.close()
+    t = Task()
+    self.hub.registerSelect(t, [c], None, [c], 5)
+    self.assertEqual(self.cycle(t), ([],[],[c]))
+
+  def test_fd_reused (self):
+    c, d = socket.socketpair()
+    t = Task()
+    self.hub.registerSelect(t, [c], None, None, 0.01)
+    self.cycle(t)
+    fd = c.fileno()
+    c.close()
+    d.close()
+    c, d = socket.socketpair()
+    try:
+      self.assertEqual(c.fileno(), fd)
+      t = Task()
+      self.hub.registerSelect(t, [c], None, None, 5)
+      d.send(b"x")
+      self.assertEqual(self.cycle(t), ([c],[],[]))
+    finally:
+      c.close()
+      d.close()
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "requires Linux")
+class DefaultHubTest (unittest.TestCase):
+  def test_default (self):
+    s = Scheduler(isDefaultScheduler=False, startInThread=False,
+                  threaded_selecthub=False)
+    self.assertIsInstance(s._selectHub, EpollSelectHub)
+
+  def test_opt_out (self):
+    s = Scheduler(isDefaultScheduler=False, startInThread=False,
+                  threaded_selecthub=False, use_epoll=False)
+    self.assertNotIsInstance(s._selectHub, EpollSelectHub)
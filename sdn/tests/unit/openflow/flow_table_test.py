@@ -111,6 +111,38 @@ class FlowTableTest(unittest.TestCase):
       t.remove_expired_entries(now=time)
       self.assertEqual(sorted([e.cookie for e in t.entries]), remaining)
 
+  def test_entry_for_packet(self):
+    """ test that exact entries win over wildcarded ones, even when removed """
+    from pox.lib.packet import ethernet, ipv4, tcp
+    def packet(sport):
+      t = tcp(srcport=sport, dstport=23, off=5, flags=tcp.ACK_flag)
+      ip = ipv4(srcip=IPAddr("10.0.0.2"), dstip=IPAddr("10.0.0.1"), protocol=ipv4.TCP_PROTOCOL)
+      ip.payload = t
+      e = ethernet(src=EthAddr("00:00:00:00:00:02"), dst=EthAddr("00:00:00:00:00:01"), type=ethernet.IP_TYPE)
+      e.payload = ip
+      return ethernet(e.pack())
+
+    t = FlowTable()
+    t.add_entry(TableEntry(priority=0xffff, cookie=1, match=ofp_match(nw_src="10.0.0.0/8")))
+    t.add_entry(TableEntry(cookie=2, match=ofp_match.from_packet(packet(1000), 2)))
+    t.add_entry(TableEntry(cookie=3, match=ofp_match.from_packet(packet(1000), 2)))
+    t.add_entry(TableEntry(cookie=4, match=ofp_match.from_packet(packet(1001), 2)))
+
+    for (sport, in_port, remove, cookie) in (
+            (1000, 2, [], 3), # newest of the equal exact entries
+            (1001, 2, [], 4),
+            (1002, 2, [], 1), # no exact entry, falls back to the wildcard
+            (1000, 3, [], 1),
+            (1000, 2, [3], 2), # the older equal entry takes over
+            (1000, 2, [2], 1),
+            (1001, 2, [1], 4),
+            (1002, 2, [], None),
+            ):
+      for e in [e for e in t.entries if e.cookie in remove]:
+        t.remove_entry(e)
+      e = t.entry_for_packet(packet(sport), in_port)
+      self.assertEqual(e.cookie if e else None, cookie)
+
   # def test_check_for_overlap_entries(self):
 
 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from pox.openflow.libopenflow_01 import *
+from pox.openflow.util import flow_stats_to_tuples
+
+class FlowStatsToTuplesTest (unittest.TestCase):
+  def _stats (self, **kw):
+    match = ofp_match(dl_type=0x800, nw_proto=6, nw_src="10.0.0.2",
+                      nw_dst="10.0.0.1", tp_src=40000, tp_dst=9000)
+    return ofp_flow_stats(match=match, packet_count=7, byte_count=512,
+                          duration_sec=3, duration_nsec=250, **kw)
+
+  def test_fields (self):
+    t, = flow_stats_to_tuples([self._stats()])
+    self.assertEqual(t, (0x0a000002, 0x0a000001, 40000, 9000, 6, 0x800,
+                         7, 512, 3, 250))
+
+  def test_unpacked (self):
+    raw = self._stats(actions=[ofp_action_output(port=2)]).pack()
+    s = ofp_flow_stats()
+    s.unpack(raw, 0, len(raw))
+    self.assertEqual(list(flow_stats_to_tuples([s])),
+                     list(flow_stats_to_tuples([self._stats()])))
+
+  def test_wildcarded (self):
+    t, = flow_stats_to_tuples([ofp_flow_stats(match=ofp_match(in_port=1))])
+    self.assertEqual(t[:6], (0, 0, 0, 0, 0, 0))
+
+if __name__ == '__main__':
+  unittest.main()